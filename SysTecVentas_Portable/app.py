@@ -1,10 +1,25 @@
 # app.py mejorado y CORREGIDO para SysTec Ventas
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, g, send_file, has_app_context, has_request_context, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3, os, json, uuid
+from markupsafe import Markup
+import sqlite3, os, json, uuid, queue, threading, time, random, re, zlib, base64, hmac
 from datetime import datetime, timedelta
 import csv
 import io
+import atexit
+from utils.registro_logs import EscritorLogs
+from utils.retencion_logs import RetencionLogs
+from utils.respaldos import Respaldos
+from utils.migraciones import Migraciones
+from utils.fragmentos import CacheFragmentos, VersionesDatos
+from utils.cache_productos import CacheProductos
+from utils.analitica import AnaliticaVentas
+from utils.eventos import BusEventos, formatear_sse
+from utils.trazas_sql import ConexionTrazada, TrazadorSQL
+from utils.metricas import RegistroMetricas, BUCKETS_ESPERA
+from utils.importacion_productos import importar_productos_csv
+from utils.datos_sinteticos import ESCALAS, generar_datos_sinteticos
+import click
 
 app = Flask(__name__)
 app.secret_key = 'clave-secreta-systec-2025'
@@ -20,26 +35,240 @@ CONFIGURACION_DEFAULT = {
 }
 
 # ========== CONEXIÓN DB ==========
+app.config.setdefault('DB_POOL_MAX', 8)
+# Concurrencia entre terminales: WAL permite que los lectores (dashboard,
+# reportes) nunca bloqueen a los escritores (checkouts)
+app.config.setdefault('DB_JOURNAL_MODE', 'WAL')
+app.config.setdefault('DB_BUSY_TIMEOUT_MS', 5000)
+app.config.setdefault('DB_REINTENTOS', 4)
+app.config.setdefault('DB_REINTENTO_ESPERA_S', 0.05)
+# Traza de SQL por request: totales en las cabeceras X-SQL-* y las sentencias
+# que superan SQL_LENTA_MS van a SQL_LENTAS_ARCHIVO con su EXPLAIN QUERY PLAN
+app.config.setdefault('SQL_TRAZAS', True)
+app.config.setdefault('SQL_LENTA_MS', 100)
+app.config.setdefault('SQL_LENTAS_ARCHIVO', 'consultas_lentas.log')
+
+class PoolConexiones:
+    """Pool de conexiones SQLite reutilizables (los PRAGMA se aplican una sola vez por conexión)"""
+
+    def __init__(self, database, max_conexiones=8, busy_timeout_ms=5000, journal_mode='WAL'):
+        self.database = database
+        self.max_conexiones = max_conexiones
+        self.busy_timeout_ms = busy_timeout_ms
+        self.journal_mode = journal_mode
+        self._journal_aplicado = False
+        self._libres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = {
+            'creadas': 0,
+            'reutilizadas': 0,
+            'devueltas': 0,
+            'descartadas': 0,
+            'en_uso': 0
+        }
+
+    def conectar(self):
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+
+        # journal_mode es persistente en el archivo: basta con fijarlo una vez
+        if self.journal_mode and not self._journal_aplicado:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            self._journal_aplicado = True
+        if (self.journal_mode or '').upper() == 'WAL':
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def obtener(self):
+        try:
+            conn = self._libres.get_nowait()
+            reutilizada = True
+        except queue.Empty:
+            conn = self.conectar()
+            reutilizada = False
+
+        with self._lock:
+            self._stats['reutilizadas' if reutilizada else 'creadas'] += 1
+            self._stats['en_uso'] += 1
+        return conn
+
+    def devolver(self, conn):
+        # Nunca devolver al pool una transacción a medias
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+
+        with self._lock:
+            self._stats['en_uso'] -= 1
+            lleno = self._libres.qsize() >= self.max_conexiones
+            self._stats['descartadas' if lleno else 'devueltas'] += 1
+
+        if lleno:
+            conn.close()
+        else:
+            self._libres.put(conn)
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._stats['en_uso'] -= 1
+            self._stats['descartadas'] += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def cerrar_todas(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['libres'] = self._libres.qsize()
+        stats['max_conexiones'] = self.max_conexiones
+        stats['busy_timeout_ms'] = self.busy_timeout_ms
+        stats['journal_mode'] = self.journal_mode
+        stats['database'] = self.database
+        return stats
+
+class ConexionCompartida:
+    """Conexión del pool compartida por todos los helpers de un mismo request.
+
+    close() solo descarta lo no confirmado; la conexión vuelve al pool al
+    terminar el contexto de la aplicación.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *args):
+        return self._conn.__exit__(*args)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obtener_pool():
+    """Pool asociado a la base de datos configurada actualmente"""
+    database = app.config['DATABASE']
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                pool = PoolConexiones(database,
+                                      max_conexiones=app.config['DB_POOL_MAX'],
+                                      busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+                                      journal_mode=app.config['DB_JOURNAL_MODE'])
+                _pools[database] = pool
+    return pool
+
+_trazadores_sql = {}
+
+def trazador_sql():
+    database = app.config['DATABASE']
+    if database not in _trazadores_sql:
+        _trazadores_sql.setdefault(database, TrazadorSQL(umbral_lento_ms=app.config['SQL_LENTA_MS'],
+                                                         archivo_lentas=app.config['SQL_LENTAS_ARCHIVO']))
+    return _trazadores_sql[database]
+
 def get_db_connection():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+    # Fuera de un contexto de Flask (scripts, init_db directo) se usa una conexión propia
+    if not has_app_context():
+        return obtener_pool().conectar()
 
-# ========== INICIALIZACIÓN DB ==========
-def init_db():
-    conn = get_db_connection()
-    c = conn.cursor()
+    if '_db_conn' not in g:
+        g._db_pool = obtener_pool()
+        g._db_raw = g._db_pool.obtener()
+        conn = g._db_raw
+        if app.config['SQL_TRAZAS']:
+            g._sql_registros = []
+            conn = ConexionTrazada(conn, g._sql_registros)
+        g._db_conn = ConexionCompartida(conn)
+    return g._db_conn
+
+@app.teardown_appcontext
+def liberar_conexion(exception):
+    conn = g.pop('_db_conn', None)
+    if conn is None:
+        return
+    
+    raw = g.pop('_db_raw')
+    registros = g.pop('_sql_registros', None)
+    if registros:
+        try:
+            trazador_sql().acumular(registros, raw, request.endpoint if has_request_context() else None)
+        except Exception as e:
+            print(f"Error acumulando trazas SQL: {e}")
+    g.pop('_db_pool').devolver(raw)
+
+def totales_sql():
+    """(sentencias, milisegundos) ejecutados hasta ahora por el request actual"""
+    registros = g.get('_sql_registros') or []
+    return len(registros), sum(r.duracion_ms for r in registros)
+
+def ejecutar_con_reintentos(operacion, *args, **kwargs):
+    """Ejecuta una escritura reintentando con backoff exponencial si la base está bloqueada.
 
-    # Crear tablas básicas
-    c.executescript('''
-    CREATE TABLE IF NOT EXISTS usuarios (
+    La operación debe ser atómica (hacer rollback propio si falla) para poder repetirse.
+    """
+    intentos = app.config['DB_REINTENTOS']
+    espera = app.config['DB_REINTENTO_ESPERA_S']
+
+    for intento in range(intentos + 1):
+        try:
+            return operacion(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            mensaje = str(e).lower()
+            if intento == intentos or ('locked' not in mensaje and 'busy' not in mensaje):
+                raise
+            registro_metricas().incrementar('systec_db_reintentos_total')
+            time.sleep(espera * (2 ** intento) * (1 + random.random()))
+
+def iniciar_escritura(cursor):
+    """BEGIN IMMEDIATE registrando cuánto se esperó el bloqueo de escritura (busy_timeout incluido)"""
+    inicio = time.perf_counter()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+    finally:
+        registro_metricas().observar('systec_db_espera_bloqueo_segundos', time.perf_counter() - inicio,
+                                     BUCKETS_ESPERA)
+
+# ========== INICIALIZACIÓN DB (MIGRACIONES) ==========
+# El esquema se versiona en schema_version. init_db() compara la versión de la
+# base con la última migración registrada y, si ya está al día, no hace nada
+# más: el arranque cuesta una consulta. Las bases anteriores a este sistema
+# están en la versión 0 y reciben todas las migraciones (son idempotentes).
+# Para cambiar el esquema se agrega una migración nueva al final; nunca se
+# modifica una ya publicada.
+migraciones = Migraciones()
+
+ESQUEMA_BASE = [
+    """CREATE TABLE IF NOT EXISTS usuarios (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT UNIQUE NOT NULL,
         password_hash TEXT NOT NULL,
         rol TEXT DEFAULT 'vendedor'
-    );
-    CREATE TABLE IF NOT EXISTS configuracion (
+    )""",
+    """CREATE TABLE IF NOT EXISTS configuracion (
         id INTEGER PRIMARY KEY,
         nombre_empresa TEXT,
         logo_path TEXT,
@@ -47,8 +276,8 @@ def init_db():
         colores_personalizados TEXT,
         modo_oscuro INTEGER DEFAULT 1,
         umbral_stock_minimo INTEGER DEFAULT 5
-    );
-    CREATE TABLE IF NOT EXISTS productos (
+    )""",
+    """CREATE TABLE IF NOT EXISTS productos (
         id INTEGER PRIMARY KEY,
         nombre TEXT NOT NULL,
         precio REAL,
@@ -59,8 +288,8 @@ def init_db():
         codigo_barras TEXT,
         descripcion TEXT,
         fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    CREATE TABLE IF NOT EXISTS ventas (
+    )""",
+    """CREATE TABLE IF NOT EXISTS ventas (
         id INTEGER PRIMARY KEY,
         fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         total REAL,
@@ -70,8 +299,8 @@ def init_db():
         cliente_id INTEGER,
         FOREIGN KEY (usuario_id) REFERENCES usuarios(id),
         FOREIGN KEY (cliente_id) REFERENCES clientes(id)
-    );
-    CREATE TABLE IF NOT EXISTS detalle_ventas (
+    )""",
+    """CREATE TABLE IF NOT EXISTS detalle_ventas (
         id INTEGER PRIMARY KEY,
         venta_id INTEGER,
         producto_id INTEGER,
@@ -80,8 +309,8 @@ def init_db():
         subtotal REAL,
         FOREIGN KEY (venta_id) REFERENCES ventas(id),
         FOREIGN KEY (producto_id) REFERENCES productos(id)
-    );
-    CREATE TABLE IF NOT EXISTS caja (
+    )""",
+    """CREATE TABLE IF NOT EXISTS caja (
         id INTEGER PRIMARY KEY,
         apertura TIMESTAMP,
         cierre TIMESTAMP,
@@ -89,23 +318,23 @@ def init_db():
         monto_final REAL,
         usuario_id INTEGER,
         FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-    );
-    CREATE TABLE IF NOT EXISTS licencia (
+    )""",
+    """CREATE TABLE IF NOT EXISTS licencia (
         id INTEGER PRIMARY KEY,
         uuid TEXT,
         tipo TEXT,
         fecha_inicio TEXT,
         fecha_fin TEXT
-    );
-    CREATE TABLE IF NOT EXISTS clientes (
+    )""",
+    """CREATE TABLE IF NOT EXISTS clientes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         nombre TEXT NOT NULL,
         telefono TEXT,
         email TEXT,
         direccion TEXT,
         fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    CREATE TABLE IF NOT EXISTS logs (
+    )""",
+    """CREATE TABLE IF NOT EXISTS logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         usuario_id INTEGER,
         accion TEXT,
@@ -114,122 +343,650 @@ def init_db():
         detalles TEXT,
         fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-    );
-    CREATE TABLE IF NOT EXISTS categorias (
+    )""",
+    """CREATE TABLE IF NOT EXISTS categorias (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         nombre TEXT UNIQUE NOT NULL,
         descripcion TEXT,
         activa INTEGER DEFAULT 1
-    );
-    ''')
+    )""",
+    """CREATE TABLE IF NOT EXISTS ventas_resumen_diario (
+        dia TEXT NOT NULL,
+        metodo_pago TEXT NOT NULL DEFAULT '',
+        cantidad INTEGER NOT NULL DEFAULT 0,
+        total REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, metodo_pago)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS ventas_uuid (
+        uuid TEXT PRIMARY KEY,
+        venta_id INTEGER NOT NULL,
+        FOREIGN KEY (venta_id) REFERENCES ventas(id)
+    ) WITHOUT ROWID""",
+]
 
-    # Insertar configuración inicial solo si no existe
-    try:
-        c.execute("SELECT COUNT(*) FROM configuracion")
-        config_count = c.fetchone()[0]
-        if config_count == 0:
-            # Intentar estructura clave-valor
-            c.execute("INSERT INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)", 
-                     ('empresa_nombre', 'SysTec Ventas', 'Nombre de la empresa'))
-            c.execute("INSERT INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)", 
-                     ('modo_oscuro', 'true', 'Modo oscuro activo'))
-            c.execute("INSERT INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)", 
-                     ('umbral_stock_minimo', '5', 'Umbral mínimo de stock'))
-    except:
-        # Si falla, intentar estructura tradicional
-        try:
-            c.execute("INSERT OR IGNORE INTO configuracion (id, nombre_empresa, modo_oscuro, umbral_stock_minimo) VALUES (1, 'SysTec Ventas', 1, 5)")
-        except:
-            pass
+CATEGORIAS_DEFAULT = [
+    ('Bebidas', 'Bebidas y refrescos'),
+    ('Alimentos', 'Productos alimentarios'),
+    ('Limpieza', 'Productos de limpieza'),
+    ('Cuidado Personal', 'Productos de higiene y cuidado'),
+    ('Electronica', 'Productos electrónicos'),
+    ('General', 'Productos varios')
+]
+
+def columnas_tabla(conn, tabla):
+    return {col[1] for col in conn.execute(f"PRAGMA table_info({tabla})").fetchall()}
+
+@migraciones.registrar(1, 'Tablas base')
+def _migracion_tablas_base(conn):
+    for sentencia in ESQUEMA_BASE:
+        conn.execute(sentencia)
+
+@migraciones.registrar(2, 'Columna ventas.pagado en bases antiguas')
+def _migracion_ventas_pagado(conn):
+    if 'pagado' not in columnas_tabla(conn, 'ventas'):
+        conn.execute("ALTER TABLE ventas ADD COLUMN pagado INTEGER DEFAULT 1")
+
+@migraciones.registrar(3, 'Datos iniciales: configuración, usuarios, categorías y licencia')
+def _migracion_datos_iniciales(conn):
+    if not conn.execute("SELECT 1 FROM configuracion LIMIT 1").fetchone():
+        if _esquema_configuracion(conn) == 'clave_valor':
+            conn.executemany("INSERT INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)", [
+                ('empresa_nombre', 'SysTec Ventas', 'Nombre de la empresa'),
+                ('modo_oscuro', 'true', 'Modo oscuro activo'),
+                ('umbral_stock_minimo', '5', 'Umbral mínimo de stock')
+            ])
+        else:
+            conn.execute("INSERT INTO configuracion (id, nombre_empresa, modo_oscuro, umbral_stock_minimo) "
+                         "VALUES (1, 'SysTec Ventas', 1, 5)")
     
-    c.execute("INSERT OR IGNORE INTO usuarios (username, password_hash, rol) VALUES (?, ?, ?)", ('admin', generate_password_hash('admin123'), 'admin'))
-    c.execute("INSERT OR IGNORE INTO usuarios (username, password_hash, rol) VALUES (?, ?, ?)", ('systec_root', generate_password_hash('qwer1234'), 'root'))
-
-    # Categorías por defecto
-    categorias_default = [
-        ('Bebidas', 'Bebidas y refrescos'),
-        ('Alimentos', 'Productos alimentarios'),
-        ('Limpieza', 'Productos de limpieza'),
-        ('Cuidado Personal', 'Productos de higiene y cuidado'),
-        ('Electronica', 'Productos electrónicos'),
-        ('General', 'Productos varios')
-    ]
+    # El hash cuesta decenas de milisegundos: solo se calcula si el usuario falta
+    for username, clave, rol in (('admin', 'admin123', 'admin'), ('systec_root', 'qwer1234', 'root')):
+        if not conn.execute("SELECT 1 FROM usuarios WHERE username = ?", (username,)).fetchone():
+            conn.execute("INSERT INTO usuarios (username, password_hash, rol) VALUES (?, ?, ?)",
+                         (username, generate_password_hash(clave), rol))
+    
+    conn.executemany("INSERT OR IGNORE INTO categorias (nombre, descripcion) VALUES (?, ?)", CATEGORIAS_DEFAULT)
     
-    for nombre, descripcion in categorias_default:
-        c.execute("INSERT OR IGNORE INTO categorias (nombre, descripcion) VALUES (?, ?)", (nombre, descripcion))
-
     # Licencia de prueba
-    existe_licencia = c.execute("SELECT COUNT(*) FROM licencia").fetchone()[0]
-    if not existe_licencia:
+    if not conn.execute("SELECT 1 FROM licencia LIMIT 1").fetchone():
         hoy = datetime.today()
         fin = hoy + timedelta(days=7)
-        c.execute("INSERT INTO licencia (uuid, tipo, fecha_inicio, fecha_fin) VALUES (?, ?, ?, ?)",
-                  (str(uuid.uuid4()), 'temporal', hoy.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')))
+        conn.execute("INSERT INTO licencia (uuid, tipo, fecha_inicio, fecha_fin) VALUES (?, ?, ?, ?)",
+                     (str(uuid.uuid4()), 'temporal', hoy.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')))
 
-    conn.commit()
-    conn.close()
-    print("✅ Base de datos inicializada correctamente.")
+@migraciones.registrar(4, 'Índices de consultas frecuentes')
+def _migracion_indices(conn):
+    crear_indices(conn.cursor())
 
-# ========== FUNCIONES DE CONFIGURACIÓN ==========
-def cargar_configuracion():
+@migraciones.registrar(5, 'Búsqueda de productos con FTS5')
+def _migracion_busqueda(conn):
+    crear_indice_busqueda(conn.cursor())
+
+@migraciones.registrar(6, 'Resumen diario de ventas a partir del historial')
+def _migracion_resumen_diario(conn):
+    yield from reconstruir_resumen_diario_por_lotes(conn)
+
+@migraciones.registrar(7, 'Seguimiento de cambios del catálogo para el POS')
+def _migracion_catalogo(conn):
+    crear_seguimiento_catalogo(conn.cursor())
+
+def init_db():
+    """Lleva la base a la última versión del esquema (no hace nada si ya está al día)"""
     conn = get_db_connection()
+    try:
+        aplicadas = migraciones.aplicar(conn)
+    finally:
+        conn.close()
+    
+    if aplicadas:
+        print(f"✅ Base de datos migrada a la versión {aplicadas[-1].version} "
+              f"({len(aplicadas)} migraciones aplicadas).")
+
+@app.cli.command('migrar')
+@click.option('--estado', is_flag=True, help='Solo mostrar la versión actual y las migraciones pendientes')
+def migrar_comando(estado):
+    """Aplica las migraciones de esquema pendientes"""
+    conn = get_db_connection()
+    try:
+        actual = migraciones.version_actual(conn)
+        pendientes = migraciones.pendientes(conn)
+        click.echo(f"📂 {app.config['DATABASE']}: versión {actual} de {migraciones.ultima_version}")
+        if estado:
+            for migracion in pendientes:
+                click.echo(f"   ⏳ {migracion.version}: {migracion.descripcion}")
+            return
+        aplicadas = migraciones.aplicar(conn, progreso=click.echo)
+    finally:
+        conn.close()
+    click.echo(f"✅ {len(aplicadas)} migraciones aplicadas" if aplicadas else "✅ La base ya está al día")
+
+# ========== ÍNDICES ==========
+# Las consultas calientes filtran ventas por rango de fecha, unen detalle_ventas
+# por venta/producto y recorren solo productos activos.
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_detalle_venta ON detalle_ventas(venta_id)",
+    "CREATE INDEX IF NOT EXISTS idx_detalle_producto_venta ON detalle_ventas(producto_id, venta_id)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_activos_nombre ON productos(nombre) WHERE activo = 1",
+    "CREATE INDEX IF NOT EXISTS idx_productos_activos_stock ON productos(stock) WHERE activo = 1",
+    "CREATE INDEX IF NOT EXISTS idx_productos_activos_categoria ON productos(categoria, nombre) WHERE activo = 1",
+    # Orden de los listados paginados (nombre, id)
+    "CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos(nombre)",
+    "CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes(nombre)",
+    # Retención de logs: borrado por lotes en orden de fecha
+    "CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs(fecha)",
+]
+
+def crear_indices(cursor):
+    for sentencia in INDICES:
+        cursor.execute(sentencia)
+
+    # Código de barras único (los productos sin código se guardan como '')
+    try:
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_codigo_barras
+            ON productos(codigo_barras) WHERE codigo_barras != ''
+        """)
+    except sqlite3.IntegrityError:
+        print("⚠️  Hay códigos de barras duplicados: se crea un índice no único")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_productos_codigo_barras_dup
+            ON productos(codigo_barras) WHERE codigo_barras != ''
+        """)
+
+# ========== BÚSQUEDA DE PRODUCTOS (FTS5) ==========
+# productos_fts es un índice de texto completo con contenido externo sobre
+# productos, sincronizado por triggers. unicode61 con remove_diacritics hace la
+# búsqueda insensible a tildes ("cafe" encuentra "Café").
+BUSQUEDA_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+        nombre, descripcion, categoria, codigo_barras,
+        content='productos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO productos_fts (rowid, nombre, descripcion, categoria, codigo_barras)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria, new.codigo_barras);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, categoria, codigo_barras)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria, old.codigo_barras);
+    END""",
+    # Solo columnas indexadas: los descuentos de stock del checkout no tocan el índice
+    """CREATE TRIGGER IF NOT EXISTS productos_fts_au
+    AFTER UPDATE OF nombre, descripcion, categoria, codigo_barras ON productos BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, categoria, codigo_barras)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria, old.codigo_barras);
+        INSERT INTO productos_fts (rowid, nombre, descripcion, categoria, codigo_barras)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria, new.codigo_barras);
+    END""",
+]
+
+# Pesos bm25 por columna: nombre, descripcion, categoria, codigo_barras
+BUSQUEDA_ORDEN_BM25 = "bm25(productos_fts, 10.0, 1.0, 2.0, 5.0)"
+
+_fts_disponible = {}
+
+def crear_indice_busqueda(cursor):
+    existia = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'"
+    ).fetchone()
+    
+    try:
+        for sentencia in BUSQUEDA_FTS_SQL:
+            cursor.execute(sentencia)
+        if not existia:
+            cursor.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite compilado sin FTS5: las búsquedas siguen funcionando con LIKE
+        print(f"⚠️  Búsqueda de texto completo no disponible: {e}")
+    
+    _fts_disponible.pop(app.config['DATABASE'], None)
+
+def fts_disponible(conn):
+    database = app.config['DATABASE']
+    if database not in _fts_disponible:
+        _fts_disponible[database] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'"
+        ).fetchone() is not None
+    return _fts_disponible[database]
+
+def consulta_fts(texto):
+    """Convierte el texto del usuario en una consulta FTS5 de prefijos: 'coca 500' -> '"coca"* "500"*'"""
+    terminos = re.findall(r'\w+', texto, re.UNICODE)
+    if not terminos:
+        return None
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+def filtro_busqueda(conn, texto):
+    """(join, condición, params, orden) para buscar productos con alias `p`.
+
+    Con FTS5 se ordena por relevancia (bm25); sin él se recurre a LIKE.
+    """
+    if fts_disponible(conn):
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return '', '0', [], 'p.nombre'
+        return ("JOIN productos_fts ON productos_fts.rowid = p.id",
+                "productos_fts MATCH ?", [consulta],
+                f"{BUSQUEDA_ORDEN_BM25}, p.nombre")
+    
+    patron = f'%{texto}%'
+    return '', "(p.nombre LIKE ? OR p.codigo_barras LIKE ?)", [patron, patron], 'p.nombre'
+
+# ========== SEGUIMIENTO DE CAMBIOS DEL CATÁLOGO ==========
+# Cada alta, cambio o baja de un producto le asigna el siguiente número de
+# cambio en catalogo_cambios; la versión del catálogo es el máximo. Las
+# terminales del POS piden solo lo que cambió desde la versión que tienen
+# (/api/pos/catalogo?since=N). Va en una tabla aparte y no en una columna de
+# productos para que el descuento de stock del checkout no vuelva a escribir
+# la fila del producto, y para que un borrado deje rastro.
+CATALOGO_CAMBIOS_SQL = [
+    """CREATE TABLE IF NOT EXISTS catalogo_cambios (
+        producto_id INTEGER PRIMARY KEY,
+        cambio INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS catalogo_cambios_cambio ON catalogo_cambios(cambio)",
+    """CREATE TRIGGER IF NOT EXISTS productos_catalogo_ai AFTER INSERT ON productos BEGIN
+        INSERT OR REPLACE INTO catalogo_cambios (producto_id, cambio)
+        SELECT new.id, COALESCE(MAX(cambio), 0) + 1 FROM catalogo_cambios;
+    END""",
+    # Solo columnas que ve el POS: editar la descripción no obliga a resincronizar
+    """CREATE TRIGGER IF NOT EXISTS productos_catalogo_au
+    AFTER UPDATE OF nombre, precio, stock, categoria, codigo_barras, activo ON productos BEGIN
+        INSERT OR REPLACE INTO catalogo_cambios (producto_id, cambio)
+        SELECT new.id, COALESCE(MAX(cambio), 0) + 1 FROM catalogo_cambios;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS productos_catalogo_ad AFTER DELETE ON productos BEGIN
+        INSERT OR REPLACE INTO catalogo_cambios (producto_id, cambio)
+        SELECT old.id, COALESCE(MAX(cambio), 0) + 1 FROM catalogo_cambios;
+    END""",
+]
+
+def crear_seguimiento_catalogo(cursor):
+    for sentencia in CATALOGO_CAMBIOS_SQL:
+        cursor.execute(sentencia)
+    # Productos cargados sin los triggers (bases anteriores o carga masiva)
+    cursor.execute("""
+        INSERT OR IGNORE INTO catalogo_cambios (producto_id, cambio)
+        SELECT id, (SELECT COALESCE(MAX(cambio), 0) + 1 FROM catalogo_cambios) FROM productos
+    """)
+
+def version_catalogo(conn):
+    return conn.execute("SELECT COALESCE(MAX(cambio), 0) FROM catalogo_cambios").fetchone()[0]
+
+# ========== ÍNDICE DE CÓDIGOS DE BARRAS ==========
+EMOJIS_CATEGORIA = {
+    'Bebidas': '🥤',
+    'Alimentos': '🥖',
+    'Limpieza': '🧽',
+    'Cuidado Personal': '🧴',
+    'Electronica': '📱'
+}
+
+class IndiceCodigosBarras:
+    """Índice en memoria codigo_barras -> id de producto activo para la lectura del escáner.
+
+    Solo guarda el id: precio y stock salen de cache_productos(), así cada
+    producto tiene una sola copia en memoria. Se carga completo la primera
+    vez que se usa y antes de cada búsqueda aplica lo que cambió en
+    catalogo_cambios desde la última versión vista, releyendo solo esos
+    productos; así ve también las escrituras de otros procesos
+    (`flask importar-productos`, otra instancia sobre la misma base). Los
+    diccionarios solo se leen y modifican bajo `_lock`. Objetivo de
+    latencia: la búsqueda es un acceso a diccionario más la consulta de la
+    versión (< 0,1 ms en el servidor) y el escaneo completo escáner ->
+    carrito debe quedar por debajo de 5 ms p95 en la red local.
+    """
+    MAX_CAMBIOS = 5000
+
+    def __init__(self):
+        self._id_por_codigo = None
+        self._codigo_por_id = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {'busquedas': 0, 'no_encontrados': 0, 'cargas': 0, 'sincronizaciones': 0}
+
+    def _cargar(self, conn, version):
+        id_por_codigo = {}
+        codigo_por_id = {}
+        for row in conn.execute("""
+            SELECT id, codigo_barras
+            FROM productos
+            WHERE activo = 1 AND codigo_barras != ''
+        """).fetchall():
+            id_por_codigo[row['codigo_barras']] = row['id']
+            codigo_por_id[row['id']] = row['codigo_barras']
+        self._id_por_codigo = id_por_codigo
+        self._codigo_por_id = codigo_por_id
+        self._version = version
+        self._stats['cargas'] += 1
+
+    def _sincronizar(self, conn):
+        """Llamar con `_lock` tomado"""
+        version = version_catalogo(conn)
+        if self._id_por_codigo is None or version < self._version:
+            # Primera búsqueda, después de invalidar() o con la base restaurada
+            self._cargar(conn, version)
+            return
+        if version == self._version:
+            return
+
+        cambiados = [row[0] for row in conn.execute(
+            "SELECT producto_id FROM catalogo_cambios WHERE cambio > ? LIMIT ?",
+            (self._version, self.MAX_CAMBIOS + 1)
+        ).fetchall()]
+        if len(cambiados) > self.MAX_CAMBIOS:
+            self._cargar(conn, version)
+            return
+
+        filas = []
+        for i in range(0, len(cambiados), 500):
+            bloque = cambiados[i:i + 500]
+            filas.extend(conn.execute(
+                f"SELECT id, codigo_barras, activo FROM productos WHERE id IN ({','.join('?' * len(bloque))})",
+                bloque
+            ).fetchall())
+        for producto_id in cambiados:
+            codigo_anterior = self._codigo_por_id.pop(producto_id, None)
+            if codigo_anterior is not None and self._id_por_codigo.get(codigo_anterior) == producto_id:
+                del self._id_por_codigo[codigo_anterior]
+        for row in filas:
+            if row['activo'] == 1 and row['codigo_barras']:
+                self._id_por_codigo[row['codigo_barras']] = row['id']
+                self._codigo_por_id[row['id']] = row['codigo_barras']
+        self._version = version
+        self._stats['sincronizaciones'] += 1
+
+    def buscar(self, conn, codigo):
+        """Id del producto activo con ese código de barras, o None"""
+        with self._lock:
+            self._sincronizar(conn)
+            producto_id = self._id_por_codigo.get(codigo)
+            self._stats['busquedas'] += 1
+            if producto_id is None:
+                self._stats['no_encontrados'] += 1
+        return producto_id
+
+    def invalidar(self):
+        with self._lock:
+            self._id_por_codigo = None
+            self._codigo_por_id = {}
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats,
+                        cargado=self._id_por_codigo is not None,
+                        codigos=len(self._id_por_codigo or {}),
+                        version_catalogo=self._version)
+
+_indices_codigos = {}
+
+def indice_codigos():
+    database = app.config['DATABASE']
+    if database not in _indices_codigos:
+        _indices_codigos.setdefault(database, IndiceCodigosBarras())
+    return _indices_codigos[database]
+
+# ========== CACHÉ DE PRODUCTOS ==========
+# Lecturas por id de verificar_stock y de las búsquedas del POS. Las rutas que
+# escriben productos (crear, editar, eliminar, activar, actualizar_stock,
+# checkout, importación) invalidan después de confirmar; lo que escriben otros
+# procesos se detecta con la versión de catalogo_cambios en cada lectura.
+app.config.setdefault('PRODUCTOS_CACHE_MAX', 5000)
+
+_caches_productos = {}
+
+def cache_productos():
+    database = app.config['DATABASE']
+    if database not in _caches_productos:
+        _caches_productos.setdefault(database, CacheProductos(app.config['PRODUCTOS_CACHE_MAX']))
+    return _caches_productos[database]
+
+# ========== PAGINACIÓN (KEYSET) ==========
+# Los listados se recorren por cursor sobre la clave de orden ((fecha, id) para
+# ventas, (nombre, id) para productos y clientes) en lugar de OFFSET, así cada
+# página cuesta lo mismo sin importar cuán profunda sea.
+PAGINA_TAMANO = 50
+PAGINA_TAMANO_MAXIMO = 200
+CONTEOS_TTL_S = 60
+
+_conteos_cache = {}
+_conteos_cache_stats = {'aciertos': 0, 'fallos': 0}
+
+def tamano_pagina():
+    try:
+        limite = int(request.args.get('limite', PAGINA_TAMANO))
+    except ValueError:
+        limite = PAGINA_TAMANO
+    return max(1, min(limite, PAGINA_TAMANO_MAXIMO))
+
+def codificar_cursor(*valores):
+    return base64.urlsafe_b64encode(json.dumps(valores, default=str).encode()).decode()
+
+def decodificar_cursor(cursor, cantidad=2):
+    """Valores del cursor o None si no viene o es inválido"""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != cantidad:
+        return None
+    return valores
+
+def paginar(conn, query, params, cursor_columnas, limite):
+    """Ejecuta `query` (ya ordenada, sin LIMIT) y devuelve (filas, siguiente_cursor)"""
+    filas = conn.execute(f"{query} LIMIT ?", params + [limite + 1]).fetchall()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor(*[filas[-1][columna] for columna in cursor_columnas])
+    return filas, siguiente
+
+def contar_cacheado(conn, query, params):
+    """COUNT aproximado: se recalcula como mucho cada CONTEOS_TTL_S segundos"""
+    clave = (app.config['DATABASE'], query, tuple(params))
+    entrada = _conteos_cache.get(clave)
+    ahora = time.monotonic()
+    if entrada and ahora - entrada[1] < CONTEOS_TTL_S:
+        _conteos_cache_stats['aciertos'] += 1
+        return entrada[0]
+    
+    _conteos_cache_stats['fallos'] += 1
+    if len(_conteos_cache) > 256:
+        _conteos_cache.clear()
+    total = conn.execute(query, params).fetchone()[0]
+    _conteos_cache[clave] = (total, ahora)
+    return total
+
+# ========== FECHAS ==========
+# ventas.fecha se guarda como texto 'YYYY-MM-DD HH:MM:SS', así que los filtros
+# por día se expresan como rangos semiabiertos [inicio, fin) que usan el índice.
+def dia_siguiente(fecha):
+    """'2025-08-05' -> '2025-08-06'"""
+    return (datetime.strptime(fecha, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+def rango_dia(fecha):
+    return fecha, dia_siguiente(fecha)
+
+def rango_mes(fecha=None):
+    """Primer día del mes de `fecha` (datetime) y primer día del mes siguiente"""
+    fecha = fecha or datetime.now()
+    inicio = fecha.replace(day=1)
+    fin = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')
+
+def filtro_fechas(columna, desde=None, hasta=None):
+    """Condiciones SQL y parámetros para un filtro de fechas inclusivo desde/hasta"""
+    condiciones = []
+    params = []
     
-    # Intentar con estructura clave-valor primero
     try:
+        if desde:
+            datetime.strptime(desde, '%Y-%m-%d')
+            condiciones.append(f"{columna} >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append(f"{columna} < ?")
+            params.append(dia_siguiente(hasta))
+    except ValueError:
+        # Fecha mal formada: mismo resultado vacío que daba DATE(fecha) BETWEEN
+        return ["0"], []
+    
+    return condiciones, params
+
+# ========== RESUMEN DIARIO DE VENTAS ==========
+# ventas_resumen_diario guarda cantidad y total por día y método de pago. Se
+# actualiza en la misma transacción de cada venta, así que los KPIs y gráficos
+# leen unas pocas filas en lugar de recorrer todo el historial.
+def acumular_resumen_diario(cursor, fecha, metodo_pago, total):
+    cursor.execute("""
+        INSERT INTO ventas_resumen_diario (dia, metodo_pago, cantidad, total)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT (dia, metodo_pago) DO UPDATE SET
+            cantidad = cantidad + 1,
+            total = total + excluded.total
+    """, (fecha.strftime('%Y-%m-%d'), metodo_pago or '', total))
+
+def reconstruir_resumen_diario(cursor):
+    """Recalcula el resumen completo desde ventas. No hace commit."""
+    cursor.execute("DELETE FROM ventas_resumen_diario")
+    cursor.execute("""
+        INSERT INTO ventas_resumen_diario (dia, metodo_pago, cantidad, total)
+        SELECT DATE(fecha), COALESCE(metodo_pago, ''), COUNT(*), COALESCE(SUM(total), 0)
+        FROM ventas
+        WHERE fecha IS NOT NULL
+        GROUP BY DATE(fecha), COALESCE(metodo_pago, '')
+    """)
+    return cursor.rowcount
+
+def reconstruir_resumen_diario_por_lotes(conn, tamano_lote=50000):
+    """Igual que reconstruir_resumen_diario pero recorriendo ventas por rangos de id.
+
+    Generador: después de cada lote hace yield para que quien llama confirme
+    (ver Migraciones). No deja el resumen a medias si se repite desde cero.
+    """
+    conn.execute("DELETE FROM ventas_resumen_diario")
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ventas").fetchone()[0]
+    for desde in range(0, ultimo_id, tamano_lote):
+        conn.execute("""
+            INSERT INTO ventas_resumen_diario (dia, metodo_pago, cantidad, total)
+            SELECT DATE(fecha), COALESCE(metodo_pago, ''), COUNT(*), COALESCE(SUM(total), 0)
+            FROM ventas
+            WHERE id > ? AND id <= ? AND fecha IS NOT NULL
+            GROUP BY DATE(fecha), COALESCE(metodo_pago, '')
+            ON CONFLICT (dia, metodo_pago) DO UPDATE SET
+                cantidad = cantidad + excluded.cantidad,
+                total = total + excluded.total
+        """, (desde, desde + tamano_lote))
+        yield
+
+def resumen_ventas(conn, desde, hasta):
+    """Cantidad y total de ventas en [desde, hasta) leyendo el resumen diario"""
+    return conn.execute("""
+        SELECT COALESCE(SUM(cantidad), 0) as cantidad, COALESCE(SUM(total), 0) as total
+        FROM ventas_resumen_diario
+        WHERE dia >= ? AND dia < ?
+    """, (desde, hasta)).fetchone()
+
+@app.cli.command('reconstruir-resumen')
+def comando_reconstruir_resumen():
+    """Recalcula ventas_resumen_diario a partir del historial de ventas"""
+    conn = get_db_connection()
+    filas = reconstruir_resumen_diario(conn.cursor())
+    conn.commit()
+    conn.close()
+    print(f"✅ Resumen diario reconstruido: {filas} filas")
+
+# ========== FUNCIONES DE CONFIGURACIÓN ==========
+# Caché en proceso de la configuración: inject_globals la consulta en cada
+# render_template, así que solo se lee de la base después de una invalidación.
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+_config_cache_stats = {'aciertos': 0, 'fallos': 0}
+
+def _esquema_configuracion(conn):
+    """La tabla configuracion existe en formato clave-valor (bases antiguas) o por columnas"""
+    columnas = {col['name'] for col in conn.execute("PRAGMA table_info(configuracion)").fetchall()}
+    return 'clave_valor' if 'clave' in columnas else 'columnas'
+
+def _leer_configuracion(conn):
+    if _esquema_configuracion(conn) == 'clave_valor':
         config_data = {}
-        cursor = conn.cursor()
-        cursor.execute("SELECT clave, valor FROM configuracion WHERE clave IN (?, ?, ?)", 
-                      ('empresa_nombre', 'modo_oscuro', 'umbral_stock_minimo'))
-        for row in cursor.fetchall():
+        for row in conn.execute("SELECT clave, valor FROM configuracion WHERE clave IN (?, ?, ?)",
+                                ('empresa_nombre', 'modo_oscuro', 'umbral_stock_minimo')).fetchall():
             config_data[row[0]] = row[1]
         
-        conn.close()
-        
         return {
             "empresa_nombre": config_data.get('empresa_nombre', "SysTec Ventas"),
             "modo_oscuro": config_data.get('modo_oscuro', 'true').lower() == 'true',
             "umbral_stock_minimo": int(config_data.get('umbral_stock_minimo', 5))
         }
-    except:
-        # Fallback a estructura original
-        try:
-            config = conn.execute("SELECT * FROM configuracion WHERE id = 1").fetchone()
-            conn.close()
-            
-            if config:
-                return {
-                    "empresa_nombre": config['nombre_empresa'] or "SysTec Ventas",
-                    "modo_oscuro": bool(config['modo_oscuro']),
-                    "umbral_stock_minimo": config['umbral_stock_minimo'] or 5
-                }
-        except:
-            pass
-        
+    
+    config = conn.execute("SELECT * FROM configuracion WHERE id = 1").fetchone()
+    if config:
+        return {
+            "empresa_nombre": config['nombre_empresa'] or "SysTec Ventas",
+            "modo_oscuro": bool(config['modo_oscuro']),
+            "umbral_stock_minimo": config['umbral_stock_minimo'] or 5
+        }
+    return dict(CONFIGURACION_DEFAULT)
+
+def _entrada_configuracion():
+    database = app.config['DATABASE']
+    entrada = _config_cache.get(database)
+    if entrada is not None:
+        _config_cache_stats['aciertos'] += 1
+        return entrada
+    
+    _config_cache_stats['fallos'] += 1
+    try:
+        conn = get_db_connection()
+        config = _leer_configuracion(conn)
         conn.close()
-        return CONFIGURACION_DEFAULT
+    except sqlite3.Error as e:
+        print(f"Error cargando configuración: {e}")
+        # No cachear: se reintenta en el próximo acceso
+        return {'config': dict(CONFIGURACION_DEFAULT), 'logo_existe': False}
+    
+    entrada = {
+        'config': config,
+        'logo_existe': os.path.exists(os.path.join('static', 'empresa_logo.png'))
+    }
+    with _config_cache_lock:
+        _config_cache[database] = entrada
+    return entrada
+
+def invalidar_configuracion():
+    """Descartar la configuración cacheada (llamar después de cualquier escritura)"""
+    with _config_cache_lock:
+        _config_cache.pop(app.config['DATABASE'], None)
+    datos_modificados('configuracion')
+
+def cargar_configuracion():
+    return dict(_entrada_configuracion()['config'])
+
+def logo_empresa_existe():
+    return _entrada_configuracion()['logo_existe']
 
 def guardar_configuracion(nombre_empresa=None, modo_oscuro=None, umbral_stock=None):
     conn = get_db_connection()
-    cursor = conn.cursor()
     
-    # Intentar con estructura clave-valor
     try:
-        if nombre_empresa is not None:
-            cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)",
-                         ('empresa_nombre', nombre_empresa, 'Nombre de la empresa'))
-        if modo_oscuro is not None:
-            cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)",
-                         ('modo_oscuro', 'true' if modo_oscuro else 'false', 'Modo oscuro activo'))
-        if umbral_stock is not None:
-            cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)",
-                         ('umbral_stock_minimo', str(umbral_stock), 'Umbral mínimo de stock'))
-        
-        conn.commit()
-        conn.close()
-        return
-    except:
-        # Fallback a estructura original
-        try:
+        if _esquema_configuracion(conn) == 'clave_valor':
+            valores = []
+            if nombre_empresa is not None:
+                valores.append(('empresa_nombre', nombre_empresa, 'Nombre de la empresa'))
+            if modo_oscuro is not None:
+                valores.append(('modo_oscuro', 'true' if modo_oscuro else 'false', 'Modo oscuro activo'))
+            if umbral_stock is not None:
+                valores.append(('umbral_stock_minimo', str(umbral_stock), 'Umbral mínimo de stock'))
+            
+            conn.executemany("INSERT OR REPLACE INTO configuracion (clave, valor, descripcion) VALUES (?, ?, ?)",
+                             valores)
+        else:
             updates = []
             params = []
             
@@ -246,16 +1003,51 @@ def guardar_configuracion(nombre_empresa=None, modo_oscuro=None, umbral_stock=No
             if updates:
                 params.append(1)  # WHERE id = 1
                 conn.execute(f"UPDATE configuracion SET {', '.join(updates)} WHERE id = ?", params)
-                conn.commit()
-        except:
-            pass
         
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error guardando configuración: {e}")
+    finally:
         conn.close()
+        invalidar_configuracion()
 
 # ========== FUNCIÓN DE LOG ==========
+# Los logs se escriben desde un hilo de fondo en lotes (una transacción cada
+# LOGS_INTERVALO_MS o LOGS_MAX_LOTE filas); con LOGS_ASINCRONOS = False se
+# escriben en el momento, como antes.
+app.config.setdefault('LOGS_ASINCRONOS', True)
+app.config.setdefault('LOGS_INTERVALO_MS', 250)
+app.config.setdefault('LOGS_MAX_LOTE', 200)
+
+_escritores_logs = {}
+_escritores_logs_lock = threading.Lock()
+
+def escritor_logs():
+    database = app.config['DATABASE']
+    escritor = _escritores_logs.get(database)
+    if escritor is None:
+        with _escritores_logs_lock:
+            escritor = _escritores_logs.get(database)
+            if escritor is None:
+                escritor = EscritorLogs(obtener_pool().conectar,
+                                        intervalo_ms=app.config['LOGS_INTERVALO_MS'],
+                                        max_lote=app.config['LOGS_MAX_LOTE']).iniciar()
+                _escritores_logs[database] = escritor
+    return escritor
+
+@atexit.register
+def detener_escritores_logs():
+    """Vaciar las colas de logs al cerrar el proceso"""
+    for escritor in list(_escritores_logs.values()):
+        escritor.detener()
+
 def registrar_log(accion, tabla_afectada=None, registro_id=None, detalles=None):
     """Registrar actividad en el sistema"""
     try:
+        if app.config['LOGS_ASINCRONOS']:
+            escritor_logs().registrar(session.get('user_id'), accion, tabla_afectada, registro_id, detalles)
+            return
+        
         conn = get_db_connection()
         conn.execute("""
             INSERT INTO logs (usuario_id, accion, tabla_afectada, registro_id, detalles)
@@ -266,6 +1058,255 @@ def registrar_log(accion, tabla_afectada=None, registro_id=None, detalles=None):
     except Exception as e:
         print(f"Error registrando log: {e}")
 
+# ========== RETENCIÓN DE LOGS ==========
+# Los logs más viejos que LOGS_RETENCION_DIAS se archivan comprimidos por mes
+# en LOGS_ARCHIVO_DIRECTORIO (None = no archivar) y se borran de a
+# LOGS_RETENCION_LOTE filas desde un hilo de fondo, cada
+# LOGS_RETENCION_INTERVALO_H horas (0 = solo a pedido).
+app.config.setdefault('LOGS_RETENCION_DIAS', 90)
+app.config.setdefault('LOGS_RETENCION_LOTE', 2000)
+app.config.setdefault('LOGS_RETENCION_PAUSA_MS', 50)
+app.config.setdefault('LOGS_RETENCION_INTERVALO_H', 24)
+app.config.setdefault('LOGS_ARCHIVO_DIRECTORIO', 'archivo_logs')
+
+_retenciones_logs = {}
+_retenciones_logs_lock = threading.Lock()
+
+def retencion_logs():
+    database = app.config['DATABASE']
+    retencion = _retenciones_logs.get(database)
+    if retencion is None:
+        with _retenciones_logs_lock:
+            retencion = _retenciones_logs.get(database)
+            if retencion is None:
+                escritor = escritor_logs()
+                
+                def al_terminar(progreso):
+                    escritor.registrar(None, "Limpieza de logs", "sistema", None,
+                                       f"{progreso['eliminados']} logs eliminados, "
+                                       f"{progreso['archivados']} archivados, "
+                                       f"{progreso['bytes_liberados']} bytes liberados")
+                
+                retencion = RetencionLogs(obtener_pool().conectar,
+                                          dias=app.config['LOGS_RETENCION_DIAS'],
+                                          tamano_lote=app.config['LOGS_RETENCION_LOTE'],
+                                          pausa_ms=app.config['LOGS_RETENCION_PAUSA_MS'],
+                                          directorio_archivo=app.config['LOGS_ARCHIVO_DIRECTORIO'],
+                                          al_terminar=al_terminar)
+                if app.config['LOGS_RETENCION_INTERVALO_H']:
+                    retencion.programar(app.config['LOGS_RETENCION_INTERVALO_H'] * 3600)
+                _retenciones_logs[database] = retencion
+    return retencion
+
+@app.before_request
+def iniciar_retencion_logs():
+    """La retención programada arranca con el primer request (no en el proceso del reloader)"""
+    retencion_logs()
+
+@atexit.register
+def detener_retenciones_logs():
+    for retencion in list(_retenciones_logs.values()):
+        retencion.detener()
+
+@app.cli.command('limpiar-logs')
+@click.option('--dias', type=int, help='Conservar los logs de los últimos N días (por defecto LOGS_RETENCION_DIAS)')
+@click.option('--sin-archivo', is_flag=True, help='Borrar sin guardar los logs en archivo_logs/')
+def limpiar_logs_comando(dias, sin_archivo):
+    """Archiva y borra los logs viejos en lotes, mostrando el avance"""
+    def al_avanzar(progreso):
+        click.echo(f"   {progreso['eliminados']}/{progreso['pendientes']} logs eliminados")
+    
+    progreso = retencion_logs().ejecutar(dias, archivar=not sin_archivo, al_avanzar=al_avanzar)
+    if progreso is None:
+        raise click.ClickException("Ya hay una limpieza de logs en curso")
+    if progreso['estado'] == 'error':
+        raise click.ClickException(progreso['error'])
+    escritor_logs().vaciar()
+    
+    click.echo(f"✅ {progreso['eliminados']} logs anteriores a {progreso['limite_fecha']} eliminados "
+               f"en {progreso['lotes']} lotes, {progreso['bytes_liberados'] // 1024} KB liberados")
+    for archivo in progreso['archivos']:
+        click.echo(f"   📦 {archivo}")
+
+# ========== EVENTOS EN VIVO (SSE) ==========
+# Las ventas y cambios de stock se publican en un bus en memoria y /api/eventos
+# los reenvía a las terminales abiertas (POS, dashboard, reportes), que se
+# actualizan sin recargar la página.
+app.config.setdefault('EVENTOS_KEEPALIVE_S', 15)
+
+_buses_eventos = {}
+
+def bus_eventos():
+    database = app.config['DATABASE']
+    if database not in _buses_eventos:
+        _buses_eventos.setdefault(database, BusEventos())
+    return _buses_eventos[database]
+
+def publicar_cambios_stock(conn, cambios):
+    """Publicar {producto_id: (stock_anterior, stock_nuevo)} y los cruces del umbral de stock bajo"""
+    if not cambios:
+        return
+    
+    bus = bus_eventos()
+    bus.publicar('stock', {
+        'productos': [{'id': producto_id, 'stock': nuevo} for producto_id, (_, nuevo) in cambios.items()]
+    })
+    
+    umbral = cargar_configuracion()['umbral_stock_minimo']
+    cruces = {producto_id: nuevo for producto_id, (anterior, nuevo) in cambios.items()
+              if (anterior <= umbral) != (nuevo <= umbral)}
+    if not cruces:
+        return
+    
+    marcadores = ','.join('?' * len(cruces))
+    nombres = dict(conn.execute(
+        f"SELECT id, nombre FROM productos WHERE id IN ({marcadores})", list(cruces)
+    ).fetchall())
+    for producto_id, nuevo in cruces.items():
+        bus.publicar('stock_bajo', {
+            'id': producto_id,
+            'nombre': nombres.get(producto_id, ''),
+            'stock': nuevo,
+            'umbral': umbral,
+            'bajo': nuevo <= umbral
+        })
+
+def publicar_venta(conn, venta, metodo_pago, cliente_id):
+    cliente = None
+    if cliente_id:
+        cliente = conn.execute("SELECT nombre FROM clientes WHERE id = ?", (cliente_id,)).fetchone()
+    
+    bus_eventos().publicar('venta', {
+        'id': venta['venta_id'],
+        'fecha': venta['fecha'].strftime('%Y-%m-%d %H:%M:%S'),
+        'dia': venta['fecha'].strftime('%Y-%m-%d'),
+        'total': venta['total'],
+        'metodo_pago': metodo_pago,
+        'cliente_nombre': cliente['nombre'] if cliente else 'Cliente general',
+        'username': session.get('username')
+    })
+
+# ========== MÉTRICAS ==========
+# Contadores e histogramas en memoria del proceso: requests, errores y latencia
+# por endpoint, ventas por minuto, espera del bloqueo de escritura y aciertos de
+# los cachés. /metrics los expone en formato Prometheus y /api/sistema/info
+# como JSON. /metrics exige una sesión iniciada (incluye el importe vendido);
+# con METRICAS_TOKEN también acepta "Authorization: Bearer <token>" para que
+# Prometheus pueda leerlas sin sesión.
+app.config.setdefault('METRICAS_TOKEN', None)
+
+_metricas = RegistroMetricas()
+_metricas.describir('systec_http_requests_total', 'Requests atendidos por endpoint, metodo y codigo HTTP')
+_metricas.describir('systec_http_errores_total', 'Requests con error: HTTP 5xx o JSON con success false')
+_metricas.describir('systec_http_request_segundos', 'Latencia por endpoint hasta armar la respuesta')
+_metricas.describir('systec_sql_consultas_total', 'Sentencias SQL ejecutadas por endpoint')
+_metricas.describir('systec_ventas_total', 'Ventas registradas (pos: checkout en linea, lote: cola sin conexion)')
+_metricas.describir('systec_ventas_importe_total', 'Importe total de las ventas registradas')
+_metricas.describir('systec_ventas_rechazadas_total', 'Ventas rechazadas por stock, precio o pago')
+_metricas.describir('systec_ventas_duplicadas_total', 'Reintentos de ventas ya registradas (mismo UUID)')
+_metricas.describir('systec_checkout_segundos', 'Duracion de la transaccion de venta en la base')
+_metricas.describir('systec_db_espera_bloqueo_segundos', 'Espera de BEGIN IMMEDIATE por el bloqueo de escritura')
+_metricas.describir('systec_db_reintentos_total', 'Reintentos por base bloqueada en ejecutar_con_reintentos')
+
+def registro_metricas():
+    return _metricas
+
+def registrar_metricas_ventas(origen, cantidad, importe):
+    if cantidad:
+        _metricas.incrementar('systec_ventas_total', cantidad, origen=origen)
+        _metricas.incrementar('systec_ventas_importe_total', float(importe), origen=origen)
+        _metricas.registrar_tasa('ventas', cantidad)
+
+def formatear_uptime(segundos):
+    """93784 -> '1d 02:03:04'"""
+    dias, resto = divmod(int(segundos), 86400)
+    horas, resto = divmod(resto, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{dias}d {horas:02d}:{minutos:02d}:{segundos:02d}"
+
+def aciertos_caches():
+    """{cache: (aciertos, fallos)} de los cachés en memoria de la base actual"""
+    pool = obtener_pool().estadisticas()
+    fragmentos = cache_fragmentos().estadisticas()
+    productos = cache_productos().estadisticas()
+    return {
+        'configuracion': (_config_cache_stats['aciertos'], _config_cache_stats['fallos']),
+        'conteos': (_conteos_cache_stats['aciertos'], _conteos_cache_stats['fallos']),
+        'fragmentos': (fragmentos['aciertos'], fragmentos['fallos']),
+        'productos': (productos['aciertos'], productos['fallos']),
+        'pool_conexiones': (pool['reutilizadas'], pool['creadas'])
+    }
+
+def medidores_metricas():
+    """Valores instantáneos que se calculan al momento del scrape"""
+    caches = aciertos_caches()
+    pool = obtener_pool().estadisticas()
+    return [
+        ('systec_uptime_segundos', 'gauge', 'Segundos desde que arranco el proceso',
+         [({}, round(time.time() - _metricas.inicio, 3))]),
+        ('systec_cache_aciertos_total', 'counter', 'Lecturas resueltas desde cache',
+         [({'cache': nombre}, aciertos) for nombre, (aciertos, _) in caches.items()]),
+        ('systec_cache_fallos_total', 'counter', 'Lecturas que tuvieron que ir a la base',
+         [({'cache': nombre}, fallos) for nombre, (_, fallos) in caches.items()]),
+        ('systec_cache_entradas', 'gauge', 'Entradas guardadas en memoria por cache',
+         [({'cache': 'productos'}, cache_productos().estadisticas()['entradas']),
+          ({'cache': 'fragmentos'}, cache_fragmentos().estadisticas()['entradas'])]),
+        ('systec_db_pool_conexiones', 'gauge', 'Conexiones del pool por estado',
+         [({'estado': 'en_uso'}, pool['en_uso']), ({'estado': 'libres'}, pool['libres'])]),
+        ('systec_eventos_suscriptores', 'gauge', 'Terminales conectadas al stream de eventos',
+         [({}, bus_eventos().estadisticas()['suscriptores'])]),
+        ('systec_logs_cola', 'gauge', 'Logs esperando ser escritos',
+         [({}, escritor_logs().estadisticas()['profundidad'])])
+    ]
+
+def _resumen_histograma(histograma):
+    if histograma is None or not histograma.cantidad:
+        return {'cantidad': 0, 'promedio_ms': 0, 'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+    return {
+        'cantidad': histograma.cantidad,
+        'promedio_ms': round(histograma.suma / histograma.cantidad * 1000, 3),
+        'p50_ms': round(histograma.percentil(50) * 1000, 3),
+        'p95_ms': round(histograma.percentil(95) * 1000, 3),
+        'p99_ms': round(histograma.percentil(99) * 1000, 3)
+    }
+
+def resumen_metricas():
+    """Las mismas métricas de /metrics en JSON (percentiles estimados por bucket)"""
+    errores = {}
+    for etiquetas, cantidad in _metricas.series('systec_http_errores_total').items():
+        endpoint = dict(etiquetas)['endpoint']
+        errores[endpoint] = errores.get(endpoint, 0) + cantidad
+    
+    endpoints = []
+    for etiquetas, histograma in _metricas.series('systec_http_request_segundos').items():
+        endpoint = dict(etiquetas)['endpoint']
+        resumen = _resumen_histograma(histograma)
+        resumen['requests'] = resumen.pop('cantidad')
+        endpoints.append(dict(resumen, endpoint=endpoint, errores=errores.get(endpoint, 0)))
+    endpoints.sort(key=lambda e: e['requests'], reverse=True)
+    
+    def total(nombre):
+        return sum(_metricas.series(nombre).values())
+    
+    espera = _metricas.series('systec_db_espera_bloqueo_segundos').get(())
+    checkout = _metricas.series('systec_checkout_segundos').get(())
+    return {
+        'endpoints': endpoints,
+        'checkout': dict(_resumen_histograma(checkout),
+                         ventas=total('systec_ventas_total'),
+                         importe=round(total('systec_ventas_importe_total'), 2),
+                         rechazadas=total('systec_ventas_rechazadas_total'),
+                         duplicadas=total('systec_ventas_duplicadas_total'),
+                         por_minuto={'1m': _metricas.tasa('ventas', 1),
+                                     '5m': _metricas.tasa('ventas', 5),
+                                     '15m': _metricas.tasa('ventas', 15)}),
+        'espera_bloqueo': dict(_resumen_histograma(espera),
+                               reintentos=_metricas.contador('systec_db_reintentos_total')),
+        'caches': {nombre: {'aciertos': aciertos, 'fallos': fallos,
+                            'tasa_aciertos': round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None}
+                   for nombre, (aciertos, fallos) in aciertos_caches().items()}
+    }
+
 # ========== MIDDLEWARE DE AUTENTICACIÓN ==========
 def requiere_login(f):
     def wrapper(*args, **kwargs):
@@ -331,10 +1372,8 @@ def dashboard():
     
     # Estadísticas de hoy
     hoy = datetime.now().strftime('%Y-%m-%d')
-    stats_hoy = conn.execute("""
-        SELECT COUNT(*) as ventas_hoy, COALESCE(SUM(total),0) as total_hoy
-        FROM ventas WHERE DATE(fecha) = ?
-    """, (hoy,)).fetchone()
+    resumen_hoy = resumen_ventas(conn, *rango_dia(hoy))
+    stats_hoy = {'ventas_hoy': resumen_hoy['cantidad'], 'total_hoy': resumen_hoy['total']}
     
     # Productos con stock bajo
     config = cargar_configuracion()
@@ -366,7 +1405,8 @@ def dashboard():
                          productos_bajos=productos_bajos,
                          productos_activos=productos_activos,
                          ultimas_ventas=ultimas_ventas,
-                         umbral=umbral)
+                         umbral=umbral,
+                         hoy=hoy)
 
 # ========== VENTAS ==========
 @app.route('/punto_venta')
@@ -414,25 +1454,16 @@ def detalle_venta(venta_id):
     return render_template('detalle_venta.html', venta=venta, detalles=detalles)
 
 # ========== PRODUCTOS MEJORADO ==========
-@app.route('/productos')
-@requiere_login
-def productos():
-    conn = get_db_connection()
-    
-    # Filtros
-    categoria_filtro = request.args.get('categoria', '')
-    busqueda = request.args.get('busqueda', '')
-    estado = request.args.get('estado', 'activos')
-    
-    # Query base
-    query = """
-        SELECT p.*, c.nombre as categoria_nombre
-        FROM productos p
-        LEFT JOIN categorias c ON c.nombre = p.categoria
-    """
-    
+def consulta_productos(conn, categoria_filtro, busqueda, estado, cursor=None):
+    """Query del listado de productos ordenada por (nombre, id) y sus parámetros"""
     conditions = []
     params = []
+    join_busqueda = ''
+    
+    if busqueda:
+        join_busqueda, condicion, params_busqueda, _ = filtro_busqueda(conn, busqueda)
+        conditions.append(condicion)
+        params.extend(params_busqueda)
     
     # Aplicar filtros
     if estado == 'activos':
@@ -444,16 +1475,38 @@ def productos():
         conditions.append("p.categoria = ?")
         params.append(categoria_filtro)
     
-    if busqueda:
-        conditions.append("(p.nombre LIKE ? OR p.codigo_barras LIKE ?)")
-        params.extend([f'%{busqueda}%', f'%{busqueda}%'])
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    conteo = f"SELECT COUNT(*) FROM productos p {join_busqueda}{where}"
+    conteo_params = list(params)
+    
+    if cursor:
+        conditions.append("(p.nombre, p.id) > (?, ?)")
+        params.extend(cursor)
     
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = f"""
+        SELECT p.*, c.nombre as categoria_nombre
+        FROM productos p
+        {join_busqueda}
+        LEFT JOIN categorias c ON c.nombre = p.categoria
+        {where}
+        ORDER BY p.nombre, p.id
+    """
+    return query, params, conteo, conteo_params
+
+@app.route('/productos')
+@requiere_login
+def productos():
+    conn = get_db_connection()
     
-    query += " ORDER BY p.nombre"
+    # Filtros
+    categoria_filtro = request.args.get('categoria', '')
+    busqueda = request.args.get('busqueda', '')
+    estado = request.args.get('estado', 'activos')
     
-    productos = conn.execute(query, params).fetchall()
+    query, params, conteo, conteo_params = consulta_productos(conn, categoria_filtro, busqueda, estado)
+    productos, siguiente_cursor = paginar(conn, query, params, ('nombre', 'id'), tamano_pagina())
+    total_productos = contar_cacheado(conn, conteo, conteo_params)
     
     # Obtener categorías para el filtro
     categorias = conn.execute("SELECT nombre FROM categorias WHERE activa = 1 ORDER BY nombre").fetchall()
@@ -467,7 +1520,31 @@ def productos():
                          umbral=config['umbral_stock_minimo'],
                          categoria_actual=categoria_filtro,
                          busqueda_actual=busqueda,
-                         estado_actual=estado)
+                         estado_actual=estado,
+                         siguiente_cursor=siguiente_cursor,
+                         total_productos=total_productos)
+
+@app.route('/api/productos/pagina')
+@requiere_login
+def api_productos_pagina():
+    """Página siguiente del listado de productos ("cargar más")"""
+    conn = get_db_connection()
+    query, params, conteo, conteo_params = consulta_productos(
+        conn,
+        request.args.get('categoria', ''),
+        request.args.get('busqueda', ''),
+        request.args.get('estado', 'activos'),
+        decodificar_cursor(request.args.get('cursor'))
+    )
+    productos, siguiente_cursor = paginar(conn, query, params, ('nombre', 'id'), tamano_pagina())
+    total = contar_cacheado(conn, conteo, conteo_params)
+    conn.close()
+    
+    return jsonify({
+        'items': [dict(p) for p in productos],
+        'siguiente': siguiente_cursor,
+        'total_aproximado': total
+    })
 
 @app.route('/productos/crear', methods=['GET', 'POST'])
 @requiere_login
@@ -521,6 +1598,7 @@ def crear_producto():
             
             producto_id = cursor.lastrowid
             conn.commit()
+            datos_modificados('productos')
             conn.close()
             
             registrar_log("Producto creado", "productos", producto_id, f"Nombre: {nombre}, Categoría: {categoria}")
@@ -596,6 +1674,8 @@ def editar_producto(id):
             """, (nombre, precio, precio_costo, stock, categoria, codigo_barras, descripcion, activo, id))
             
             conn.commit()
+            cache_productos().invalidar(id)
+            datos_modificados('productos')
             conn.close()
             
             registrar_log("Producto editado", "productos", id, f"Nombre: {nombre}")
@@ -630,6 +1710,8 @@ def eliminar_producto(id):
         # Marcar como inactivo en lugar de eliminar
         conn.execute("UPDATE productos SET activo = 0 WHERE id = ?", (id,))
         conn.commit()
+        cache_productos().invalidar(id)
+        datos_modificados('productos')
         conn.close()
         
         registrar_log("Producto eliminado", "productos", id, f"Nombre: {producto['nombre']}")
@@ -655,6 +1737,8 @@ def activar_producto(id):
         
         conn.execute("UPDATE productos SET activo = 1 WHERE id = ?", (id,))
         conn.commit()
+        cache_productos().invalidar(id)
+        datos_modificados('productos')
         conn.close()
         
         registrar_log("Producto reactivado", "productos", id, f"Nombre: {producto['nombre']}")
@@ -669,13 +1753,40 @@ def activar_producto(id):
 # [Aquí continúa el resto del código original sin la ruta nueva_venta]
 
 # ========== CLIENTES ==========
+def pagina_clientes(conn, cursor=None):
+    query = "SELECT * FROM clientes"
+    params = []
+    if cursor:
+        query += " WHERE (nombre, id) > (?, ?)"
+        params.extend(cursor)
+    query += " ORDER BY nombre, id"
+    
+    clientes, siguiente_cursor = paginar(conn, query, params, ('nombre', 'id'), tamano_pagina())
+    total = contar_cacheado(conn, "SELECT COUNT(*) FROM clientes", [])
+    return clientes, siguiente_cursor, total
+
 @app.route('/clientes')
 @requiere_login
 def clientes():
     conn = get_db_connection()
-    clientes = conn.execute("SELECT * FROM clientes ORDER BY nombre").fetchall()
+    clientes, siguiente_cursor, total_clientes = pagina_clientes(conn)
     conn.close()
-    return render_template('clientes.html', clientes=clientes)
+    return render_template('clientes.html', clientes=clientes,
+                           siguiente_cursor=siguiente_cursor,
+                           total_clientes=total_clientes)
+
+@app.route('/api/clientes/pagina')
+@requiere_login
+def api_clientes_pagina():
+    """Página siguiente del listado de clientes ("cargar más")"""
+    conn = get_db_connection()
+    clientes, siguiente_cursor, total = pagina_clientes(conn, decodificar_cursor(request.args.get('cursor')))
+    conn.close()
+    return jsonify({
+        'items': [dict(c) for c in clientes],
+        'siguiente': siguiente_cursor,
+        'total_aproximado': total
+    })
 
 @app.route('/clientes/agregar', methods=['POST'])
 @requiere_login
@@ -696,6 +1807,7 @@ def agregar_cliente():
     cliente_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    datos_modificados('clientes')
     
     registrar_log("Cliente agregado", "clientes", cliente_id, f"Nombre: {nombre}")
     flash(f'Cliente "{nombre}" agregado correctamente.', 'success')
@@ -715,6 +1827,7 @@ def configuracion():
         if logo and logo.filename:
             logo_path = os.path.join('static', 'empresa_logo.png')
             logo.save(logo_path)
+            invalidar_configuracion()
         
         guardar_configuracion(nombre_empresa, modo_oscuro, umbral_stock)
         registrar_log("Configuración actualizada", "configuracion", 1)
@@ -723,6 +1836,18 @@ def configuracion():
     
     config = cargar_configuracion()
     return render_template('configuracion.html', config=config)
+
+@app.route('/configuracion/exportar')
+@requiere_login
+def exportar_configuracion():
+    """Descargar la configuración actual como JSON (botón de la pestaña Backup)"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return Response(
+        json.dumps(cargar_configuracion(), ensure_ascii=False, indent=2, default=str),
+        mimetype='application/json',
+        headers={'Content-Disposition': f'attachment; filename=configuracion_{timestamp}.json'}
+    )
+
 @app.route('/configuracion/validar', methods=['POST'])
 @requiere_login
 def validar_configuracion():
@@ -742,16 +1867,53 @@ def validar_configuracion():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
     
+# ========== CACHÉ DE FRAGMENTOS ==========
+# Partes de las plantillas que cambian poco (clientes y barra de categorías
+# del POS, navegación) se guardan ya renderizadas. La clave incluye la
+# versión de cada tabla que el fragmento muestra y las rutas de escritura
+# llaman a datos_modificados(), así que un cambio nunca se sirve viejo.
+# Los datos se pasan a la plantilla como funciones: en un acierto no se
+# ejecuta ni la consulta ni el render. Uso en la plantilla:
+#   {% call fragmento('pos_clientes', 'clientes') %}{{ clientes_pos()|tojson }}{% endcall %}
+app.config.setdefault('FRAGMENTOS_MAX', 128)
+app.config.setdefault('FRAGMENTOS_TTL_S', 300)
+
+_versiones_datos = {}
+_caches_fragmentos = {}
+
+def versiones_datos():
+    database = app.config['DATABASE']
+    if database not in _versiones_datos:
+        _versiones_datos.setdefault(database, VersionesDatos())
+    return _versiones_datos[database]
+
+def cache_fragmentos():
+    database = app.config['DATABASE']
+    if database not in _caches_fragmentos:
+        _caches_fragmentos.setdefault(database, CacheFragmentos(app.config['FRAGMENTOS_MAX'],
+                                                                app.config['FRAGMENTOS_TTL_S']))
+    return _caches_fragmentos[database]
+
+def datos_modificados(*tablas):
+    """Llamar después de confirmar una escritura sobre `tablas` ('productos', 'stock', 'clientes', ...)"""
+    versiones_datos().incrementar(*tablas)
+
+@app.template_global()
+def fragmento(nombre, *tablas, variante=None, caller=None):
+    # La versión se lee antes de generar: si una escritura llega en el medio,
+    # el fragmento queda guardado con la versión vieja y no se vuelve a servir
+    clave = (nombre, variante, versiones_datos().version(*tablas))
+    return Markup(cache_fragmentos().obtener(clave, caller))
+
 # ========== CONTEXT PROCESSOR ==========
 @app.context_processor
 def inject_globals():
     config = cargar_configuracion()
-    logo_exists = os.path.exists('static/empresa_logo.png')
     
     return dict(
         empresa_nombre=config['empresa_nombre'],
         modo_oscuro=config['modo_oscuro'],
-        empresa_logo='empresa_logo.png' if logo_exists else None,
+        empresa_logo='empresa_logo.png' if logo_empresa_existe() else None,
         usuario_actual=session.get('username', ''),
         rol_actual=session.get('rol', ''),
         umbral_stock=config['umbral_stock_minimo']
@@ -762,14 +1924,56 @@ def inject_globals():
 @requiere_login
 def pos():  # <-- NOMBRE CORRECTO
     """Interfaz moderna de punto de venta"""
-    conn = get_db_connection()
-    productos = conn.execute("SELECT * FROM productos WHERE activo = 1 AND stock > 0 ORDER BY nombre").fetchall()
-    clientes = conn.execute("SELECT id, nombre FROM clientes ORDER BY nombre").fetchall()
-    categorias = conn.execute("SELECT DISTINCT categoria FROM productos WHERE activo = 1 AND categoria IS NOT NULL ORDER BY categoria").fetchall()
-    conn.close()
-    return render_template('pos.html', productos=productos, clientes=clientes, categorias=categorias)
+    # Cada función corre solo si su fragmento no está en caché (ver CACHÉ DE FRAGMENTOS)
+    def consultar(query):
+        conn = get_db_connection()
+        filas = conn.execute(query).fetchall()
+        conn.close()
+        return filas
+    
+    # El catálogo no viaja en la página: la terminal lo sincroniza con /api/pos/catalogo
+    def clientes_pos():
+        return [{'id': c['id'], 'nombre': c['nombre']}
+                for c in consultar("SELECT id, nombre FROM clientes ORDER BY nombre")]
+    
+    def categorias_pos():
+        return [c['categoria'] for c in consultar("""
+            SELECT DISTINCT categoria FROM productos
+            WHERE activo = 1 AND categoria IS NOT NULL AND categoria != '' ORDER BY categoria
+        """)]
+    
+    return render_template('pos.html', clientes_pos=clientes_pos, categorias_pos=categorias_pos)
 
 # ========== VENTAS (HISTORIAL) ==========
+def pagina_ventas(conn, fecha_desde, fecha_hasta, cursor=None):
+    """Una página del historial ordenado por (fecha, id) descendente"""
+    query = """
+        SELECT v.id, v.fecha, v.total, v.metodo_pago, u.username,
+               COALESCE(c.nombre, 'Cliente general') as cliente_nombre
+        FROM ventas v 
+        LEFT JOIN usuarios u ON u.id = v.usuario_id 
+        LEFT JOIN clientes c ON c.id = v.cliente_id
+    """
+    
+    condiciones, params = filtro_fechas('v.fecha', fecha_desde, fecha_hasta)
+    if cursor:
+        condiciones.append("(v.fecha, v.id) < (?, ?)")
+        params.extend(cursor)
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    
+    query += " ORDER BY v.fecha DESC, v.id DESC"
+    
+    return paginar(conn, query, params, ('fecha', 'id'), tamano_pagina())
+
+def contar_ventas(conn, fecha_desde, fecha_hasta):
+    """Total del período leído del resumen diario (sin recorrer ventas)"""
+    condiciones, params = filtro_fechas('dia', fecha_desde, fecha_hasta)
+    where = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+    return conn.execute(
+        f"SELECT COALESCE(SUM(cantidad), 0) FROM ventas_resumen_diario{where}", params
+    ).fetchone()[0]
+
 @app.route('/ventas')
 @requiere_login
 def ventas():
@@ -780,111 +1984,521 @@ def ventas():
     fecha_desde = request.args.get('desde', '')
     fecha_hasta = request.args.get('hasta', '')
     
-    # Query base
-    query = """
-        SELECT v.id, v.fecha, v.total, v.metodo_pago, u.username,
-               COALESCE(c.nombre, 'Cliente general') as cliente_nombre
-        FROM ventas v 
-        LEFT JOIN usuarios u ON u.id = v.usuario_id 
-        LEFT JOIN clientes c ON c.id = v.cliente_id
+    ventas, siguiente_cursor = pagina_ventas(conn, fecha_desde, fecha_hasta)
+    total_ventas = contar_ventas(conn, fecha_desde, fecha_hasta)
+    conn.close()
+    
+    return render_template('ventas.html', 
+                         ventas=ventas,
+                         fecha_desde=fecha_desde,
+                         fecha_hasta=fecha_hasta,
+                         siguiente_cursor=siguiente_cursor,
+                         total_ventas=total_ventas)
+
+@app.route('/api/ventas/pagina')
+@requiere_login
+def api_ventas_pagina():
+    """Página siguiente del historial de ventas ("cargar más")"""
+    fecha_desde = request.args.get('desde', '')
+    fecha_hasta = request.args.get('hasta', '')
+    
+    conn = get_db_connection()
+    ventas, siguiente_cursor = pagina_ventas(conn, fecha_desde, fecha_hasta,
+                                             decodificar_cursor(request.args.get('cursor')))
+    total = contar_ventas(conn, fecha_desde, fecha_hasta)
+    conn.close()
+    
+    return jsonify({
+        'items': [{
+            'id': v['id'],
+            'fecha': str(v['fecha']) if v['fecha'] else None,
+            'total': v['total'],
+            'metodo_pago': v['metodo_pago'],
+            'username': v['username'],
+            'cliente_nombre': v['cliente_nombre']
+        } for v in ventas],
+        'siguiente': siguiente_cursor,
+        'total_aproximado': total
+    })
+
+# ========== API ENDPOINTS ==========
+@app.route('/api/productos/buscar')
+@requiere_login
+def buscar_productos():
+    """API para buscar productos (para autocompletado)"""
+    query = request.args.get('q', '').strip()
+    if len(query) < 2:
+        return jsonify([])
+    
+    conn = get_db_connection()
+    join_busqueda, condicion, params, orden = filtro_busqueda(conn, query)
+    ids = [row['id'] for row in conn.execute(f"""
+        SELECT p.id
+        FROM productos p
+        {join_busqueda}
+        WHERE p.activo = 1 AND {condicion}
+        ORDER BY {orden}
+        LIMIT 10
+    """, params).fetchall()]
+    conn.close()
+    
+    productos = cache_productos().obtener_varios(ids, get_db_connection)
+    return jsonify([{
+        'id': p['id'],
+        'nombre': p['nombre'],
+        'precio': p['precio'],
+        'stock': p['stock']
+    } for p in (productos[i] for i in ids if i in productos)])
+
+@app.route('/api/pos/productos')
+@requiere_login
+def api_pos_productos():
+    """API para obtener productos para el POS"""
+    busqueda = request.args.get('q', '').strip()
+    categoria = request.args.get('categoria', '')
+    
+    conn = get_db_connection()
+    
+    # La base solo resuelve qué ids coinciden; las filas salen del caché de productos
+    join_busqueda, condicion, params, orden = '', '1', [], 'p.nombre'
+    if busqueda:
+        join_busqueda, condicion, params, orden = filtro_busqueda(conn, busqueda)
+    
+    query = "SELECT p.id FROM productos p " + join_busqueda + " WHERE p.activo = 1 AND p.stock > 0 AND " + condicion
+    
+    if categoria:
+        query += " AND p.categoria = ?"
+        params.append(categoria)
+    
+    query += f" ORDER BY {orden} LIMIT 50"
+    
+    ids = [row['id'] for row in conn.execute(query, params).fetchall()]
+    conn.close()
+    
+    cache = cache_productos()
+    # Un número también puede ser el código interno (id) que muestra el POS
+    if busqueda.isdigit() and int(busqueda) not in ids:
+        por_id = cache.obtener(int(busqueda), get_db_connection)
+        if (por_id and por_id['activo'] == 1 and por_id['stock'] > 0
+                and (not categoria or por_id['categoria'] == categoria)):
+            ids = [por_id['id']] + ids[:49]
+    
+    productos = cache.obtener_varios(ids, get_db_connection)
+    
+    return jsonify([{
+        'id': p['id'],
+        'nombre': p['nombre'],
+        'precio': float(p['precio']),
+        'stock': p['stock'],
+        'categoria': p['categoria'],
+        'emoji': EMOJIS_CATEGORIA.get(p['categoria'], '📦'),
+        'codigo': str(p['id']).zfill(3)
+    } for p in (productos[i] for i in ids if i in productos)])
+
+# ========== SINCRONIZACIÓN DEL CATÁLOGO (POS) ==========
+# Las terminales guardan el catálogo en IndexedDB y buscan localmente: una
+# descarga completa al día y, en cada apertura del POS, solo los cambios.
+app.config.setdefault('CATALOGO_DELTA_MAXIMO', 2000)
+
+CATALOGO_COLUMNAS = ('id', 'nombre', 'precio', 'stock', 'categoria', 'codigo_barras')
+
+@app.route('/api/pos/catalogo')
+@requiere_login
+def api_pos_catalogo():
+    """Catálogo de productos activos con su versión; con ?since=N solo lo que cambió después de N.
+
+    La versión se lee antes que las filas: si una escritura llega en el medio
+    la fila ya viene actualizada y el próximo delta la repite, nunca se pierde.
+    Si `since` es más nuevo que la base (se restauró un backup) o hay más de
+    CATALOGO_DELTA_MAXIMO cambios se responde el catálogo completo.
+    """
+    since = request.args.get('since', type=int)
+    
+    conn = get_db_connection()
+    version = version_catalogo(conn)
+    
+    cambios = None
+    if since is not None and 0 < since <= version:
+        limite = app.config['CATALOGO_DELTA_MAXIMO']
+        cambios = conn.execute("""
+            SELECT c.producto_id, p.nombre, p.precio, p.stock, p.categoria, p.codigo_barras, p.activo
+            FROM catalogo_cambios c
+            LEFT JOIN productos p ON p.id = c.producto_id
+            WHERE c.cambio > ?
+            ORDER BY c.cambio
+            LIMIT ?
+        """, (since, limite + 1)).fetchall()
+        if len(cambios) > limite:
+            cambios = None
+    
+    if cambios is None:
+        filas = conn.execute("""
+            SELECT id, nombre, precio, stock, categoria, codigo_barras
+            FROM productos WHERE activo = 1 ORDER BY id
+        """).fetchall()
+        conn.close()
+        return jsonify({
+            'version': version,
+            'completo': True,
+            'columnas': CATALOGO_COLUMNAS,
+            'productos': [list(fila) for fila in filas],
+            'bajas': [],
+            'emojis': EMOJIS_CATEGORIA
+        })
+    conn.close()
+    
+    # Desactivados y borrados se informan como bajas
+    return jsonify({
+        'version': version,
+        'completo': False,
+        'columnas': CATALOGO_COLUMNAS,
+        'productos': [list(fila)[:len(CATALOGO_COLUMNAS)] for fila in cambios if fila['activo'] == 1],
+        'bajas': [fila['producto_id'] for fila in cambios if fila['activo'] != 1],
+        'emojis': EMOJIS_CATEGORIA
+    })
+
+# Ventas por request en /api/pos/ventas/lote
+app.config.setdefault('POS_LOTE_MAXIMO', 500)
+
+class VentaRechazadaError(Exception):
+    """La venta no puede registrarse (producto inexistente, stock o pago insuficiente)"""
+
+def agrupar_carrito(carrito):
+    """Une las líneas repetidas del carrito: {producto_id: {'nombre', 'cantidad'}}"""
+    lineas = {}
+    for item in carrito:
+        producto_id = int(item['id'])
+        cantidad = int(item['cantidad'])
+        if cantidad <= 0:
+            raise VentaRechazadaError(f'Cantidad inválida para {item.get("nombre", producto_id)}')
+        linea = lineas.setdefault(producto_id, {'nombre': item.get('nombre', str(producto_id)), 'cantidad': 0})
+        linea['cantidad'] += cantidad
+    return lineas
+
+def cargar_productos_venta(cursor, ids):
+    """Precio y stock de los productos del carrito en consultas IN (...) por bloques"""
+    productos = {}
+    ids = list(ids)
+    for i in range(0, len(ids), 500):
+        bloque = ids[i:i + 500]
+        marcadores = ','.join('?' * len(bloque))
+        for row in cursor.execute(
+            f"SELECT id, precio, stock FROM productos WHERE id IN ({marcadores}) AND activo = 1",
+            bloque
+        ).fetchall():
+            productos[row['id']] = row
+    return productos
+
+def cargar_clientes_venta(cursor, ids):
+    """Ids de `ids` que existen en clientes (un cliente pudo borrarse mientras la terminal no tenía conexión)"""
+    existentes = set()
+    ids = list(ids)
+    for i in range(0, len(ids), 500):
+        bloque = ids[i:i + 500]
+        marcadores = ','.join('?' * len(bloque))
+        existentes.update(row['id'] for row in cursor.execute(
+            f"SELECT id FROM clientes WHERE id IN ({marcadores})", bloque
+        ).fetchall())
+    return existentes
+
+def cliente_venta(valor):
+    """cliente_id enviado por la terminal como entero; None es el cliente general"""
+    if valor is None or valor == '':
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise VentaRechazadaError('Cliente inválido')
+
+def validar_uuid_venta(valor):
+    """Normaliza el UUID generado por la terminal (clave de idempotencia)"""
+    try:
+        return str(uuid.UUID(str(valor)))
+    except (ValueError, TypeError, AttributeError):
+        raise VentaRechazadaError('UUID de venta inválido')
+
+def fecha_venta(valor):
+    """Fecha en que la terminal hizo la venta; si falta o no es válida, ahora"""
+    ahora = datetime.now()
+    if not valor:
+        return ahora
+    try:
+        fecha = datetime.fromisoformat(str(valor))
+    except ValueError:
+        return ahora
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone().replace(tzinfo=None)
+    # Un reloj adelantado no puede dejar ventas en el futuro
+    return min(fecha, ahora)
+
+def buscar_ventas_uuid(cursor, uuids):
+    """{uuid: fila de la venta ya registrada con ese UUID}"""
+    encontradas = {}
+    uuids = list(uuids)
+    for i in range(0, len(uuids), 500):
+        bloque = uuids[i:i + 500]
+        marcadores = ','.join('?' * len(bloque))
+        for row in cursor.execute(f"""
+            SELECT vu.uuid, v.id, v.total, v.fecha
+            FROM ventas_uuid vu
+            JOIN ventas v ON v.id = vu.venta_id
+            WHERE vu.uuid IN ({marcadores})
+        """, bloque).fetchall():
+            encontradas[row['uuid']] = row
+    return encontradas
+
+def monto_recibido(valor):
+    """Dinero entregado por el cliente como float; vacío o None cuenta como 0"""
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        raise VentaRechazadaError('Monto recibido inválido')
+
+def validar_venta(lineas, productos, metodo_pago, dinero_recibido):
+    """Valida el carrito contra precio y stock en memoria; devuelve (total, detalles)"""
+    total = 0
+    detalles_venta = []
+    
+    for producto_id, linea in lineas.items():
+        producto = productos.get(producto_id)
+        
+        if not producto:
+            raise VentaRechazadaError(f'Producto {linea["nombre"]} no encontrado')
+        
+        if producto['stock'] < linea['cantidad']:
+            raise VentaRechazadaError(f'Stock insuficiente para {linea["nombre"]}')
+        
+        precio = float(producto['precio'])
+        subtotal = precio * linea['cantidad']
+        total += subtotal
+        detalles_venta.append((producto_id, linea['cantidad'], precio, subtotal))
+    
+    # Validar pago en efectivo
+    if metodo_pago == 'efectivo':
+        if monto_recibido(dinero_recibido) < total:
+            raise VentaRechazadaError('Dinero insuficiente')
+    
+    return total, detalles_venta
+
+def insertar_venta(cursor, fecha, total, usuario_id, metodo_pago, cliente_id, detalles_venta, venta_uuid=None):
+    """Inserta venta, detalle, resumen diario y UUID. No toca el stock ni hace commit."""
+    cursor.execute("""
+        INSERT INTO ventas (fecha, total, usuario_id, metodo_pago, cliente_id, pagado)
+        VALUES (?, ?, ?, ?, ?, 1)
+    """, (fecha, total, usuario_id, metodo_pago, cliente_id))
+    
+    venta_id = cursor.lastrowid
+    acumular_resumen_diario(cursor, fecha, metodo_pago, total)
+    
+    cursor.executemany("""
+        INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio_unitario, subtotal)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(venta_id,) + detalle for detalle in detalles_venta])
+    
+    if venta_uuid:
+        cursor.execute("INSERT INTO ventas_uuid (uuid, venta_id) VALUES (?, ?)", (venta_uuid, venta_id))
+    
+    return venta_id
+
+def descontar_stock_venta(cursor, cantidades):
+    """Descuento condicional {producto_id: cantidad}: si alguna fila no se actualiza, el stock ya no alcanzaba"""
+    cursor.executemany("""
+        UPDATE productos SET stock = stock - ?
+        WHERE id = ? AND activo = 1 AND stock >= ?
+    """, [(cantidad, producto_id, cantidad) for producto_id, cantidad in cantidades.items()])
+    
+    if cursor.rowcount != len(cantidades):
+        raise VentaRechazadaError('Stock insuficiente: el inventario cambió durante la venta')
+
+def registrar_venta(conn, carrito, metodo_pago, cliente_id, dinero_recibido, usuario_id, venta_uuid=None):
+    """Registra una venta de forma atómica.
+
+    BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer el stock, y el
+    descuento condicional (stock >= cantidad) con verificación de rowcount
+    garantiza que dos terminales nunca vendan la misma unidad. Todo el carrito
+    se lee en una consulta y se escribe con executemany.
+
+    Con `venta_uuid` la operación es idempotente: si ese UUID ya se registró se
+    devuelve la venta original con 'duplicada': True.
+
+    Devuelve {'venta_id', 'fecha', 'total', 'lineas', 'stock', 'duplicada', 'tiempos_ms'};
+    'stock' tiene el stock anterior y el nuevo de cada producto vendido.
     """
+    tiempos = {}
+    inicio = time.perf_counter()
     
-    params = []
-    
-    # Aplicar filtros de fecha si están presentes
-    if fecha_desde and fecha_hasta:
-        query += " WHERE DATE(v.fecha) BETWEEN ? AND ?"
-        params = [fecha_desde, fecha_hasta]
-    elif fecha_desde:
-        query += " WHERE DATE(v.fecha) >= ?"
-        params = [fecha_desde]
-    elif fecha_hasta:
-        query += " WHERE DATE(v.fecha) <= ?"
-        params = [fecha_hasta]
+    def marcar(etapa):
+        nonlocal inicio
+        ahora = time.perf_counter()
+        tiempos[etapa] = round((ahora - inicio) * 1000, 3)
+        inicio = ahora
     
-    query += " ORDER BY v.fecha DESC"
+    lineas = agrupar_carrito(carrito)
     
-    ventas = conn.execute(query, params).fetchall()
-    conn.close()
+    cursor = conn.cursor()
+    iniciar_escritura(cursor)
+    marcar('bloqueo')
     
-    return render_template('ventas.html', 
-                         ventas=ventas,
-                         fecha_desde=fecha_desde,
-                         fecha_hasta=fecha_hasta)
+    try:
+        if venta_uuid:
+            existente = buscar_ventas_uuid(cursor, [venta_uuid]).get(venta_uuid)
+            if existente:
+                conn.rollback()
+                return {
+                    'venta_id': existente['id'],
+                    'fecha': existente['fecha'],
+                    'total': existente['total'],
+                    'lineas': {},
+                    'stock': {},
+                    'duplicada': True,
+                    'tiempos_ms': tiempos
+                }
+        
+        productos = cargar_productos_venta(cursor, lineas.keys())
+        marcar('lectura')
+        
+        total, detalles_venta = validar_venta(lineas, productos, metodo_pago, dinero_recibido)
+        marcar('validacion')
+        
+        fecha = datetime.now()
+        venta_id = insertar_venta(cursor, fecha, total, usuario_id, metodo_pago, cliente_id,
+                                  detalles_venta, venta_uuid)
+        descontar_stock_venta(cursor, {producto_id: linea['cantidad'] for producto_id, linea in lineas.items()})
+        marcar('escritura')
+        
+        conn.commit()
+        marcar('commit')
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return {
+        'venta_id': venta_id,
+        'fecha': fecha,
+        'total': total,
+        'lineas': {producto_id: linea['cantidad'] for producto_id, linea in lineas.items()},
+        'stock': {producto_id: (productos[producto_id]['stock'], productos[producto_id]['stock'] - linea['cantidad'])
+                  for producto_id, linea in lineas.items()},
+        'duplicada': False,
+        'tiempos_ms': tiempos
+    }
 
-# ========== API ENDPOINTS ==========
-@app.route('/api/productos/buscar')
-@requiere_login
-def buscar_productos():
-    """API para buscar productos (para autocompletado)"""
-    query = request.args.get('q', '').strip()
-    if len(query) < 2:
-        return jsonify([])
-    
-    conn = get_db_connection()
-    productos = conn.execute("""
-        SELECT id, nombre, precio, stock
-        FROM productos 
-        WHERE activo = 1 AND (nombre LIKE ? OR codigo_barras LIKE ?)
-        ORDER BY nombre 
-        LIMIT 10
-    """, (f'%{query}%', f'%{query}%')).fetchall()
-    conn.close()
-    
-    return jsonify([{
-        'id': p['id'],
-        'nombre': p['nombre'],
-        'precio': p['precio'],
-        'stock': p['stock']
-    } for p in productos])
+def registrar_ventas_lote(conn, ventas, usuario_id):
+    """Registra en una sola transacción las ventas encoladas por una terminal.
 
-@app.route('/api/pos/productos')
-@requiere_login
-def api_pos_productos():
-    """API para obtener productos para el POS"""
-    busqueda = request.args.get('q', '').strip()
-    categoria = request.args.get('categoria', '')
-    
-    conn = get_db_connection()
-    
-    query = """
-        SELECT id, nombre, precio, stock, categoria,
-               CASE 
-                   WHEN categoria = 'Bebidas' THEN '🥤'
-                   WHEN categoria = 'Alimentos' THEN '🥖'
-                   WHEN categoria = 'Limpieza' THEN '🧽'
-                   WHEN categoria = 'Cuidado Personal' THEN '🧴'
-                   WHEN categoria = 'Electronica' THEN '📱'
-                   ELSE '📦'
-               END as emoji
-        FROM productos 
-        WHERE activo = 1 AND stock > 0
+    Cada venta trae su UUID: las ya registradas se informan como 'duplicada'
+    sin volver a grabarse, y las que no pasan la validación como 'rechazada'
+    sin afectar al resto del lote. El stock se valida en memoria venta por
+    venta (en orden) y se descuenta al final con un único executemany; el
+    cliente también se verifica en memoria, así un cliente borrado mientras la
+    terminal no tenía conexión rechaza esa venta y no la transacción entera.
+
+    Devuelve (resultados, registradas, stock): un resultado por venta en el
+    mismo orden, las ventas grabadas y {producto_id: (stock_anterior, stock_nuevo)}.
     """
+    resultados = [None] * len(ventas)
+    pendientes = []
     
-    params = []
-    
-    if busqueda:
-        query += " AND (nombre LIKE ? OR CAST(id as TEXT) LIKE ? OR codigo_barras LIKE ?)"
-        params.extend([f'%{busqueda}%', f'%{busqueda}%', f'%{busqueda}%'])
+    for posicion, venta in enumerate(ventas):
+        try:
+            if not isinstance(venta, dict):
+                raise VentaRechazadaError('Formato de venta inválido')
+            venta_uuid = validar_uuid_venta(venta.get('uuid'))
+            cliente_id = cliente_venta(venta.get('cliente_id'))
+            lineas = agrupar_carrito(venta.get('carrito') or [])
+            if not lineas:
+                raise VentaRechazadaError('Carrito vacío')
+        except VentaRechazadaError as e:
+            resultados[posicion] = {'uuid': venta.get('uuid') if isinstance(venta, dict) else None,
+                                    'estado': 'rechazada', 'error': str(e)}
+            continue
+        except (KeyError, TypeError, ValueError):
+            resultados[posicion] = {'uuid': venta.get('uuid'), 'estado': 'rechazada', 'error': 'Carrito inválido'}
+            continue
+        pendientes.append((posicion, venta_uuid, lineas, cliente_id, venta))
     
-    if categoria:
-        query += " AND categoria = ?"
-        params.append(categoria)
+    cursor = conn.cursor()
+    iniciar_escritura(cursor)
     
-    query += " ORDER BY nombre LIMIT 50"
+    try:
+        existentes = buscar_ventas_uuid(cursor, {venta_uuid for _, venta_uuid, _, _, _ in pendientes})
+        ids = {producto_id for _, _, lineas, _, _ in pendientes for producto_id in lineas}
+        productos = {producto_id: dict(row) for producto_id, row in cargar_productos_venta(cursor, ids).items()}
+        clientes = cargar_clientes_venta(cursor, {cliente_id for _, _, _, cliente_id, _ in pendientes
+                                                  if cliente_id is not None})
+        stock_inicial = {producto_id: producto['stock'] for producto_id, producto in productos.items()}
+        
+        registradas = []
+        vistos = {}
+        for posicion, venta_uuid, lineas, cliente_id, venta in pendientes:
+            if venta_uuid in existentes:
+                existente = existentes[venta_uuid]
+                resultados[posicion] = {'uuid': venta_uuid, 'estado': 'duplicada',
+                                        'venta_id': existente['id'], 'total': existente['total']}
+                continue
+            if venta_uuid in vistos:
+                resultados[posicion] = dict(resultados[vistos[venta_uuid]], estado='duplicada')
+                continue
+            
+            metodo_pago = venta.get('metodo_pago', 'efectivo')
+            try:
+                if cliente_id is not None and cliente_id not in clientes:
+                    raise VentaRechazadaError(f'Cliente {cliente_id} no encontrado')
+                total, detalles_venta = validar_venta(lineas, productos, metodo_pago, venta.get('dinero_recibido', 0))
+            except VentaRechazadaError as e:
+                resultados[posicion] = {'uuid': venta_uuid, 'estado': 'rechazada', 'error': str(e)}
+                continue
+            
+            fecha = fecha_venta(venta.get('fecha'))
+            venta_id = insertar_venta(cursor, fecha, total, usuario_id, metodo_pago, cliente_id,
+                                      detalles_venta, venta_uuid)
+            for producto_id, linea in lineas.items():
+                productos[producto_id]['stock'] -= linea['cantidad']
+            
+            vistos[venta_uuid] = posicion
+            resultados[posicion] = {'uuid': venta_uuid, 'estado': 'registrada', 'venta_id': venta_id, 'total': total}
+            registradas.append({'venta_id': venta_id, 'fecha': fecha, 'total': total,
+                                'metodo_pago': metodo_pago, 'cliente_id': cliente_id,
+                                'lineas': {producto_id: linea['cantidad'] for producto_id, linea in lineas.items()}})
+        
+        stock = {producto_id: (stock_inicial[producto_id], producto['stock'])
+                 for producto_id, producto in productos.items()
+                 if producto['stock'] != stock_inicial[producto_id]}
+        descontar_stock_venta(cursor, {producto_id: anterior - nuevo for producto_id, (anterior, nuevo) in stock.items()})
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     
-    productos = conn.execute(query, params).fetchall()
+    return resultados, registradas, stock
+
+@app.route('/api/pos/codigo/<codigo>')
+@requiere_login
+def api_pos_codigo(codigo):
+    """Búsqueda exacta por código de barras (lectura del escáner)"""
+    codigo = codigo.strip()
+    conn = get_db_connection()
+    producto_id = indice_codigos().buscar(conn, codigo)
     conn.close()
     
-    return jsonify([{
-        'id': p['id'],
-        'nombre': p['nombre'],
-        'precio': float(p['precio']),
-        'stock': p['stock'],
-        'categoria': p['categoria'],
-        'emoji': p['emoji'],
-        'codigo': str(p['id']).zfill(3)
-    } for p in productos])
+    producto = cache_productos().obtener(producto_id, get_db_connection) if producto_id else None
+    if not producto or producto['activo'] != 1 or producto['codigo_barras'] != codigo:
+        return jsonify({'success': False, 'error': 'Producto no encontrado'})
+    
+    return jsonify({
+        'success': True,
+        'producto': {
+            'id': producto['id'],
+            'nombre': producto['nombre'],
+            'precio': float(producto['precio']),
+            'stock': producto['stock'],
+            'categoria': producto['categoria'],
+            'emoji': EMOJIS_CATEGORIA.get(producto['categoria'], '📦'),
+            'codigo': str(producto['id']).zfill(3),
+            'codigo_barras': producto['codigo_barras']
+        }
+    })
 
 @app.route('/api/pos/procesar_venta', methods=['POST'])
 @requiere_login
@@ -902,93 +2516,125 @@ def api_pos_procesar_venta():
             return jsonify({'success': False, 'error': 'Carrito vacío'})
         
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Calcular total
-        total = 0
-        detalles_venta = []
         
-        for item in carrito:
-            # Verificar stock
-            producto = cursor.execute(
-                "SELECT precio, stock FROM productos WHERE id = ? AND activo = 1",
-                (item['id'],)
-            ).fetchone()
-            
-            if not producto:
-                conn.close()
-                return jsonify({'success': False, 'error': f'Producto {item["nombre"]} no encontrado'})
-            
-            if producto['stock'] < item['cantidad']:
-                conn.close()
-                return jsonify({'success': False, 'error': f'Stock insuficiente para {item["nombre"]}'})
-            
-            subtotal = float(producto['precio']) * int(item['cantidad'])
-            total += subtotal
-            
-            detalles_venta.append({
-                'producto_id': item['id'],
-                'cantidad': item['cantidad'],
-                'precio_unitario': float(producto['precio']),
-                'subtotal': subtotal
-            })
+        try:
+            # UUID opcional generado por la terminal: reintentar no duplica la venta
+            venta_uuid = validar_uuid_venta(data['uuid']) if data.get('uuid') else None
+            # Normalizado antes de grabar: el cambio se calcula después del commit y ya no puede fallar
+            dinero_recibido = monto_recibido(dinero_recibido) if metodo_pago == 'efectivo' else 0
+            venta = ejecutar_con_reintentos(
+                registrar_venta, conn, carrito, metodo_pago, cliente_id,
+                dinero_recibido, session.get('user_id'), venta_uuid
+            )
+        except VentaRechazadaError as e:
+            conn.close()
+            registro_metricas().incrementar('systec_ventas_rechazadas_total', origen='pos')
+            return jsonify({'success': False, 'error': str(e)})
         
-        # Validar pago en efectivo
-        if metodo_pago == 'efectivo':
-            if float(dinero_recibido) < total:
-                conn.close()
-                return jsonify({'success': False, 'error': 'Dinero insuficiente'})
+        venta_id, total = venta['venta_id'], venta['total']
         
-        # Registrar venta
-        cursor.execute("""
-            INSERT INTO ventas (fecha, total, usuario_id, metodo_pago, cliente_id, pagado)
-            VALUES (?, ?, ?, ?, ?, 1)
-        """, (datetime.now(), total, session.get('user_id'), metodo_pago, cliente_id))
+        if venta['duplicada']:
+            conn.close()
+            registro_metricas().incrementar('systec_ventas_duplicadas_total', origen='pos')
+            return jsonify({
+                'success': True,
+                'venta_id': venta_id,
+                'total': total,
+                'cambio': dinero_recibido - total if metodo_pago == 'efectivo' else 0,
+                'duplicada': True,
+                'mensaje': 'La venta ya estaba registrada'
+            })
         
-        venta_id = cursor.lastrowid
+        registrar_metricas_ventas('pos', 1, total)
+        registro_metricas().observar('systec_checkout_segundos', sum(venta['tiempos_ms'].values()) / 1000)
         
-        # Registrar detalles y actualizar stock
-        for detalle in detalles_venta:
-            cursor.execute("""
-                INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio_unitario, subtotal)
-                VALUES (?, ?, ?, ?, ?)
-            """, (venta_id, detalle['producto_id'], detalle['cantidad'], 
-                  detalle['precio_unitario'], detalle['subtotal']))
-            
-            # Actualizar stock
-            cursor.execute("""
-                UPDATE productos SET stock = stock - ? WHERE id = ?
-            """, (detalle['cantidad'], detalle['producto_id']))
+        cache_productos().invalidar(*venta['lineas'])
         
-        conn.commit()
+        datos_modificados('stock')
+        publicar_venta(conn, venta, metodo_pago, cliente_id)
+        publicar_cambios_stock(conn, venta['stock'])
         conn.close()
         
         # Registrar log
         registrar_log("Venta procesada", "ventas", venta_id, f"Total: ${total:.2f}")
         
         # Calcular cambio
-        cambio = float(dinero_recibido) - total if metodo_pago == 'efectivo' else 0
+        cambio = dinero_recibido - total if metodo_pago == 'efectivo' else 0
         
-        return jsonify({
+        respuesta = jsonify({
             'success': True,
             'venta_id': venta_id,
             'total': total,
             'cambio': cambio,
+            'tiempos_ms': venta['tiempos_ms'],
             'mensaje': 'Venta procesada exitosamente'
         })
+        respuesta.headers['Server-Timing'] = ', '.join(
+            f'{etapa};dur={duracion}' for etapa, duracion in venta['tiempos_ms'].items()
+        )
+        return respuesta
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/pos/ventas/lote', methods=['POST'])
+@requiere_login
+def api_pos_ventas_lote():
+    """Recibe las ventas que una terminal encoló sin conexión y las graba en una transacción"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ventas = data.get('ventas')
+        
+        if not isinstance(ventas, list) or not ventas:
+            return jsonify({'success': False, 'error': 'No hay ventas para registrar'}), 400
+        if len(ventas) > app.config['POS_LOTE_MAXIMO']:
+            return jsonify({'success': False,
+                            'error': f"Máximo {app.config['POS_LOTE_MAXIMO']} ventas por lote"}), 400
+        
+        conn = get_db_connection()
+        inicio = time.perf_counter()
+        resultados, registradas, stock = ejecutar_con_reintentos(
+            registrar_ventas_lote, conn, ventas, session.get('user_id')
+        )
+        
+        metricas = registro_metricas()
+        metricas.observar('systec_checkout_segundos', time.perf_counter() - inicio)
+        registrar_metricas_ventas('lote', len(registradas), sum(venta['total'] for venta in registradas))
+        for estado, nombre in (('rechazada', 'systec_ventas_rechazadas_total'),
+                               ('duplicada', 'systec_ventas_duplicadas_total')):
+            cantidad = sum(1 for resultado in resultados if resultado['estado'] == estado)
+            if cantidad:
+                metricas.incrementar(nombre, cantidad, origen='lote')
+        
+        for venta in registradas:
+            publicar_venta(conn, venta, venta['metodo_pago'], venta['cliente_id'])
+        if registradas:
+            cache_productos().invalidar(*stock)
+            datos_modificados('stock')
+        publicar_cambios_stock(conn, stock)
+        conn.close()
+        
+        for venta in registradas:
+            registrar_log("Venta procesada", "ventas", venta['venta_id'],
+                          f"Total: ${venta['total']:.2f} (lote sin conexión)")
+        
+        return jsonify({
+            'success': True,
+            'registradas': len(registradas),
+            'resultados': resultados
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/productos/verificar_stock/<int:producto_id>')
 @requiere_login
 def verificar_stock(producto_id):
     """Verificar stock de un producto específico"""
     try:
-        conn = get_db_connection()
-        producto = conn.execute("SELECT id, nombre, stock FROM productos WHERE id = ? AND activo = 1", (producto_id,)).fetchone()
-        conn.close()
+        producto = cache_productos().obtener(producto_id, get_db_connection)
         
-        if not producto:
+        if not producto or producto['activo'] != 1:
             return jsonify({'success': False, 'error': 'Producto no encontrado'})
         
         config = cargar_configuracion()
@@ -1028,7 +2674,7 @@ def actualizar_stock():
         cursor = conn.cursor()
         
         # Verificar que el producto existe
-        producto = cursor.execute("SELECT nombre FROM productos WHERE id = ?", (producto_id,)).fetchone()
+        producto = cursor.execute("SELECT nombre, stock FROM productos WHERE id = ?", (producto_id,)).fetchone()
         if not producto:
             flash('Producto no encontrado', 'danger')
             conn.close()
@@ -1037,6 +2683,9 @@ def actualizar_stock():
         # Actualizar stock
         cursor.execute("UPDATE productos SET stock = ? WHERE id = ?", (nuevo_stock, producto_id))
         conn.commit()
+        cache_productos().invalidar(producto_id)
+        datos_modificados('stock')
+        publicar_cambios_stock(conn, {int(producto_id): (producto['stock'], nuevo_stock)})
         conn.close()
         
         registrar_log("Stock actualizado", "productos", producto_id, f"Nuevo stock: {nuevo_stock}")
@@ -1066,30 +2715,30 @@ def buscar_productos_avanzada():
         
         conn = get_db_connection()
         
-        sql_query = """
-            SELECT id, nombre, precio, stock, categoria, codigo_barras,
-                   CASE WHEN activo = 1 THEN 'Activo' ELSE 'Inactivo' END as estado
-            FROM productos 
-            WHERE 1=1
+        join_busqueda, condicion, params, orden = '', '1=1', [], 'p.nombre'
+        if query:
+            join_busqueda, condicion, params, orden = filtro_busqueda(conn, query)
+        
+        sql_query = f"""
+            SELECT p.id, p.nombre, p.precio, p.stock, p.categoria, p.codigo_barras,
+                   CASE WHEN p.activo = 1 THEN 'Activo' ELSE 'Inactivo' END as estado
+            FROM productos p
+            {join_busqueda}
+            WHERE {condicion}
         """
-        params = []
         
         if activos_solo:
-            sql_query += " AND activo = 1"
-        
-        if query:
-            sql_query += " AND (nombre LIKE ? OR codigo_barras LIKE ?)"
-            params.extend([f'%{query}%', f'%{query}%'])
+            sql_query += " AND p.activo = 1"
         
         if categoria:
-            sql_query += " AND categoria = ?"
+            sql_query += " AND p.categoria = ?"
             params.append(categoria)
         
         if stock_minimo:
-            sql_query += " AND stock >= ?"
+            sql_query += " AND p.stock >= ?"
             params.append(int(stock_minimo))
         
-        sql_query += " ORDER BY nombre LIMIT 20"
+        sql_query += f" ORDER BY {orden} LIMIT 20"
         
         productos = conn.execute(sql_query, params).fetchall()
         conn.close()
@@ -1121,8 +2770,8 @@ def estadisticas_resumen():
         mes_actual = datetime.now().strftime('%Y-%m')
         
         # Ventas de hoy vs ayer
-        ventas_hoy = conn.execute("SELECT COUNT(*) as count, COALESCE(SUM(total),0) as total FROM ventas WHERE DATE(fecha) = ?", (hoy,)).fetchone()
-        ventas_ayer = conn.execute("SELECT COUNT(*) as count, COALESCE(SUM(total),0) as total FROM ventas WHERE DATE(fecha) = ?", (ayer,)).fetchone()
+        ventas_hoy = resumen_ventas(conn, *rango_dia(hoy))
+        ventas_ayer = resumen_ventas(conn, *rango_dia(ayer))
         
         # Productos más vendidos esta semana
         productos_top = conn.execute("""
@@ -1130,7 +2779,7 @@ def estadisticas_resumen():
             FROM detalle_ventas dv
             JOIN productos p ON p.id = dv.producto_id
             JOIN ventas v ON v.id = dv.venta_id
-            WHERE DATE(v.fecha) >= ?
+            WHERE v.fecha >= ?
             GROUP BY p.id, p.nombre
             ORDER BY vendido DESC
             LIMIT 5
@@ -1150,9 +2799,9 @@ def estadisticas_resumen():
         
         return jsonify({
             'ventas': {
-                'hoy': {'cantidad': ventas_hoy['count'], 'total': float(ventas_hoy['total'])},
-                'ayer': {'cantidad': ventas_ayer['count'], 'total': float(ventas_ayer['total'])},
-                'cambio_cantidad': ventas_hoy['count'] - ventas_ayer['count'],
+                'hoy': {'cantidad': ventas_hoy['cantidad'], 'total': float(ventas_hoy['total'])},
+                'ayer': {'cantidad': ventas_ayer['cantidad'], 'total': float(ventas_ayer['total'])},
+                'cambio_cantidad': ventas_hoy['cantidad'] - ventas_ayer['cantidad'],
                 'cambio_total': float(ventas_hoy['total']) - float(ventas_ayer['total'])
             },
             'productos_top': [{'nombre': p['nombre'], 'vendido': p['vendido']} for p in productos_top],
@@ -1191,6 +2840,7 @@ def crear_categoria():
         categoria_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        datos_modificados('categorias')
         
         registrar_log("Categoría creada", "categorias", categoria_id, f"Nombre: {nombre}")
         flash(f'Categoría "{nombre}" creada exitosamente.', 'success')
@@ -1210,17 +2860,12 @@ def api_dashboard_stats():
     
     # Stats de hoy
     hoy = datetime.now().strftime('%Y-%m-%d')
-    stats_hoy = conn.execute("""
-        SELECT COUNT(*) as ventas_hoy, COALESCE(SUM(total),0) as total_hoy
-        FROM ventas WHERE DATE(fecha) = ?
-    """, (hoy,)).fetchone()
+    resumen_hoy = resumen_ventas(conn, *rango_dia(hoy))
+    stats_hoy = {'ventas_hoy': resumen_hoy['cantidad'], 'total_hoy': resumen_hoy['total']}
     
     # Stats del mes
-    mes_actual = datetime.now().strftime('%Y-%m')
-    stats_mes = conn.execute("""
-        SELECT COUNT(*) as ventas_mes, COALESCE(SUM(total),0) as total_mes
-        FROM ventas WHERE strftime('%Y-%m', fecha) = ?
-    """, (mes_actual,)).fetchone()
+    resumen_mes = resumen_ventas(conn, *rango_mes())
+    stats_mes = {'ventas_mes': resumen_mes['cantidad'], 'total_mes': resumen_mes['total']}
     
     # Productos con stock bajo
     config = cargar_configuracion()
@@ -1233,36 +2878,107 @@ def api_dashboard_stats():
     conn.close()
     
     return jsonify({
-        'hoy': dict(stats_hoy) if stats_hoy else {'ventas_hoy': 0, 'total_hoy': 0},
-        'mes': dict(stats_mes) if stats_mes else {'ventas_mes': 0, 'total_mes': 0},
+        'hoy': stats_hoy,
+        'mes': stats_mes,
         'productos_bajos': productos_bajos
     })
 
+@app.route('/api/eventos')
+@requiere_login
+def api_eventos():
+    """Stream SSE con eventos de stock, ventas y stock bajo"""
+    ultimo_id = request.headers.get('Last-Event-ID', request.args.get('ultimo_id'))
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id is not None else None
+    except ValueError:
+        ultimo_id = None
+    
+    bus = bus_eventos()
+    cola = bus.suscribir(ultimo_id)
+    keepalive = app.config['EVENTOS_KEEPALIVE_S']
+    
+    def generar():
+        try:
+            # El navegador reintenta solo a los 3 s si se corta la conexión
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield formatear_sse(cola.get(timeout=keepalive))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            bus.desuscribir(cola)
+    
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # ========== EXPORTACIONES ==========
+# Los CSV se generan por bloques de filas leídos del cursor y se envían a
+# medida que se escriben, así la memoria no crece con el tamaño del export.
+EXPORTACION_FILAS_POR_BLOQUE = 1000
+
+def respuesta_csv(nombre_base, encabezados, cursor, formatear_fila, total_filas):
+    """Response en streaming (opcionalmente gzip con ?gzip=1) para un cursor abierto"""
+    comprimir = request.values.get('gzip') in ('1', 'true', 'on')
+    
+    def generar():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        compresor = zlib.compressobj(wbits=31) if comprimir else None
+        
+        def vaciar():
+            datos = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            return compresor.compress(datos) if compresor else datos
+        
+        writer.writerow(encabezados)
+        while True:
+            filas = cursor.fetchmany(EXPORTACION_FILAS_POR_BLOQUE)
+            if not filas:
+                break
+            writer.writerows(formatear_fila(fila) for fila in filas)
+            bloque = vaciar()
+            if bloque:
+                yield bloque
+        
+        bloque = vaciar()
+        if compresor:
+            bloque += compresor.flush()
+        if bloque:
+            yield bloque
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    nombre_archivo = f'{nombre_base}_{timestamp}.csv' + ('.gz' if comprimir else '')
+    
+    return Response(
+        stream_with_context(generar()),
+        mimetype='application/gzip' if comprimir else 'text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={nombre_archivo}',
+            # Permite al cliente mostrar el progreso de la descarga
+            'X-Total-Filas': str(total_filas)
+        }
+    )
+
 @app.route('/productos/exportar', methods=['POST'])
 @requiere_login
 def exportar_productos():
     """Exportar inventario como CSV"""
     try:
         conn = get_db_connection()
+        total_filas = conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
         productos = conn.execute("""
             SELECT nombre, precio, precio_costo, stock, categoria, codigo_barras,
                    CASE WHEN activo = 1 THEN 'Activo' ELSE 'Inactivo' END as estado
             FROM productos 
             ORDER BY nombre
-        """).fetchall()
-        conn.close()
-        
-        # Crear CSV en memoria
-        output = io.StringIO()
-        writer = csv.writer(output)
+        """)
         
-        # Escribir encabezados
-        writer.writerow(['Nombre', 'Precio', 'Precio Costo', 'Stock', 'Categoría', 'Código Barras', 'Estado'])
-        
-        # Escribir datos
-        for producto in productos:
-            writer.writerow([
+        def formatear(producto):
+            return [
                 producto['nombre'],
                 f"{producto['precio']:.2f}",
                 f"{producto['precio_costo']:.2f}",
@@ -1270,20 +2986,14 @@ def exportar_productos():
                 producto['categoria'] or 'General',
                 producto['codigo_barras'] or '',
                 producto['estado']
-            ])
-        
-        # Preparar respuesta
-        output.seek(0)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            ]
         
         registrar_log("Exportación productos", "productos", None, "CSV generado")
         
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=inventario_{timestamp}.csv'
-            }
+        return respuesta_csv(
+            'inventario',
+            ['Nombre', 'Precio', 'Precio Costo', 'Stock', 'Categoría', 'Código Barras', 'Estado'],
+            productos, formatear, total_filas
         )
         
     except Exception as e:
@@ -1299,58 +3009,179 @@ def exportar_ventas():
         fecha_hasta = request.args.get('hasta', '')
         
         conn = get_db_connection()
-        query = """
+        
+        condiciones, params = filtro_fechas('v.fecha', fecha_desde, fecha_hasta)
+        where = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+        
+        total_filas = conn.execute(f"SELECT COUNT(*) FROM ventas v{where}", params).fetchone()[0]
+        ventas = conn.execute(f"""
             SELECT v.id, v.fecha, v.total, v.metodo_pago, u.username,
                    COALESCE(c.nombre, 'Cliente general') as cliente_nombre
             FROM ventas v 
             LEFT JOIN usuarios u ON u.id = v.usuario_id 
             LEFT JOIN clientes c ON c.id = v.cliente_id
-        """
-        params = []
-        
-        if fecha_desde and fecha_hasta:
-            query += " WHERE DATE(v.fecha) BETWEEN ? AND ?"
-            params = [fecha_desde, fecha_hasta]
-        
-        query += " ORDER BY v.fecha DESC"
-        
-        ventas = conn.execute(query, params).fetchall()
-        conn.close()
-        
-        # Crear CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
+            {where}
+            ORDER BY v.fecha DESC
+        """, params)
         
-        writer.writerow(['ID', 'Fecha', 'Cliente', 'Total', 'Método Pago', 'Usuario'])
-        
-        for venta in ventas:
-            fecha_str = venta['fecha'][:19] if venta['fecha'] else 'N/A'
-            writer.writerow([
+        def formatear(venta):
+            fecha_str = str(venta['fecha'])[:19] if venta['fecha'] else 'N/A'
+            return [
                 venta['id'],
                 fecha_str,
                 venta['cliente_nombre'],
                 f"{venta['total']:.2f}",
                 venta['metodo_pago'],
                 venta['username']
-            ])
-        
-        output.seek(0)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            ]
         
         registrar_log("Exportación ventas", "ventas", None, f"Período: {fecha_desde} - {fecha_hasta}")
         
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=ventas_{timestamp}.csv'
-            }
+        return respuesta_csv(
+            'ventas',
+            ['ID', 'Fecha', 'Cliente', 'Total', 'Método Pago', 'Usuario'],
+            ventas, formatear, total_filas
         )
         
     except Exception as e:
         flash(f'Error al exportar ventas: {str(e)}', 'danger')
         return redirect(url_for('ventas'))
 
+# ========== IMPORTACIÓN ==========
+app.config.setdefault('IMPORTACION_TAMANO_LOTE', 5000)
+
+@app.route('/productos/importar', methods=['GET', 'POST'])
+@requiere_login
+def importar_productos():
+    """Importación masiva de productos desde CSV (mismas columnas que la exportación)"""
+    if session.get('rol') not in ['admin', 'root']:
+        flash('No tienes permisos para realizar esta acción.', 'danger')
+        return redirect(url_for('productos'))
+    
+    if request.method == 'GET':
+        return render_template('importar_productos.html')
+    
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        flash('Selecciona un archivo CSV.', 'danger')
+        return render_template('importar_productos.html')
+    
+    try:
+        conn = get_db_connection()
+        texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+        resumen = importar_productos_csv(conn, texto, app.config['IMPORTACION_TAMANO_LOTE'])
+        conn.close()
+    except (UnicodeDecodeError, csv.Error) as e:
+        flash(f'El archivo no es un CSV válido: {str(e)}', 'danger')
+        return render_template('importar_productos.html')
+    except Exception as e:
+        flash(f'Error al importar productos: {str(e)}', 'danger')
+        return render_template('importar_productos.html')
+    finally:
+        indice_codigos().invalidar()
+        cache_productos().limpiar()
+        datos_modificados('productos')
+    
+    registrar_log("Productos importados", "productos", None,
+                  f"{resumen['insertados']} nuevos, {resumen['actualizados']} actualizados, {resumen['errores']} con errores")
+    flash(f"Importación completada: {resumen['insertados']} productos nuevos y "
+          f"{resumen['actualizados']} actualizados en {resumen['segundos']} s.",
+          'success' if not resumen['errores'] else 'warning')
+    return render_template('importar_productos.html', resumen=resumen)
+
+@app.cli.command('importar-productos')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', default=5000, show_default=True, help='Filas por transacción')
+def comando_importar_productos(archivo, lote):
+    """Importa productos desde un CSV (insertando o actualizando por código de barras)"""
+    conn = get_db_connection()
+    with open(archivo, encoding='utf-8-sig', newline='') as texto:
+        resumen = importar_productos_csv(conn, texto, lote)
+    conn.close()
+    
+    print(f"✅ {resumen['filas_leidas']} filas leídas en {resumen['segundos']} s")
+    print(f"   Nuevos: {resumen['insertados']} | Actualizados: {resumen['actualizados']} | "
+          f"Categorías nuevas: {resumen['categorias_creadas']}")
+    if resumen['errores']:
+        print(f"⚠️  {resumen['errores']} filas con errores:")
+        for error in resumen['detalle_errores']:
+            print(f"   Línea {error['linea']}: {error['error']}")
+
+# ========== DATOS SINTÉTICOS ==========
+@app.cli.command('generar-datos')
+@click.option('--destino', default='systec_ventas_sintetica.db', show_default=True, help='Base a crear')
+@click.option('--escala', type=click.Choice(list(ESCALAS)), default='grande', show_default=True,
+              help='Volúmenes predefinidos')
+@click.option('--productos', type=int, help='Cantidad de productos')
+@click.option('--clientes', type=int, help='Cantidad de clientes')
+@click.option('--ventas', type=int, help='Cantidad de ventas')
+@click.option('--logs', type=int, help='Cantidad de registros de log')
+@click.option('--dias', type=int, help='Días de historial')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día del historial (por defecto hoy)')
+@click.option('--semilla', default=42, show_default=True, help='Semilla del generador aleatorio')
+@click.option('--reemplazar', is_flag=True, help='Borrar la base destino si ya existe')
+def comando_generar_datos(destino, escala, productos, clientes, ventas, logs, dias, hasta, semilla, reemplazar):
+    """Crea una base con datos sintéticos para pruebas de rendimiento"""
+    volumenes = dict(ESCALAS[escala])
+    for clave, valor in (('productos', productos), ('clientes', clientes), ('ventas', ventas),
+                         ('logs', logs), ('dias', dias)):
+        if valor is not None:
+            volumenes[clave] = valor
+    
+    destino = os.path.abspath(destino)
+    if os.path.exists(destino) and not reemplazar:
+        raise click.ClickException(f"{destino} ya existe (usar --reemplazar para sobrescribirla)")
+    
+    print(f"🔧 Generando datos ({escala}, semilla {semilla}) en {destino}")
+    inicio = time.perf_counter()
+    resumen = crear_base_sintetica(destino, volumenes, semilla, hasta.date() if hasta else None)
+    
+    tamano_mb = os.path.getsize(destino) / (1024 * 1024)
+    print(f"✅ Base generada en {time.perf_counter() - inicio:.1f} s ({tamano_mb:.1f} MB)")
+    for tabla, filas in resumen.items():
+        print(f"   {tabla}: {filas:,}")
+
+def crear_base_sintetica(destino, volumenes, semilla=42, hasta=None, progreso=print):
+    """Crea (o reemplaza) `destino` con el esquema de init_db y datos sintéticos.
+
+    Deja app.config['DATABASE'] apuntando a la base nueva. Devuelve {tabla: filas}.
+    """
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(destino + sufijo):
+            os.remove(destino + sufijo)
+    
+    app.config['DATABASE'] = destino
+    init_db()
+    
+    conn = obtener_pool().conectar()
+    # Carga masiva: sin índices secundarios ni triggers de búsqueda y catálogo, se recrean al final
+    conn.execute("PRAGMA synchronous = OFF")
+    for (nombre,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    ).fetchall():
+        conn.execute(f"DROP INDEX {nombre}")
+    conn.execute("DROP TABLE IF EXISTS productos_fts")
+    for trigger in ('productos_fts_ai', 'productos_fts_ad', 'productos_fts_au',
+                    'productos_catalogo_ai', 'productos_catalogo_au', 'productos_catalogo_ad'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.commit()
+    
+    resumen = generar_datos_sinteticos(conn, volumenes['productos'], volumenes['clientes'],
+                                       volumenes['ventas'], volumenes['logs'], volumenes['dias'],
+                                       semilla, hasta, progreso)
+    
+    progreso("🔧 Creando índices, búsqueda y resumen diario...")
+    c = conn.cursor()
+    crear_indices(c)
+    crear_indice_busqueda(c)
+    crear_seguimiento_catalogo(c)
+    reconstruir_resumen_diario(c)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return resumen
+
 # ========== GESTIÓN DE USUARIOS ==========
 @app.route('/usuarios')
 @requiere_login
@@ -1438,33 +3269,41 @@ def eliminar_usuario(id):
 def reportes():
     conn = get_db_connection()
     
+    hace_30_dias = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    
     # Ventas por día (últimos 30 días)
     ventas_diarias = conn.execute("""
-        SELECT DATE(fecha) as fecha, COUNT(*) as cantidad, SUM(total) as total
-        FROM ventas 
-        WHERE fecha >= date('now', '-30 days')
-        GROUP BY DATE(fecha)
-        ORDER BY fecha DESC
-    """).fetchall()
-    
-    # Productos más vendidos
-    productos_vendidos = conn.execute("""
-        SELECT p.nombre, SUM(dv.cantidad) as total_vendido, SUM(dv.subtotal) as ingresos
-        FROM detalle_ventas dv
-        JOIN productos p ON p.id = dv.producto_id
-        GROUP BY p.id, p.nombre
-        ORDER BY total_vendido DESC
-        LIMIT 10
-    """).fetchall()
+        SELECT dia as fecha, SUM(cantidad) as cantidad, SUM(total) as total
+        FROM ventas_resumen_diario
+        WHERE dia >= ?
+        GROUP BY dia
+        ORDER BY dia DESC
+    """, (hace_30_dias,)).fetchall()
+    
+    # Productos más vendidos: de la copia analítica si ya existe (ver ANALÍTICA COLUMNAR)
+    snapshot = analitica_ventas().snapshot()
+    if snapshot is not None:
+        productos_vendidos = [{'nombre': fila['etiqueta'], 'total_vendido': fila['cantidad'],
+                               'ingresos': fila['subtotal']}
+                              for fila in snapshot.reporte('producto_id', orden='cantidad', limite=10)]
+    else:
+        productos_vendidos = conn.execute("""
+            SELECT p.nombre, SUM(dv.cantidad) as total_vendido, SUM(dv.subtotal) as ingresos
+            FROM detalle_ventas dv
+            JOIN productos p ON p.id = dv.producto_id
+            GROUP BY p.id, p.nombre
+            ORDER BY total_vendido DESC
+            LIMIT 10
+        """).fetchall()
     
     # Métodos de pago
     metodos_pago = conn.execute("""
-        SELECT metodo_pago, COUNT(*) as cantidad, SUM(total) as total
-        FROM ventas
-        WHERE fecha >= date('now', '-30 days')
+        SELECT metodo_pago, SUM(cantidad) as cantidad, SUM(total) as total
+        FROM ventas_resumen_diario
+        WHERE dia >= ?
         GROUP BY metodo_pago
         ORDER BY cantidad DESC
-    """).fetchall()
+    """, (hace_30_dias,)).fetchall()
     
     conn.close()
     
@@ -1473,6 +3312,120 @@ def reportes():
                          productos_vendidos=productos_vendidos,
                          metodos_pago=metodos_pago)
 
+# ========== ANALÍTICA COLUMNAR ==========
+# Cada ANALITICA_INTERVALO_H horas (0 = solo a pedido) las líneas de venta se
+# exportan a un archivo columnar en ANALITICA_DIRECTORIO que los reportes leen
+# mapeado en memoria: agrupar varios años de ventas no toca la base en uso.
+# Con numpy instalado se agrupa con bincount; sin él, recorriendo las columnas.
+app.config.setdefault('ANALITICA_DIRECTORIO', 'analitica')
+app.config.setdefault('ANALITICA_INTERVALO_H', 6)
+app.config.setdefault('ANALITICA_CONSERVAR', 2)
+
+AGRUPACIONES_ANALITICA = {
+    'producto': 'producto_id',
+    'categoria': 'categoria',
+    'metodo_pago': 'metodo_pago',
+    'mes': 'mes',
+    'dia': 'dia',
+    'usuario': 'usuario_id',
+    'cliente': 'cliente_id'
+}
+
+_analiticas = {}
+_analiticas_lock = threading.Lock()
+
+def analitica_ventas():
+    database = app.config['DATABASE']
+    analitica = _analiticas.get(database)
+    if analitica is None:
+        with _analiticas_lock:
+            analitica = _analiticas.get(database)
+            if analitica is None:
+                directorio = os.path.join(app.config['ANALITICA_DIRECTORIO'],
+                                          os.path.splitext(os.path.basename(database))[0])
+                analitica = AnaliticaVentas(obtener_pool().conectar, directorio=directorio,
+                                            base_datos=os.path.abspath(database),
+                                            conservar=app.config['ANALITICA_CONSERVAR'])
+                if app.config['ANALITICA_INTERVALO_H']:
+                    analitica.programar(app.config['ANALITICA_INTERVALO_H'] * 3600)
+                _analiticas[database] = analitica
+    return analitica
+
+@app.before_request
+def iniciar_analitica():
+    """La exportación programada arranca con el primer request, como la retención de logs"""
+    analitica_ventas()
+
+@atexit.register
+def detener_analiticas():
+    for analitica in list(_analiticas.values()):
+        analitica.detener()
+
+@app.cli.command('exportar-analitica')
+def exportar_analitica_comando():
+    """Genera ahora la copia columnar de las líneas de venta"""
+    resumen = analitica_ventas().exportar()
+    if resumen is None:
+        raise click.ClickException("Ya hay una exportación en curso")
+    if resumen['estado'] == 'error':
+        raise click.ClickException(resumen['error'])
+    click.echo(f"✅ {resumen['filas']} líneas ({resumen['desde']} a {resumen['hasta']}) exportadas a "
+               f"{resumen['archivo']} en {resumen['segundos']} s ({resumen['bytes'] // 1024} KB)")
+
+@app.route('/api/reportes/analitica')
+@requiere_login
+def api_reportes_analitica():
+    """Ventas agrupadas desde la copia columnar: ?agrupar=categoria&desde=AAAA-MM-DD&hasta=...&orden=subtotal&limite=20"""
+    agrupar = request.args.get('agrupar', 'producto')
+    orden = request.args.get('orden', 'clave' if agrupar in ('mes', 'dia') else 'subtotal')
+    if agrupar not in AGRUPACIONES_ANALITICA:
+        return jsonify({'success': False, 'error': f"agrupar debe ser uno de: {', '.join(AGRUPACIONES_ANALITICA)}"}), 400
+    if orden not in ('clave', 'etiqueta', 'lineas', 'cantidad', 'subtotal', 'costo', 'margen'):
+        return jsonify({'success': False, 'error': 'Orden inválido'}), 400
+    
+    desde = request.args.get('desde') or None
+    hasta = request.args.get('hasta') or None
+    try:
+        for fecha in (desde, hasta):
+            if fecha:
+                datetime.strptime(fecha, '%Y-%m-%d')
+        limite = request.args.get('limite', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida (AAAA-MM-DD)'}), 400
+    
+    analitica = analitica_ventas()
+    snapshot = analitica.snapshot()
+    if snapshot is None:
+        analitica.exportar_en_segundo_plano()
+        return jsonify({'success': False, 'error': 'La copia analítica se está generando, reintentar en unos segundos',
+                        'analitica': analitica.estado()}), 503
+    
+    inicio = time.perf_counter()
+    filas = snapshot.reporte(AGRUPACIONES_ANALITICA[agrupar], desde, hasta, orden, limite)
+    return jsonify({
+        'success': True,
+        'agrupar': agrupar,
+        'desde': desde,
+        'hasta': hasta,
+        'filas': [dict(fila, cantidad=round(fila['cantidad'], 3), subtotal=round(fila['subtotal'], 2),
+                       costo=round(fila['costo'], 2), margen=round(fila['margen'], 2)) for fila in filas],
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        'snapshot': snapshot.estadisticas()
+    })
+
+@app.route('/api/reportes/analitica/exportar', methods=['POST'])
+@requiere_login
+def api_reportes_analitica_exportar():
+    """Regenerar la copia analítica en segundo plano (202) o 409 si ya hay una en curso"""
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    
+    analitica = analitica_ventas()
+    if not analitica.exportar_en_segundo_plano():
+        return jsonify({'success': False, 'error': 'Ya hay una exportación en curso',
+                        'analitica': analitica.estado()}), 409
+    return jsonify({'success': True, 'analitica': analitica.estado()}), 202
+
 # ========== UTILIDADES ==========
 @app.route('/productos/cargar_prueba')
 @requiere_login
@@ -1515,6 +3468,9 @@ def cargar_productos_prueba():
     
     conn.commit()
     conn.close()
+    indice_codigos().invalidar()
+    cache_productos().limpiar()
+    datos_modificados('productos')
     
     registrar_log("Productos de prueba cargados", "productos", None, f"{productos_agregados} productos agregados")
     flash(f'{productos_agregados} productos de prueba cargados correctamente.', 'success')
@@ -1524,26 +3480,119 @@ def cargar_productos_prueba():
 @app.route('/mantenimiento/limpiar_logs')
 @requiere_login
 def limpiar_logs():
-    """Limpiar logs antiguos"""
+    """Limpiar logs antiguos (en segundo plano, por lotes)"""
     if session.get('rol') not in ['admin', 'root']:
         flash('No tienes permisos para realizar esta acción.', 'danger')
         return redirect(url_for('configuracion'))
     
-    try:
-        # Limpiar logs antiguos (más de 90 días)
-        conn = get_db_connection()
-        resultado = conn.execute("DELETE FROM logs WHERE fecha < date('now', '-90 days')")
-        logs_eliminados = resultado.rowcount
-        conn.commit()
-        conn.close()
-        
-        registrar_log("Limpieza de logs", "sistema", None, f"{logs_eliminados} logs eliminados")
-        flash(f'Limpieza completada. {logs_eliminados} logs antiguos eliminados.', 'success')
-    except Exception as e:
-        flash(f'Error durante la limpieza: {str(e)}', 'danger')
+    if retencion_logs().ejecutar_en_segundo_plano():
+        flash(f"Limpieza de logs de más de {app.config['LOGS_RETENCION_DIAS']} días iniciada en segundo plano.", 'success')
+    else:
+        flash('Ya hay una limpieza de logs en curso.', 'warning')
     
     return redirect(url_for('configuracion'))
 
+@app.route('/api/mantenimiento/logs', methods=['GET', 'POST'])
+@requiere_login
+def api_mantenimiento_logs():
+    """Estado de la retención de logs (GET) o lanzar una pasada (POST {dias, archivar})"""
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    
+    retencion = retencion_logs()
+    if request.method == 'GET':
+        return jsonify({'success': True, 'retencion': retencion.estado()})
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        dias = int(data['dias']) if data.get('dias') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Días inválidos'}), 400
+    if dias is not None and dias < 1:
+        return jsonify({'success': False, 'error': 'Días inválidos'}), 400
+    
+    if not retencion.ejecutar_en_segundo_plano(dias, archivar=bool(data.get('archivar', True))):
+        return jsonify({'success': False, 'error': 'Ya hay una limpieza de logs en curso',
+                        'retencion': retencion.estado()}), 409
+    return jsonify({'success': True, 'retencion': retencion.estado()}), 202
+
+# ========== BACKUPS ==========
+# Backups en caliente: se copian con la API de backup de SQLite desde un hilo
+# de fondo, se verifican y se guardan comprimidos en RESPALDOS_DIRECTORIO
+# conservando los RESPALDOS_CONSERVAR más nuevos.
+app.config.setdefault('RESPALDOS_DIRECTORIO', 'backups')
+app.config.setdefault('RESPALDOS_CONSERVAR', 10)
+app.config.setdefault('RESPALDOS_PAGINAS_POR_PASO', 256)
+app.config.setdefault('RESPALDOS_PAUSA_MS', 5)
+
+_respaldos = {}
+_respaldos_lock = threading.Lock()
+
+def respaldos():
+    database = app.config['DATABASE']
+    respaldo = _respaldos.get(database)
+    if respaldo is None:
+        with _respaldos_lock:
+            respaldo = _respaldos.get(database)
+            if respaldo is None:
+                respaldo = Respaldos(obtener_pool().conectar,
+                                     directorio=app.config['RESPALDOS_DIRECTORIO'],
+                                     paginas_por_paso=app.config['RESPALDOS_PAGINAS_POR_PASO'],
+                                     pausa_ms=app.config['RESPALDOS_PAUSA_MS'],
+                                     conservar=app.config['RESPALDOS_CONSERVAR'])
+                _respaldos[database] = respaldo
+    return respaldo
+
+@app.route('/api/backup', methods=['GET', 'POST'])
+@requiere_login
+def api_backup():
+    """POST inicia un backup en segundo plano; GET lista los backups y el trabajo en curso"""
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'message': 'Sin permisos'}), 403
+    
+    respaldo = respaldos()
+    if request.method == 'GET':
+        return jsonify({
+            'success': True,
+            'en_curso': respaldo.en_curso(),
+            'trabajos': respaldo.trabajos(),
+            'archivos': respaldo.archivos()
+        })
+    
+    trabajo, nuevo = respaldo.iniciar(session.get('username'))
+    if nuevo:
+        registrar_log("Backup iniciado", "sistema", None, f"Trabajo {trabajo['id']}")
+    return jsonify({
+        'success': True,
+        'nuevo': nuevo,
+        'trabajo': trabajo,
+        'message': 'Backup iniciado' if nuevo else 'Ya hay un backup en curso'
+    }), 202
+
+@app.route('/api/backup/<trabajo_id>')
+@requiere_login
+def api_backup_estado(trabajo_id):
+    """Estado de un trabajo de backup (la pantalla de configuración lo consulta periódicamente)"""
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'message': 'Sin permisos'}), 403
+    
+    trabajo = respaldos().trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'trabajo': trabajo})
+
+@app.route('/api/backup/archivos/<nombre>')
+@requiere_login
+def api_backup_descargar(nombre):
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'message': 'Sin permisos'}), 403
+    
+    ruta = respaldos().ruta(nombre)
+    if ruta is None:
+        return jsonify({'success': False, 'message': 'Backup no encontrado'}), 404
+    return send_file(os.path.abspath(ruta), as_attachment=True, download_name=nombre,
+                     mimetype='application/gzip')
+
 # ========== API CAMBIO DE TEMA ==========
 @app.route('/api/tema/cambiar', methods=['POST'])
 @requiere_login
@@ -1576,6 +3625,7 @@ def info_sistema():
         # Tamaño de la base de datos
         db_size = os.path.getsize(app.config['DATABASE']) if os.path.exists(app.config['DATABASE']) else 0
         db_size_mb = round(db_size / (1024 * 1024), 2)
+        version_esquema = migraciones.version_actual(conn)
         
         conn.close()
         
@@ -1589,13 +3639,59 @@ def info_sistema():
                 'productos': total_productos,
                 'ventas': total_ventas,
                 'clientes': total_clientes,
-                'logs': total_logs
+                'logs': total_logs,
+                'version_esquema': version_esquema,
+                'ultima_version_esquema': migraciones.ultima_version
             },
-            'uptime': 'Sistema funcionando correctamente'
+            'pool_conexiones': obtener_pool().estadisticas(),
+            'cache_configuracion': dict(_config_cache_stats),
+            'cache_fragmentos': dict(cache_fragmentos().estadisticas(), versiones=versiones_datos().todas()),
+            'cache_productos': cache_productos().estadisticas(),
+            'indice_codigos': indice_codigos().estadisticas(),
+            'logs_asincronos': escritor_logs().estadisticas(),
+            'retencion_logs': retencion_logs().estado(),
+            'backups': {'en_curso': respaldos().en_curso(), 'ultimo': next(iter(respaldos().archivos()), None)},
+            'analitica': analitica_ventas().estado(),
+            'eventos': bus_eventos().estadisticas(),
+            'trazas_sql': trazador_sql().estadisticas(),
+            'metricas': resumen_metricas(),
+            'uptime_segundos': int(time.time() - registro_metricas().inicio),
+            'uptime': formatear_uptime(time.time() - registro_metricas().inicio)
         })
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/sistema/consultas')
+@requiere_login
+def consultas_sistema():
+    """Sentencias SQL con más tiempo acumulado y últimas consultas lentas"""
+    if session.get('rol') not in ['admin', 'root']:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    
+    orden = request.args.get('orden', 'total_ms')
+    if orden not in ('total_ms', 'promedio_ms', 'max_ms', 'cantidad', 'filas'):
+        return jsonify({'success': False, 'error': 'Orden inválido'}), 400
+    
+    trazador = trazador_sql()
+    return jsonify({
+        'success': True,
+        'estadisticas': trazador.estadisticas(),
+        'sentencias': trazador.top(orden, tamano_pagina()),
+        'lentas': trazador.lentas()
+    })
+
+@app.route('/metrics')
+def metricas_prometheus():
+    """Métricas en formato de exposición de Prometheus"""
+    if 'user_id' not in session:
+        token = app.config['METRICAS_TOKEN']
+        autorizacion = request.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(autorizacion.encode(), f'Bearer {token}'.encode()):
+            return Response('No autorizado\n', status=401, mimetype='text/plain')
+    
+    return Response(registro_metricas().prometheus(medidores_metricas()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # =========== FILTROS DE TEMPLATE ===========
 @app.template_filter('currency')
 def currency_filter(value):
@@ -1638,6 +3734,51 @@ def forbidden_error(error):
                          error_code=403, 
                          error_message="No tienes permisos para acceder a este recurso"), 403
 
+# ========== MIDDLEWARE DE TRAZAS SQL ==========
+@app.after_request
+def cabeceras_sql(response):
+    """Totales de SQL del request (en respuestas streaming, solo lo ejecutado antes del cuerpo)"""
+    if '_sql_registros' in g:
+        cantidad, duracion_ms = totales_sql()
+        response.headers['X-SQL-Consultas'] = str(cantidad)
+        response.headers['X-SQL-Tiempo-Ms'] = f'{duracion_ms:.3f}'
+        server_timing = response.headers.get('Server-Timing')
+        sql_timing = f'sql;dur={duracion_ms:.3f};desc="{cantidad} consultas"'
+        response.headers['Server-Timing'] = f'{server_timing}, {sql_timing}' if server_timing else sql_timing
+    return response
+
+# ========== MIDDLEWARE DE MÉTRICAS ==========
+@app.before_request
+def iniciar_medicion():
+    g._inicio_request = time.perf_counter()
+
+@app.after_request
+def registrar_metricas_request(response):
+    """Cuenta el request y su latencia por endpoint (sin la generación de cuerpos streaming)"""
+    inicio = g.pop('_inicio_request', None)
+    if inicio is None:
+        return response
+    
+    # Por endpoint y no por URL: /productos/123/editar no crea una serie por producto
+    endpoint = request.endpoint or 'sin_ruta'
+    metricas = registro_metricas()
+    metricas.observar('systec_http_request_segundos', time.perf_counter() - inicio, endpoint=endpoint)
+    metricas.incrementar('systec_http_requests_total', endpoint=endpoint,
+                         metodo=request.method, codigo=response.status_code)
+    
+    if response.status_code >= 500:
+        metricas.incrementar('systec_http_errores_total', endpoint=endpoint, tipo='http')
+    elif response.is_json and not response.is_streamed and (response.content_length or 0) <= 2048:
+        # Las APIs informan sus fallos con 200 y {'success': False}; esas respuestas son chicas
+        datos = response.get_json(silent=True)
+        if isinstance(datos, dict) and (datos.get('success') is False or
+                                        (datos.get('error') and not datos.get('success'))):
+            metricas.incrementar('systec_http_errores_total', endpoint=endpoint, tipo='aplicacion')
+    
+    if '_sql_registros' in g:
+        metricas.incrementar('systec_sql_consultas_total', len(g._sql_registros), endpoint=endpoint)
+    return response
+
 # ========== MIDDLEWARE PARA LOGS ==========
 @app.before_request
 def log_request():
@@ -0,0 +1,244 @@
+# benchmark.py - Latencia por ruta (p50/p95/p99) y consultas SQL por request
+#
+# Uso:
+#   python benchmark.py                                  # escalas chica y mediana
+#   python benchmark.py -e grande --salida grande.json
+#   python benchmark.py --comparar benchmark_base.json   # sale con código 1 si hay regresiones
+#
+# Las bases se generan con crear_base_sintetica() y se guardan en
+# benchmark_datos/ para reutilizarlas; cada corrida trabaja sobre una copia.
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime
+
+import click
+
+import app as sistema
+from utils.datos_sinteticos import ESCALAS
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_datos')
+
+USUARIO = 'admin'
+CLAVE = 'admin123'
+
+# Búsquedas típicas del cajero (prefijos y varias palabras)
+BUSQUEDAS = ['yerba', 'coca', 'leche la', 'pap', 'gaseosa 500', 'shampoo sedal', 'alfa', 'agua']
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0
+    indice = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1))
+    return valores_ordenados[indice]
+
+
+def preparar_base(escala, semilla, hasta):
+    """Devuelve la ruta de una copia de trabajo de la base sintética de `escala`"""
+    os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+    original = os.path.join(DIRECTORIO_DATOS, f"{escala}_{semilla}_{hasta.isoformat()}.db")
+    if not os.path.exists(original):
+        click.echo(f"🔧 Generando base {escala} ({original})")
+        temporal = original + '.tmp'
+        sistema.crear_base_sintetica(temporal, ESCALAS[escala], semilla, hasta)
+        os.replace(temporal, original)
+
+    copia = os.path.join(tempfile.mkdtemp(prefix='systec_bench_'), os.path.basename(original))
+    shutil.copy(original, copia)
+    return copia
+
+
+def rutas_a_medir(conn):
+    """(nombre, método, url, datos JSON o generador de datos, es_exportacion)"""
+    # Productos populares con stock de sobra para que las ventas nunca fallen por stock
+    populares = [row[0] for row in conn.execute("""
+        SELECT producto_id FROM detalle_ventas
+        GROUP BY producto_id ORDER BY COUNT(*) DESC LIMIT 20
+    """).fetchall()] or [row[0] for row in conn.execute("SELECT id FROM productos WHERE activo = 1 LIMIT 20")]
+    marcadores = ','.join('?' * len(populares))
+    conn.execute(f"UPDATE productos SET stock = 1000000, activo = 1 WHERE id IN ({marcadores})", populares)
+    conn.commit()
+
+    def venta(i):
+        return {
+            'uuid': str(uuid.uuid4()),
+            'carrito': [{'id': populares[(i + k) % len(populares)], 'nombre': 'bench', 'cantidad': 1 + k % 2}
+                        for k in range(1 + i % 4)],
+            'metodo_pago': 'tarjeta',
+            'dinero_recibido': 0
+        }
+
+    return [
+        ('/pos', 'GET', lambda i: '/pos', None, False),
+        ('/api/pos/productos', 'GET', lambda i: f"/api/pos/productos?q={BUSQUEDAS[i % len(BUSQUEDAS)]}", None, False),
+        ('/api/pos/procesar_venta', 'POST', lambda i: '/api/pos/procesar_venta', venta, False),
+        ('/dashboard', 'GET', lambda i: '/dashboard', None, False),
+        ('/api/dashboard/stats', 'GET', lambda i: '/api/dashboard/stats', None, False),
+        ('/api/estadisticas/resumen', 'GET', lambda i: '/api/estadisticas/resumen', None, False),
+        ('/reportes', 'GET', lambda i: '/reportes', None, False),
+        ('/api/reportes/analitica', 'GET', lambda i: '/api/reportes/analitica?agrupar=categoria', None, False),
+        ('/ventas', 'GET', lambda i: '/ventas', None, False),
+        ('/productos', 'GET', lambda i: '/productos', None, False),
+        ('/productos/exportar', 'POST', lambda i: '/productos/exportar', None, True),
+        ('/ventas/exportar', 'GET', lambda i: '/ventas/exportar', None, True),
+    ]
+
+
+def medir_escala(escala, semilla, hasta, iteraciones, calentamiento):
+    database = preparar_base(escala, semilla, hasta)
+    sistema.app.config['DATABASE'] = database
+    # Como al arrancar la app: una base generada con un esquema anterior se migra antes de medir
+    with sistema.app.app_context():
+        sistema.init_db()
+    # La retención programada borraría logs sintéticos en medio de la medición
+    sistema.app.config['LOGS_RETENCION_INTERVALO_H'] = 0
+    # Copia analítica generada una vez antes de medir, no en medio de la medición
+    sistema.app.config['ANALITICA_INTERVALO_H'] = 0
+    sistema.analitica_ventas().exportar()
+
+    cliente = sistema.app.test_client()
+    respuesta = cliente.post('/login', data={'username': USUARIO, 'password': CLAVE})
+    with cliente.session_transaction() as sesion:
+        if 'user_id' not in sesion:
+            raise click.ClickException(f"No se pudo iniciar sesión como {USUARIO} (HTTP {respuesta.status_code})")
+
+    conn = sqlite3.connect(database)
+    rutas = rutas_a_medir(conn)
+    conn.close()
+
+    resultados = {}
+    for nombre, metodo, url, datos, es_exportacion in rutas:
+        repeticiones = max(3, iteraciones // 10) if es_exportacion else iteraciones
+        tiempos, consultas, errores, tamano = [], [], 0, 0
+
+        for i in range(-calentamiento, repeticiones):
+            kwargs = {'json': datos(i)} if datos else {}
+            inicio = time.perf_counter()
+            respuesta = cliente.open(url(i), method=metodo, **kwargs)
+            # Las exportaciones son streaming: el tiempo incluye generar todo el cuerpo
+            cuerpo = respuesta.get_data()
+            duracion = (time.perf_counter() - inicio) * 1000
+            respuesta.close()
+
+            if i < 0:
+                continue
+            tiempos.append(duracion)
+            # Cabecera que agrega la traza SQL de la aplicación a cada respuesta
+            consultas.append(int(respuesta.headers.get('X-SQL-Consultas', 0)))
+            tamano = len(cuerpo)
+            datos_respuesta = respuesta.get_json(silent=True)
+            if respuesta.status_code >= 400 or (isinstance(datos_respuesta, dict)
+                                                and datos_respuesta.get('success') is False):
+                errores += 1
+
+        tiempos.sort()
+        resultados[nombre] = {
+            'n': len(tiempos),
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'consultas_por_request': round(sum(consultas) / len(consultas), 2),
+            'bytes': tamano,
+            'errores': errores
+        }
+        r = resultados[nombre]
+        click.echo(f"   {nombre:<28} p50 {r['p50_ms']:>9.2f}  p95 {r['p95_ms']:>9.2f}  p99 {r['p99_ms']:>9.2f} ms"
+                   f"  {r['consultas_por_request']:>6} consultas" + (f"  ⚠️ {errores} errores" if errores else ''))
+
+    sistema.escritor_logs().vaciar()
+    sistema.obtener_pool().cerrar_todas()
+    shutil.rmtree(os.path.dirname(database), ignore_errors=True)
+    return resultados
+
+
+def comparar(actual, base, tolerancia, piso_ms):
+    """Lista de regresiones de `actual` respecto de `base` (mismo formato de reporte)"""
+    regresiones = []
+    for escala, rutas in actual['escalas'].items():
+        for nombre, r in rutas.items():
+            anterior = base.get('escalas', {}).get(escala, {}).get(nombre)
+            if not anterior:
+                continue
+            limite = anterior['p95_ms'] * (1 + tolerancia)
+            if r['p95_ms'] > limite and r['p95_ms'] - anterior['p95_ms'] > piso_ms:
+                regresiones.append(f"{escala} {nombre}: p95 {anterior['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+            if r['consultas_por_request'] > anterior['consultas_por_request']:
+                regresiones.append(f"{escala} {nombre}: consultas por request "
+                                   f"{anterior['consultas_por_request']} -> {r['consultas_por_request']}")
+            if r['errores'] > anterior.get('errores', 0):
+                regresiones.append(f"{escala} {nombre}: errores {anterior.get('errores', 0)} -> {r['errores']}")
+    return regresiones
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+@click.command()
+@click.option('--escala', '-e', 'escalas', multiple=True, type=click.Choice(list(ESCALAS)),
+              help='Escalas a medir (por defecto chica y mediana)')
+@click.option('--iteraciones', '-n', default=50, show_default=True, help='Requests medidos por ruta')
+@click.option('--calentamiento', default=3, show_default=True, help='Requests previos sin medir')
+@click.option('--semilla', default=42, show_default=True)
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día de datos (por defecto hoy)')
+@click.option('--salida', default='benchmark.json', show_default=True, help='Reporte JSON a escribir')
+@click.option('--comparar', 'archivo_base', type=click.Path(exists=True, dir_okay=False),
+              help='Reporte anterior contra el cual buscar regresiones')
+@click.option('--tolerancia', default=0.25, show_default=True, help='Aumento de p95 tolerado (0.25 = 25%)')
+@click.option('--piso-ms', default=1.0, show_default=True, help='Diferencias de p95 menores a esto se ignoran')
+def main(escalas, iteraciones, calentamiento, semilla, hasta, salida, archivo_base, tolerancia, piso_ms):
+    """Mide la latencia de las rutas más usadas a través del cliente de pruebas de Flask"""
+    escalas = escalas or ('chica', 'mediana')
+    hasta = hasta.date() if hasta else date.today()
+
+    reporte = {
+        'meta': {
+            'commit': commit_actual(),
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'semilla': semilla,
+            'hasta': hasta.isoformat(),
+            'iteraciones': iteraciones
+        },
+        'escalas': {}
+    }
+
+    for escala in escalas:
+        click.echo(f"📊 Escala {escala}: {ESCALAS[escala]}")
+        reporte['escalas'][escala] = medir_escala(escala, semilla, hasta, iteraciones, calentamiento)
+
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+    click.echo(f"✅ Reporte guardado en {salida}")
+
+    if archivo_base:
+        with open(archivo_base, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(reporte, base, tolerancia, piso_ms)
+        if regresiones:
+            click.echo(f"❌ {len(regresiones)} REGRESIONES respecto de {archivo_base} "
+                       f"(commit {base.get('meta', {}).get('commit')}):", err=True)
+            for regresion in regresiones:
+                click.echo(f"   {regresion}", err=True)
+            sys.exit(1)
+        click.echo(f"✅ Sin regresiones respecto de {archivo_base}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# conftest.py - Base temporal y cliente con sesión de admin para los tests
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as sistema
+
+CONFIGURACION_TEST = {'DATABASE', 'TESTING', 'LOGS_RETENCION_INTERVALO_H', 'ANALITICA_INTERVALO_H'}
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    anterior = {clave: sistema.app.config[clave] for clave in CONFIGURACION_TEST if clave in sistema.app.config}
+    database = str(tmp_path / 'systec_ventas.db')
+    sistema.app.config.update(DATABASE=database, TESTING=True,
+                              LOGS_RETENCION_INTERVALO_H=0, ANALITICA_INTERVALO_H=0)
+    with sistema.app.app_context():
+        sistema.init_db()
+
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO productos (id, nombre, precio, stock, categoria, activo) "
+                 "VALUES (1, 'Gaseosa', 10.0, 5, 'Bebidas', 1)")
+    conn.commit()
+    conn.close()
+
+    cliente = sistema.app.test_client()
+    cliente.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    try:
+        yield cliente, database
+    finally:
+        sistema.escritor_logs().vaciar()
+        sistema.obtener_pool().cerrar_todas()
+        for clave in CONFIGURACION_TEST:
+            if clave in anterior:
+                sistema.app.config[clave] = anterior[clave]
+            else:
+                sistema.app.config.pop(clave, None)
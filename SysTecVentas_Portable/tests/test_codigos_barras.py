@@ -0,0 +1,53 @@
+# test_codigos_barras.py - Lectura del escáner (/api/pos/codigo/<codigo>)
+import sqlite3
+import uuid
+
+
+def escribir(database, sql, parametros=()):
+    """Escritura directa, como la de otro proceso: no pasa por las rutas ni invalida nada"""
+    conn = sqlite3.connect(database)
+    conn.execute(sql, parametros)
+    conn.commit()
+    conn.close()
+
+
+def escanear(cliente, codigo):
+    return cliente.get(f'/api/pos/codigo/{codigo}').get_json()
+
+
+def test_ve_cambios_de_otro_proceso(cliente):
+    cliente, database = cliente
+    escribir(database, "UPDATE productos SET codigo_barras = '779' WHERE id = 1")
+
+    assert escanear(cliente, '779')['producto']['precio'] == 10.0
+
+    escribir(database, "UPDATE productos SET precio = 99 WHERE id = 1")
+    assert escanear(cliente, '779')['producto']['precio'] == 99.0
+
+    escribir(database, "INSERT INTO productos (id, nombre, precio, stock, categoria, codigo_barras, activo) "
+                       "VALUES (2, 'Agua', 5, 3, 'Bebidas', '780', 1)")
+    assert escanear(cliente, '780')['producto']['id'] == 2
+
+    escribir(database, "UPDATE productos SET codigo_barras = '781' WHERE id = 1")
+    assert escanear(cliente, '779')['success'] is False
+    assert escanear(cliente, '781')['producto']['id'] == 1
+
+    escribir(database, "UPDATE productos SET activo = 0 WHERE id = 2")
+    assert escanear(cliente, '780')['success'] is False
+
+
+def test_stock_despues_de_vender(cliente):
+    cliente, database = cliente
+    escribir(database, "UPDATE productos SET codigo_barras = '779' WHERE id = 1")
+    assert escanear(cliente, '779')['producto']['stock'] == 5
+
+    venta = {'uuid': str(uuid.uuid4()), 'metodo_pago': 'efectivo', 'dinero_recibido': 20,
+             'carrito': [{'id': 1, 'nombre': 'Gaseosa', 'cantidad': 2}]}
+    assert cliente.post('/api/pos/procesar_venta', json=venta).get_json()['success'] is True
+
+    assert escanear(cliente, '779')['producto']['stock'] == 3
+
+
+def test_codigo_inexistente(cliente):
+    cliente, _ = cliente
+    assert escanear(cliente, 'no-existe') == {'success': False, 'error': 'Producto no encontrado'}
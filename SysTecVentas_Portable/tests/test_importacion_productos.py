@@ -0,0 +1,29 @@
+# test_importacion_productos.py - Validación de filas del CSV de productos
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.importacion_productos import ErrorFila, validar_fila
+
+
+def fila(**valores):
+    return dict({'nombre': 'Gaseosa', 'precio': '10', 'precio_costo': '6', 'stock': '5'}, **valores)
+
+
+@pytest.mark.parametrize('campo,valor', [
+    ('precio', 'nan'), ('precio', 'inf'), ('precio_costo', '-inf'),
+    ('stock', 'inf'), ('stock', 'nan'), ('stock', '1e999'),
+])
+def test_numeros_no_finitos_son_error_de_fila(campo, valor):
+    with pytest.raises(ErrorFila, match=f"{campo} inválido"):
+        validar_fila(fila(**{campo: valor}))
+
+
+def test_coma_decimal_y_stock_entero():
+    producto = validar_fila(fila(precio='1234,50', stock='2.0'))
+
+    assert producto['precio'] == 1234.5
+    assert producto['stock'] == 2
@@ -0,0 +1,77 @@
+# test_ventas_lote.py - Ventas encoladas sin conexión (/api/pos/ventas/lote)
+import sqlite3
+import uuid
+
+
+def venta(dinero_recibido, cliente_id=None):
+    return {'uuid': str(uuid.uuid4()), 'metodo_pago': 'efectivo', 'dinero_recibido': dinero_recibido,
+            'cliente_id': cliente_id, 'carrito': [{'id': 1, 'nombre': 'Gaseosa', 'cantidad': 1}]}
+
+
+def test_monto_invalido_rechaza_solo_esa_venta(cliente):
+    cliente, database = cliente
+    ventas = [venta('abc'), venta(20), venta(None), venta(10)]
+
+    datos = cliente.post('/api/pos/ventas/lote', json={'ventas': ventas}).get_json()
+
+    assert datos['success'] is True
+    assert datos['registradas'] == 2
+    assert [resultado['estado'] for resultado in datos['resultados']] == \
+        ['rechazada', 'registrada', 'rechazada', 'registrada']
+    assert datos['resultados'][0]['error'] == 'Monto recibido inválido'
+    assert datos['resultados'][2]['error'] == 'Dinero insuficiente'
+
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT COUNT(*) FROM ventas").fetchone()[0] == 2
+    assert conn.execute("SELECT stock FROM productos WHERE id = 1").fetchone()[0] == 3
+    conn.close()
+
+
+def test_cliente_inexistente_rechaza_solo_esa_venta(cliente):
+    cliente, database = cliente
+    conn = sqlite3.connect(database)
+    cliente_id = conn.execute("INSERT INTO clientes (nombre) VALUES ('María')").lastrowid
+    conn.commit()
+    conn.close()
+    ventas = [venta(10), venta(10, cliente_id=999), venta(10, cliente_id='abc'), venta(10, cliente_id=cliente_id)]
+
+    datos = cliente.post('/api/pos/ventas/lote', json={'ventas': ventas}).get_json()
+
+    assert datos['success'] is True
+    assert datos['registradas'] == 2
+    assert [resultado['estado'] for resultado in datos['resultados']] == \
+        ['registrada', 'rechazada', 'rechazada', 'registrada']
+    assert datos['resultados'][1]['error'] == 'Cliente 999 no encontrado'
+    assert datos['resultados'][2]['error'] == 'Cliente inválido'
+
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT cliente_id FROM ventas ORDER BY id").fetchall() == [(None,), (cliente_id,)]
+    assert conn.execute("SELECT stock FROM productos WHERE id = 1").fetchone()[0] == 3
+    conn.close()
+
+
+def test_monto_invalido_en_checkout(cliente):
+    cliente, _ = cliente
+    datos = cliente.post('/api/pos/procesar_venta', json=venta('abc')).get_json()
+
+    assert datos == {'success': False, 'error': 'Monto recibido inválido'}
+
+
+def test_cambio_con_monto_vacio_en_venta_sin_costo(cliente):
+    cliente, database = cliente
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO productos (id, nombre, precio, stock, categoria, activo) "
+                 "VALUES (2, 'Bolsa', 0, 5, 'Otros', 1)")
+    conn.commit()
+    conn.close()
+
+    for dinero_recibido in (None, ''):
+        datos = dict(venta(dinero_recibido), carrito=[{'id': 2, 'nombre': 'Bolsa', 'cantidad': 1}])
+        respuesta = cliente.post('/api/pos/procesar_venta', json=datos).get_json()
+        assert respuesta['success'] is True
+        assert respuesta['cambio'] == 0
+
+        reintento = cliente.post('/api/pos/procesar_venta', json=datos).get_json()
+        assert reintento['success'] is True
+        assert reintento['duplicada'] is True
+        assert reintento['cambio'] == 0
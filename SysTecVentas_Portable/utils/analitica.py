@@ -0,0 +1,379 @@
+# analitica.py - Copia columnar de las líneas de venta en un archivo mapeado en memoria para reportes
+import array
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+try:
+    import numpy as np
+except ImportError:
+    # Opcional: sin numpy las columnas se leen como memoryview y se agrupa en Python
+    np = None
+
+MAGICO = b'STCOL001'
+PATRON_ARCHIVO = re.compile(r'^lineas_\d{8}_\d{6}\.col$')
+EPOCA = date(1970, 1, 1).toordinal()
+
+# (columna, tipo de array.array, expresión SQL). Las de texto se codifican con
+# un diccionario: la columna guarda el índice y el encabezado la lista de valores.
+COLUMNAS = (
+    ('dia', 'i', "CAST(julianday(substr(v.fecha, 1, 10)) - 2440587.5 AS INTEGER)"),
+    ('mes', 'i', "CAST(substr(v.fecha, 1, 4) AS INTEGER) * 12 + CAST(substr(v.fecha, 6, 2) AS INTEGER) - 1"),
+    ('venta_id', 'i', "v.id"),
+    ('producto_id', 'i', "dv.producto_id"),
+    ('usuario_id', 'i', "COALESCE(v.usuario_id, 0)"),
+    ('cliente_id', 'i', "COALESCE(v.cliente_id, 0)"),
+    ('metodo_pago', 'i', "COALESCE(v.metodo_pago, '')"),
+    ('categoria', 'i', "COALESCE(p.categoria, '')"),
+    ('cantidad', 'd', "COALESCE(dv.cantidad, 0)"),
+    ('subtotal', 'd', "COALESCE(dv.subtotal, 0)"),
+    ('costo', 'd', "COALESCE(dv.cantidad, 0) * COALESCE(p.precio_costo, 0)"),
+)
+CODIFICADAS = ('metodo_pago', 'categoria')
+VALORES = ('cantidad', 'subtotal', 'costo')
+TIPOS_NUMPY = {'i': '<i4', 'd': '<f8'}
+
+
+def numero_dia(fecha):
+    """'AAAA-MM-DD' -> días desde 1970-01-01, como la columna `dia`"""
+    return date.fromisoformat(fecha[:10]).toordinal() - EPOCA
+
+
+def _alinear(posicion, multiplo=8):
+    return (posicion + multiplo - 1) // multiplo * multiplo
+
+
+class SnapshotAnalitica:
+    """Lectura de un archivo .col: encabezado JSON y columnas contiguas, alineadas a 8 bytes.
+
+    Las columnas se mapean sin copiar (numpy.frombuffer o memoryview sobre el
+    mmap) y las filas están ordenadas por día, así que un rango de fechas es
+    una búsqueda binaria y un slice.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as archivo:
+            self._mm = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGICO)] != MAGICO:
+            raise ValueError(f"{ruta} no es una copia analítica")
+        largo = struct.unpack_from('<I', self._mm, len(MAGICO))[0]
+        inicio = len(MAGICO) + 4
+        self.encabezado = json.loads(self._mm[inicio:inicio + largo].decode('utf-8'))
+        self._datos = _alinear(inicio + largo)
+        self.filas = self.encabezado['filas']
+        self._columnas = {}
+
+    def columna(self, nombre):
+        if nombre not in self._columnas:
+            especificacion = self.encabezado['columnas'][nombre]
+            inicio = self._datos + especificacion['offset']
+            tipo = especificacion['tipo']
+            if np is not None:
+                datos = np.frombuffer(self._mm, dtype=TIPOS_NUMPY[tipo], count=self.filas, offset=inicio)
+            else:
+                datos = memoryview(self._mm)[inicio:inicio + self.filas * array.array(tipo).itemsize].cast(tipo)
+                if sys.byteorder != 'little':
+                    datos = array.array(tipo, datos)
+                    datos.byteswap()
+            self._columnas[nombre] = datos
+        return self._columnas[nombre]
+
+    def rango(self, desde=None, hasta=None):
+        """(inicio, fin) de las filas entre `desde` y `hasta` inclusive ('AAAA-MM-DD')"""
+        dias = self.columna('dia')
+        inicio, fin = 0, self.filas
+        if np is not None:
+            if desde:
+                inicio = int(np.searchsorted(dias, numero_dia(desde), 'left'))
+            if hasta:
+                fin = int(np.searchsorted(dias, numero_dia(hasta), 'right'))
+        else:
+            if desde:
+                inicio = bisect.bisect_left(dias, numero_dia(desde))
+            if hasta:
+                fin = bisect.bisect_right(dias, numero_dia(hasta))
+        return inicio, max(inicio, fin)
+
+    def agrupar(self, clave, desde=None, hasta=None):
+        """{valor de `clave`: {'lineas', 'cantidad', 'subtotal', 'costo'}} en el rango de fechas"""
+        inicio, fin = self.rango(desde, hasta)
+        if inicio == fin:
+            return {}
+        claves = self.columna(clave)[inicio:fin]
+        valores = [self.columna(nombre)[inicio:fin] for nombre in VALORES]
+
+        if np is not None:
+            base = int(claves.min())
+            indices = claves.astype(np.int64) - base
+            lineas = np.bincount(indices)
+            sumas = [np.bincount(indices, weights=columna, minlength=len(lineas)) for columna in valores]
+            return {int(k) + base: dict(zip(('lineas',) + VALORES,
+                                            (int(lineas[k]),) + tuple(float(s[k]) for s in sumas)))
+                    for k in np.flatnonzero(lineas)}
+
+        acumulado = {}
+        for k, cantidad, subtotal, costo in zip(claves, *valores):
+            fila = acumulado.get(k)
+            if fila is None:
+                acumulado[k] = [1, cantidad, subtotal, costo]
+            else:
+                fila[0] += 1
+                fila[1] += cantidad
+                fila[2] += subtotal
+                fila[3] += costo
+        return {k: dict(zip(('lineas',) + VALORES, fila)) for k, fila in acumulado.items()}
+
+    def reporte(self, clave, desde=None, hasta=None, orden='subtotal', limite=None):
+        """Filas agrupadas por `clave` con etiqueta y margen, de mayor a menor `orden`
+        (o ascendente si se ordena por 'clave' o 'etiqueta')"""
+        filas = [dict(valores, clave=valor, etiqueta=self.etiqueta(clave, valor),
+                      margen=valores['subtotal'] - valores['costo'])
+                 for valor, valores in self.agrupar(clave, desde, hasta).items()]
+        filas.sort(key=lambda fila: fila[orden], reverse=orden not in ('clave', 'etiqueta'))
+        return filas[:limite] if limite else filas
+
+    def etiqueta(self, clave, valor):
+        """Nombre legible de un valor agrupado (producto, categoría, mes, ...)"""
+        if clave in CODIFICADAS:
+            return self.encabezado['diccionarios'][clave][valor] or 'Sin dato'
+        if clave == 'mes':
+            return f"{valor // 12:04d}-{valor % 12 + 1:02d}"
+        if clave == 'dia':
+            return date.fromordinal(valor + EPOCA).isoformat()
+        nombres = self.encabezado['nombres'].get(clave, {})
+        if clave == 'cliente_id' and not valor:
+            return 'Cliente general'
+        return nombres.get(str(valor), f"#{valor}")
+
+    def estadisticas(self):
+        return {
+            'archivo': os.path.basename(self.ruta),
+            'generado': self.encabezado['generado'],
+            'filas': self.filas,
+            'desde': self.encabezado['desde'],
+            'hasta': self.encabezado['hasta'],
+            'bytes': len(self._mm),
+            'numpy': np is not None
+        }
+
+
+class AnaliticaVentas:
+    """Exporta detalle_ventas + ventas + productos a analitica/lineas_AAAAMMDD_HHMMSS.col.
+
+    La exportación lee dentro de una transacción de lectura (instantánea WAL,
+    sin bloquear checkouts), escribe a un .tmp y lo renombra: los reportes
+    siguen usando la copia anterior hasta que la nueva está completa. Se
+    conservan las `conservar` más nuevas; en Windows un archivo todavía
+    mapeado no se puede borrar y queda para la próxima rotación.
+    """
+
+    def __init__(self, conectar, directorio='analitica', base_datos=None, conservar=2, tamano_lote=20000):
+        self.conectar = conectar
+        self.directorio = directorio
+        self.base_datos = base_datos
+        self.conservar = conservar
+        self.tamano_lote = tamano_lote
+        self._actual = None
+        self._lock = threading.Lock()
+        self._en_curso = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._proxima = None
+        self._ultima = {'estado': 'inactivo'}
+
+    # ---------- Lectura ----------
+    def snapshot(self):
+        """Copia vigente (la más nueva en disco después de reiniciar), o None si todavía no hay"""
+        if self._actual is None:
+            with self._lock:
+                if self._actual is None:
+                    self._actual = self._abrir_ultima()
+        return self._actual
+
+    def _abrir_ultima(self):
+        for nombre in self._archivos():
+            try:
+                snapshot = SnapshotAnalitica(os.path.join(self.directorio, nombre))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Copia analítica ilegible {nombre}: {e}")
+                continue
+            if snapshot.encabezado.get('base_datos') == self.base_datos:
+                return snapshot
+        return None
+
+    def _archivos(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted((nombre for nombre in os.listdir(self.directorio) if PATRON_ARCHIVO.match(nombre)),
+                      reverse=True)
+
+    # ---------- Exportación ----------
+    def exportar(self):
+        """Genera una copia nueva; devuelve el resumen o None si ya hay una exportación en curso"""
+        if not self._en_curso.acquire(blocking=False):
+            return None
+        inicio = time.perf_counter()
+        resumen = {'estado': 'ejecutando', 'inicio': datetime.now().isoformat(timespec='seconds')}
+        self._ultima = resumen
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = os.path.join(self.directorio, f"lineas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.col")
+            columnas, encabezado = self._leer()
+            self._escribir(ruta, columnas, encabezado)
+
+            snapshot = SnapshotAnalitica(ruta)
+            with self._lock:
+                self._actual = snapshot
+            resumen.update(snapshot.estadisticas(), estado='completado', rotados=self._rotar(ruta))
+        except Exception as e:
+            resumen.update(estado='error', error=str(e))
+            print(f"❌ Error exportando la copia analítica: {e}")
+        finally:
+            resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+            self._en_curso.release()
+        return dict(resumen)
+
+    def _leer(self):
+        columnas = {nombre: array.array(tipo) for nombre, tipo, _ in COLUMNAS}
+        diccionarios = {nombre: {} for nombre in CODIFICADAS}
+        conn = self.conectar()
+        try:
+            # Instantánea de lectura: líneas y nombres corresponden al mismo momento
+            conn.execute("BEGIN")
+            cursor = conn.execute(f"""
+                SELECT {', '.join(expresion for _, _, expresion in COLUMNAS)}
+                FROM detalle_ventas dv
+                JOIN ventas v ON v.id = dv.venta_id
+                LEFT JOIN productos p ON p.id = dv.producto_id
+                WHERE v.fecha IS NOT NULL
+                ORDER BY v.fecha, dv.id
+            """)
+            while True:
+                lote = cursor.fetchmany(self.tamano_lote)
+                if not lote:
+                    break
+                for (nombre, _, _), valores in zip(COLUMNAS, zip(*lote)):
+                    if nombre in CODIFICADAS:
+                        codigos = diccionarios[nombre]
+                        valores = [codigos.setdefault(valor, len(codigos)) for valor in valores]
+                    columnas[nombre].extend(valores)
+
+            nombres = {
+                'producto_id': {str(fila[0]): fila[1] for fila in conn.execute("SELECT id, nombre FROM productos")},
+                'usuario_id': {str(fila[0]): fila[1] for fila in conn.execute("SELECT id, username FROM usuarios")},
+                'cliente_id': {str(fila[0]): fila[1] for fila in conn.execute("SELECT id, nombre FROM clientes")}
+            }
+        finally:
+            conn.rollback()
+            conn.close()
+
+        dias = columnas['dia']
+        encabezado = {
+            'generado': datetime.now().isoformat(timespec='seconds'),
+            'base_datos': self.base_datos,
+            'filas': len(dias),
+            'desde': date.fromordinal(dias[0] + EPOCA).isoformat() if dias else None,
+            'hasta': date.fromordinal(dias[-1] + EPOCA).isoformat() if dias else None,
+            'diccionarios': {nombre: list(codigos) for nombre, codigos in diccionarios.items()},
+            'nombres': nombres
+        }
+        return [(nombre, columnas[nombre]) for nombre, _, _ in COLUMNAS], encabezado
+
+    def _escribir(self, ruta, columnas, encabezado):
+        encabezado['columnas'] = {}
+        posicion = 0
+        for nombre, datos in columnas:
+            encabezado['columnas'][nombre] = {'tipo': datos.typecode, 'offset': posicion}
+            posicion = _alinear(posicion + len(datos) * datos.itemsize)
+        cabecera = json.dumps(encabezado, ensure_ascii=False).encode('utf-8')
+
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(MAGICO)
+            archivo.write(struct.pack('<I', len(cabecera)))
+            archivo.write(cabecera)
+            archivo.write(b'\0' * (_alinear(archivo.tell()) - archivo.tell()))
+            inicio = archivo.tell()
+            for nombre, datos in columnas:
+                if sys.byteorder != 'little':
+                    datos.byteswap()
+                datos.tofile(archivo)
+                archivo.write(b'\0' * (_alinear(archivo.tell() - inicio) - (archivo.tell() - inicio)))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+    def _rotar(self, vigente):
+        rotados = []
+        for nombre in self._archivos()[self.conservar:]:
+            ruta = os.path.join(self.directorio, nombre)
+            if ruta == vigente:
+                continue
+            try:
+                os.remove(ruta)
+                rotados.append(nombre)
+            except OSError:
+                pass
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.col.tmp') and not os.path.exists(os.path.join(self.directorio, nombre[:-4])):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
+        return rotados
+
+    # ---------- Ejecución en segundo plano ----------
+    def programar(self, intervalo_s, demora_s=120):
+        """Hilo que exporta a los `demora_s` segundos y luego cada `intervalo_s`"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, args=(intervalo_s, demora_s),
+                                          name='analitica', daemon=True)
+            self._hilo.start()
+        return self
+
+    def _ciclo(self, intervalo_s, demora_s):
+        espera = demora_s
+        while True:
+            self._proxima = time.time() + espera
+            self._despertar.wait(espera)
+            self._despertar.clear()
+            if self._detener.is_set():
+                break
+            self.exportar()
+            espera = intervalo_s
+        self._proxima = None
+
+    def exportar_en_segundo_plano(self):
+        """Lanza una exportación sin esperar; False si ya hay una en curso"""
+        if self._en_curso.locked():
+            return False
+        threading.Thread(target=self.exportar, name='analitica-manual', daemon=True).start()
+        return True
+
+    def detener(self, timeout=5):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    def estado(self):
+        snapshot = self._actual
+        return {
+            'ultima_exportacion': dict(self._ultima),
+            'en_curso': self._en_curso.locked(),
+            'programada': self._hilo is not None and self._hilo.is_alive(),
+            'proxima': (datetime.fromtimestamp(self._proxima).isoformat(timespec='seconds')
+                        if self._proxima and self._hilo is not None else None),
+            'snapshot': snapshot.estadisticas() if snapshot else None
+        }
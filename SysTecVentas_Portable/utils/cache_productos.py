@@ -0,0 +1,127 @@
+# cache_productos.py - Caché acotado de productos por id, invalidado desde las rutas que escriben
+import threading
+from collections import OrderedDict
+
+COLUMNAS = ('id', 'nombre', 'precio', 'stock', 'categoria', 'codigo_barras', 'activo')
+
+
+class CacheProductos:
+    """Productos por id con LRU de `max_entradas`, para las lecturas del POS.
+
+    Solo se guardan filas leídas de la base y nunca se modifican en el caché:
+    cualquier escritura de un producto (incluido el descuento de stock del
+    checkout, ya confirmado) llama a invalidar() y la próxima lectura vuelve a
+    la base. El checkout sigue leyendo precio y stock dentro de su transacción.
+
+    Si hubo una invalidación mientras se leía de la base, lo leído se devuelve
+    pero no se guarda: podría ser anterior a la escritura que invalidó.
+
+    Las escrituras de otro proceso (`flask importar-productos`, otra instancia
+    sobre la misma base) no pasan por invalidar(): antes de cada lectura se
+    compara la versión de catalogo_cambios con la última vista y se descartan
+    los productos que cambiaron desde entonces. Sin cambios cuesta una
+    consulta sobre el índice de `cambio`.
+    """
+
+    def __init__(self, max_entradas=5000):
+        self.max_entradas = max_entradas
+        self._productos = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidaciones = 0
+        self._version = None
+        self._stats = {'aciertos': 0, 'fallos': 0, 'descartados': 0, 'invalidaciones': 0,
+                       'sincronizaciones': 0}
+
+    def obtener(self, producto_id, conectar):
+        return self.obtener_varios([producto_id], conectar).get(producto_id)
+
+    def obtener_varios(self, ids, conectar):
+        """{id: producto} de los `ids` que existen; los que faltan se leen juntos con `conectar()`"""
+        encontrados = {}
+        faltantes = []
+        filas = []
+        conn = conectar()
+        try:
+            self._sincronizar(conn)
+            with self._lock:
+                for producto_id in ids:
+                    producto = self._productos.get(producto_id)
+                    if producto is None:
+                        faltantes.append(producto_id)
+                    else:
+                        self._productos.move_to_end(producto_id)
+                        encontrados[producto_id] = dict(producto)
+                self._stats['aciertos'] += len(encontrados)
+                self._stats['fallos'] += len(faltantes)
+                invalidaciones = self._invalidaciones
+
+            for i in range(0, len(faltantes), 500):
+                bloque = faltantes[i:i + 500]
+                filas.extend(conn.execute(
+                    f"SELECT {', '.join(COLUMNAS)} FROM productos WHERE id IN ({','.join('?' * len(bloque))})",
+                    bloque
+                ).fetchall())
+        finally:
+            conn.close()
+
+        if not filas:
+            return encontrados
+
+        with self._lock:
+            guardar = invalidaciones == self._invalidaciones
+            for fila in filas:
+                producto = dict(zip(COLUMNAS, fila))
+                encontrados[producto['id']] = dict(producto)
+                if guardar:
+                    self._productos[producto['id']] = producto
+            while len(self._productos) > self.max_entradas:
+                self._productos.popitem(last=False)
+                self._stats['descartados'] += 1
+        return encontrados
+
+    def _sincronizar(self, conn):
+        """Descarta los productos modificados desde la última versión vista de catalogo_cambios"""
+        version = conn.execute("SELECT COALESCE(MAX(cambio), 0) FROM catalogo_cambios").fetchone()[0]
+        anterior = self._version
+        if version == anterior:
+            return
+
+        cambiados = None
+        if anterior is not None and version > anterior:
+            cambiados = [fila[0] for fila in conn.execute(
+                "SELECT producto_id FROM catalogo_cambios WHERE cambio > ? LIMIT ?",
+                (anterior, self.max_entradas + 1)
+            )]
+        with self._lock:
+            self._invalidaciones += 1
+            self._stats['sincronizaciones'] += 1
+            if cambiados is None or len(cambiados) > self.max_entradas:
+                # Primera lectura, base restaurada o demasiados cambios: empezar de cero
+                self._productos.clear()
+            else:
+                for producto_id in cambiados:
+                    self._productos.pop(producto_id, None)
+            if self._version is None or version > self._version or cambiados is None:
+                self._version = version
+
+    def invalidar(self, *ids):
+        with self._lock:
+            self._invalidaciones += 1
+            self._stats['invalidaciones'] += 1
+            for producto_id in ids:
+                self._productos.pop(int(producto_id), None)
+
+    def limpiar(self):
+        with self._lock:
+            self._invalidaciones += 1
+            self._stats['invalidaciones'] += 1
+            self._productos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self._stats['aciertos'] + self._stats['fallos']
+            return dict(self._stats,
+                        entradas=len(self._productos),
+                        version_catalogo=self._version,
+                        max_entradas=self.max_entradas,
+                        tasa_aciertos=round(self._stats['aciertos'] / consultas, 4) if consultas else 0.0)
@@ -0,0 +1,354 @@
+# datos_sinteticos.py - Generador determinista de datos de prueba a escala
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+# Volúmenes predefinidos (--escala); cada opción de la línea de comandos los pisa
+ESCALAS = {
+    'chica': {'productos': 1000, 'clientes': 500, 'ventas': 10000, 'logs': 5000, 'dias': 90},
+    'mediana': {'productos': 20000, 'clientes': 10000, 'ventas': 200000, 'logs': 100000, 'dias': 365},
+    'grande': {'productos': 100000, 'clientes': 50000, 'ventas': 2000000, 'logs': 1000000, 'dias': 730},
+}
+
+TAMANO_LOTE = 10000
+
+# categoría: (artículos, marcas, presentaciones, precio mediano)
+CATALOGO = {
+    'Bebidas': (['Gaseosa Cola', 'Gaseosa Lima', 'Agua Mineral', 'Agua Saborizada', 'Jugo Naranja', 'Cerveza Rubia',
+                 'Cerveza Negra', 'Vino Tinto', 'Vino Blanco', 'Energizante', 'Soda'],
+                ['Coca Cola', 'Pepsi', 'Villavicencio', 'Cepita', 'Quilmes', 'Brahma', 'Toro', 'Baggio', 'Speed'],
+                ['354ml', '500ml', '1L', '1.5L', '2.25L'], 1200),
+    'Almacén': (['Yerba Mate', 'Arroz Largo Fino', 'Fideos Tallarín', 'Fideos Mostachol', 'Aceite Girasol',
+                 'Harina 000', 'Azúcar', 'Sal Fina', 'Polenta', 'Lentejas', 'Puré de Tomate', 'Atún'],
+                ['La Merced', 'Gallo', 'Matarazzo', 'Lucchetti', 'Natura', 'Cañuelas', 'Ledesma', 'Celusal', 'Arcor'],
+                ['500g', '1kg', '2kg', '900ml', '1.5L'], 1800),
+    'Lácteos': (['Leche Entera', 'Leche Descremada', 'Yogur Bebible', 'Yogur Firme', 'Queso Cremoso',
+                 'Queso Rallado', 'Manteca', 'Crema de Leche', 'Dulce de Leche'],
+                ['La Serenísima', 'Sancor', 'Ilolay', 'Milkaut', 'Tregar'],
+                ['125g', '200g', '500g', '1L', '1kg'], 1500),
+    'Panadería': (['Pan Francés', 'Pan Lactal', 'Medialunas', 'Facturas', 'Bizcochitos', 'Prepizza', 'Tostadas'],
+                  ['Bimbo', 'Fargo', 'Lulemuu', 'Casera'],
+                  ['unidad', 'docena', '250g', '500g'], 900),
+    'Snacks': (['Papas Fritas', 'Palitos', 'Maní Salado', 'Chizitos', 'Galletitas Dulces', 'Galletitas Saladas',
+                'Alfajor', 'Chocolate', 'Caramelos', 'Chicles'],
+               ['Lay\'s', 'Pehuamar', 'Oreo', 'Terrabusi', 'Bagley', 'Havanna', 'Milka', 'Arcor', 'Beldent'],
+               ['40g', '80g', '150g', '300g', 'unidad'], 700),
+    'Limpieza': (['Detergente', 'Lavandina', 'Jabón en Polvo', 'Suavizante', 'Limpiador Multiuso',
+                  'Esponja', 'Trapo de Piso', 'Desodorante de Ambiente', 'Bolsas de Residuos'],
+                 ['Magistral', 'Ayudín', 'Skip', 'Ala', 'Vivere', 'Cif', 'Mr. Músculo', 'Glade'],
+                 ['500ml', '750ml', '1L', '3L', 'x10'], 1600),
+    'Cuidado Personal': (['Shampoo', 'Acondicionador', 'Jabón de Tocador', 'Pasta Dental', 'Desodorante',
+                          'Papel Higiénico', 'Pañales', 'Toallitas Húmedas', 'Protector Solar'],
+                         ['Sedal', 'Pantene', 'Dove', 'Colgate', 'Rexona', 'Elite', 'Higienol', 'Pampers', 'Huggies'],
+                         ['90g', '180ml', '400ml', 'x4', 'x30'], 2200),
+    'Congelados': (['Hamburguesas', 'Medallones de Pollo', 'Papas Bastón', 'Helado', 'Empanadas',
+                    'Pizza Congelada', 'Vegetales Mixtos'],
+                   ['Paty', 'Granja del Sol', 'McCain', 'Frigor', 'Swift'],
+                   ['x4', 'x12', '500g', '1kg', '1L'], 2800),
+    'Carnicería': (['Asado', 'Vacío', 'Milanesa de Nalga', 'Carne Picada', 'Pollo Entero', 'Chorizo',
+                    'Morcilla', 'Bondiola'],
+                   ['Corte Propio', 'Frigorífico Sur', 'Granja'],
+                   ['500g', '1kg', '2kg'], 5500),
+    'Verdulería': (['Papa', 'Cebolla', 'Tomate', 'Lechuga', 'Zanahoria', 'Manzana', 'Banana', 'Naranja', 'Limón'],
+                   ['Mercado Central', 'Quinta'],
+                   ['500g', '1kg', '2kg', 'unidad'], 800),
+    'Electronica': (['Pilas AA', 'Pilas AAA', 'Cargador USB', 'Cable USB-C', 'Auriculares', 'Lámpara LED',
+                     'Zapatilla Eléctrica'],
+                    ['Duracell', 'Energizer', 'Philips', 'Noblex', 'Genérico'],
+                    ['x2', 'x4', 'unidad', '1m', '2m'], 4500),
+    'Kiosco': (['Cigarrillos', 'Encendedor', 'Tarjeta SUBE', 'Recarga Celular', 'Revista'],
+               ['Marlboro', 'Philip Morris', 'Bic', 'Clipper'],
+               ['x10', 'x20', 'unidad'], 2500),
+}
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Laura', 'Jorge', 'Lucía', 'Pedro', 'Sofía', 'Diego',
+           'Valentina', 'Martín', 'Camila', 'Pablo', 'Florencia', 'Facundo', 'Micaela', 'Nicolás', 'Julieta',
+           'Santiago', 'Agustina', 'Matías', 'Paula', 'Gustavo', 'Silvia', 'Ricardo', 'Marta', 'Hernán', 'Rocío']
+APELLIDOS = ['González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez', 'García',
+             'Sánchez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores', 'Acosta', 'Benítez',
+             'Medina', 'Suárez', 'Herrera', 'Aguirre', 'Pereyra', 'Gutiérrez', 'Giménez', 'Molina', 'Silva']
+CALLES = ['San Martín', 'Belgrano', 'Rivadavia', 'Mitre', 'Sarmiento', 'Moreno', '9 de Julio', 'Urquiza',
+          'Av. Corrientes', 'Av. Libertador', 'Italia', 'España', 'Colón', 'Alem']
+
+# Peso relativo de cada hora del día: apertura a las 8, pico de mediodía y de salida del trabajo
+PESO_HORA = [0, 0, 0, 0, 0, 0, 0, 1, 4, 6, 8, 10, 11, 9, 5, 4, 5, 7, 10, 12, 11, 8, 4, 1]
+# Lunes a domingo
+PESO_DIA_SEMANA = [0.85, 0.85, 0.9, 0.95, 1.15, 1.35, 0.95]
+# Enero a diciembre: vacaciones de verano, aguinaldo y fiestas
+PESO_MES = [0.9, 0.85, 0.95, 0.95, 1.0, 0.95, 1.05, 1.0, 0.95, 1.0, 1.05, 1.4]
+
+METODOS_PAGO = ['efectivo', 'tarjeta', 'mercadopago', 'qr', 'credito']
+PESO_METODO_PAGO = [45, 25, 18, 8, 4]
+
+# Líneas por ticket (1..12) y unidades por línea (1..6)
+PESO_LINEAS = [30, 22, 15, 10, 7, 5, 4, 3, 2, 1, 0.6, 0.4]
+PESO_CANTIDAD = [70, 18, 6, 3, 2, 1]
+
+ACCIONES_LOG = [
+    ('Venta procesada', 'ventas', 60),
+    ('Login exitoso', 'usuarios', 12),
+    ('Logout', 'usuarios', 10),
+    ('Stock actualizado', 'productos', 8),
+    ('Producto editado', 'productos', 5),
+    ('Cliente creado', 'clientes', 3),
+    ('Exportación de ventas', 'ventas', 1),
+    ('Producto creado', 'productos', 1),
+]
+
+
+def _acumulados(pesos):
+    total = 0
+    acumulados = []
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+
+def _ean13(base12):
+    """Agrega el dígito verificador EAN-13 a 12 dígitos"""
+    suma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(base12))
+    return base12 + str((10 - suma % 10) % 10)
+
+
+def _lotes(total, tamano=TAMANO_LOTE):
+    for inicio in range(0, total, tamano):
+        yield inicio, min(tamano, total - inicio)
+
+
+class GeneradorDatos:
+    """Llena una base con datos sintéticos realistas a partir de una semilla.
+
+    La misma semilla, los mismos volúmenes y la misma fecha final `hasta`
+    producen exactamente la misma base. Todo se inserta con executemany en
+    transacciones de TAMANO_LOTE filas; los índices conviene crearlos después
+    (ver el comando `generar-datos`).
+    """
+
+    def __init__(self, conn, semilla=42, hasta=None, progreso=print):
+        self.conn = conn
+        self.rnd = random.Random(semilla)
+        self.hasta = hasta or date.today()
+        # Fin del último día del período
+        self.fin = datetime(self.hasta.year, self.hasta.month, self.hasta.day, 23, 59, 59)
+        self.progreso = progreso
+        self.resumen = {}
+
+    def _informar(self, tabla, filas, inicio):
+        self.resumen[tabla] = filas
+        self.progreso(f"   {tabla}: {filas:,} filas en {time.perf_counter() - inicio:.1f} s")
+
+    def usuarios(self, cajeros=4):
+        hash_clave = generate_password_hash('cajero')
+        filas = [(f'cajero{i}', hash_clave, 'vendedor') for i in range(1, cajeros + 1)]
+        self.conn.executemany("INSERT OR IGNORE INTO usuarios (username, password_hash, rol) VALUES (?, ?, ?)", filas)
+        self.conn.commit()
+        self.usuarios_ids = [row[0] for row in self.conn.execute("SELECT id FROM usuarios ORDER BY id")]
+
+    def categorias(self):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO categorias (nombre, descripcion) VALUES (?, ?)",
+            [(categoria, f'Categoría: {categoria}') for categoria in CATALOGO]
+        )
+        self.conn.commit()
+
+    def productos(self, cantidad, dias):
+        inicio = time.perf_counter()
+        rnd = self.rnd
+        categorias = list(CATALOGO)
+        primer_id = (self.conn.execute("SELECT MAX(id) FROM productos").fetchone()[0] or 0) + 1
+
+        self.precios = {}
+        for desde, tamano in _lotes(cantidad):
+            filas = []
+            for producto_id in range(primer_id + desde, primer_id + desde + tamano):
+                categoria = rnd.choice(categorias)
+                articulos, marcas, presentaciones, mediana = CATALOGO[categoria]
+                nombre = f"{rnd.choice(articulos)} {rnd.choice(marcas)} {rnd.choice(presentaciones)}"
+                # Precios log-normales alrededor de la mediana de la categoría
+                precio = round(mediana * math.exp(rnd.gauss(0, 0.45)) / 10) * 10 or 10
+                costo = round(precio * rnd.uniform(0.55, 0.8), 2)
+                stock = 0 if rnd.random() < 0.04 else int(rnd.paretovariate(1.6) * 8)
+                # Código único: permutación de los ids sobre 9 dígitos (7919 es coprimo con 10^9)
+                codigo = _ean13(f"779{(producto_id * 7919 + 104729) % 10 ** 9:09d}")
+                activo = 0 if rnd.random() < 0.03 else 1
+                alta = self.fin - timedelta(days=dias + rnd.randint(0, 365), seconds=rnd.randint(0, 86399))
+                filas.append((producto_id, f"{nombre} #{producto_id}", precio, costo, min(stock, 5000),
+                              activo, categoria, codigo, f"{nombre} - {categoria}",
+                              alta.strftime('%Y-%m-%d %H:%M:%S')))
+                self.precios[producto_id] = precio
+            self.conn.executemany("""
+                INSERT INTO productos (id, nombre, precio, precio_costo, stock, activo, categoria, codigo_barras,
+                                       descripcion, fecha_creacion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, filas)
+            self.conn.commit()
+
+        # Popularidad tipo Zipf: pocos productos concentran la mayoría de las ventas
+        ids = list(self.precios)
+        rnd.shuffle(ids)
+        self.productos_ids = ids
+        self.productos_acumulados = _acumulados(1 / (rango + 1) ** 1.1 for rango in range(len(ids)))
+        self._informar('productos', cantidad, inicio)
+
+    def clientes(self, cantidad, dias):
+        inicio = time.perf_counter()
+        rnd = self.rnd
+        primer_id = (self.conn.execute("SELECT MAX(id) FROM clientes").fetchone()[0] or 0) + 1
+
+        for desde, tamano in _lotes(cantidad):
+            filas = []
+            for cliente_id in range(primer_id + desde, primer_id + desde + tamano):
+                nombre = f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}"
+                usuario_mail = nombre.lower().replace(' ', '.').translate(str.maketrans('áéíóú', 'aeiou'))
+                filas.append((
+                    cliente_id,
+                    nombre,
+                    f"11{rnd.randint(10000000, 69999999)}",
+                    f"{usuario_mail}{cliente_id}@correo.com" if rnd.random() < 0.7 else '',
+                    f"{rnd.choice(CALLES)} {rnd.randint(1, 4999)}",
+                    (self.fin - timedelta(days=rnd.randint(0, dias), seconds=rnd.randint(0, 86399))).strftime('%Y-%m-%d %H:%M:%S')
+                ))
+            self.conn.executemany("""
+                INSERT INTO clientes (id, nombre, telefono, email, direccion, fecha_registro)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, filas)
+            self.conn.commit()
+
+        self.clientes_ids = list(range(primer_id, primer_id + cantidad))
+        self._informar('clientes', cantidad, inicio)
+
+    def _ventas_por_dia(self, cantidad, dias):
+        """Reparte `cantidad` ventas entre los últimos `dias` días según día de semana, mes y tendencia"""
+        fechas = [self.hasta - timedelta(days=dias - 1 - i) for i in range(dias)]
+        pesos = [
+            PESO_DIA_SEMANA[dia.weekday()] * PESO_MES[dia.month - 1]
+            # Crecimiento del negocio: +30% a lo largo del período
+            * (1 + 0.3 * i / max(dias - 1, 1))
+            * self.rnd.uniform(0.9, 1.1)
+            for i, dia in enumerate(fechas)
+        ]
+        total_peso = sum(pesos)
+        conteos = [int(cantidad * peso / total_peso) for peso in pesos]
+        # Lo que falta por redondeo va a los días más pesados
+        for i in sorted(range(dias), key=lambda i: -pesos[i])[:cantidad - sum(conteos)]:
+            conteos[i] += 1
+        return zip(fechas, conteos)
+
+    def ventas(self, cantidad, dias):
+        inicio = time.perf_counter()
+        rnd = self.rnd
+        conn = self.conn
+
+        venta_id = (conn.execute("SELECT MAX(id) FROM ventas").fetchone()[0] or 0) + 1
+        detalle_id = (conn.execute("SELECT MAX(id) FROM detalle_ventas").fetchone()[0] or 0) + 1
+        horas_acumuladas = _acumulados(PESO_HORA)
+        lineas_acumuladas = _acumulados(PESO_LINEAS)
+        cantidad_acumulada = _acumulados(PESO_CANTIDAD)
+        metodos_acumulados = _acumulados(PESO_METODO_PAGO)
+        clientes = getattr(self, 'clientes_ids', [])
+        usuarios = self.usuarios_ids
+
+        ventas, detalles = [], []
+        total_detalles = 0
+
+        def guardar():
+            conn.executemany("""
+                INSERT INTO ventas (id, fecha, total, usuario_id, metodo_pago, pagado, cliente_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, ventas)
+            conn.executemany("""
+                INSERT INTO detalle_ventas (id, venta_id, producto_id, cantidad, precio_unitario, subtotal)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, detalles)
+            conn.commit()
+            ventas.clear()
+            detalles.clear()
+
+        for dia, conteo in self._ventas_por_dia(cantidad, dias):
+            if not conteo:
+                continue
+            horas = rnd.choices(range(24), cum_weights=horas_acumuladas, k=conteo)
+            segundos = sorted(hora * 3600 + rnd.randrange(3600) for hora in horas)
+            base = datetime(dia.year, dia.month, dia.day)
+
+            for segundo in segundos:
+                fecha = (base + timedelta(seconds=segundo)).strftime('%Y-%m-%d %H:%M:%S')
+                num_lineas = rnd.choices(range(1, 13), cum_weights=lineas_acumuladas)[0]
+                productos = set(rnd.choices(self.productos_ids, cum_weights=self.productos_acumulados, k=num_lineas))
+
+                total = 0
+                for producto_id in productos:
+                    unidades = rnd.choices(range(1, 7), cum_weights=cantidad_acumulada)[0]
+                    precio = self.precios[producto_id]
+                    subtotal = precio * unidades
+                    total += subtotal
+                    detalles.append((detalle_id, venta_id, producto_id, unidades, precio, subtotal))
+                    detalle_id += 1
+
+                metodo = rnd.choices(METODOS_PAGO, cum_weights=metodos_acumulados)[0]
+                # Los fiados siempre tienen cliente; el resto, un 30%
+                cliente_id = None
+                if clientes and (metodo == 'credito' or rnd.random() < 0.3):
+                    cliente_id = clientes[min(int(rnd.paretovariate(1.2)) - 1, len(clientes) - 1)] \
+                        if rnd.random() < 0.5 else rnd.choice(clientes)
+                pagado = 0 if metodo == 'credito' and rnd.random() < 0.4 else 1
+
+                ventas.append((venta_id, fecha, total, rnd.choice(usuarios), metodo, pagado, cliente_id))
+                venta_id += 1
+
+                if len(ventas) >= TAMANO_LOTE:
+                    total_detalles += len(detalles)
+                    guardar()
+
+        total_detalles += len(detalles)
+        guardar()
+        self._informar('ventas', cantidad, inicio)
+        self.resumen['detalle_ventas'] = total_detalles
+
+    def logs(self, cantidad, dias):
+        inicio = time.perf_counter()
+        rnd = self.rnd
+        acciones_acumuladas = _acumulados(peso for _, _, peso in ACCIONES_LOG)
+        desde_fecha = self.fin - timedelta(days=dias)
+        segundos_periodo = dias * 86400
+        usuarios = self.usuarios_ids
+
+        # Instantes ordenados para que id y fecha crezcan juntos, como en una base real
+        instantes = sorted(rnd.randrange(segundos_periodo) for _ in range(cantidad))
+        for desde, tamano in _lotes(cantidad):
+            filas = []
+            for segundo in instantes[desde:desde + tamano]:
+                accion, tabla, _ = rnd.choices(ACCIONES_LOG, cum_weights=acciones_acumuladas)[0]
+                filas.append((
+                    rnd.choice(usuarios),
+                    accion,
+                    tabla,
+                    rnd.randint(1, 100000),
+                    f"Total: ${rnd.randint(100, 50000)}.00" if tabla == 'ventas' else None,
+                    (desde_fecha + timedelta(seconds=segundo)).strftime('%Y-%m-%d %H:%M:%S')
+                ))
+            self.conn.executemany("""
+                INSERT INTO logs (usuario_id, accion, tabla_afectada, registro_id, detalles, fecha)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, filas)
+            self.conn.commit()
+
+        self._informar('logs', cantidad, inicio)
+
+
+def generar_datos_sinteticos(conn, productos, clientes, ventas, logs, dias, semilla=42, hasta=None, progreso=print):
+    """Genera todo el conjunto de datos y devuelve {tabla: filas}"""
+    if ventas and not productos:
+        raise ValueError("Para generar ventas hace falta al menos un producto")
+    generador = GeneradorDatos(conn, semilla, hasta, progreso)
+    generador.usuarios()
+    generador.categorias()
+    generador.productos(productos, dias)
+    generador.clientes(clientes, dias)
+    generador.ventas(ventas, dias)
+    generador.logs(logs, dias)
+    return generador.resumen
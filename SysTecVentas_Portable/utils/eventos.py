@@ -0,0 +1,70 @@
+# eventos.py - Bus de eventos en memoria para el stream SSE (/api/eventos)
+import json
+import queue
+import threading
+from collections import deque
+
+
+class BusEventos:
+    """Publica eventos (stock, venta, stock_bajo...) a todas las terminales conectadas.
+
+    Cada suscriptor tiene su propia cola acotada; si un cliente lento la llena
+    se descartan sus eventos más viejos en lugar de frenar a quien publica.
+    Los últimos `historial` eventos quedan guardados para que un navegador que
+    se reconecta con Last-Event-ID reciba lo que se perdió.
+    """
+
+    def __init__(self, historial=500, max_cola=1000):
+        self.max_cola = max_cola
+        self._historial = deque(maxlen=historial)
+        self._suscriptores = set()
+        self._ultimo_id = 0
+        self._lock = threading.Lock()
+        self._stats = {'publicados': 0, 'descartados': 0}
+
+    def publicar(self, tipo, datos):
+        with self._lock:
+            self._ultimo_id += 1
+            evento = (self._ultimo_id, tipo, datos)
+            self._historial.append(evento)
+            self._stats['publicados'] += 1
+            suscriptores = list(self._suscriptores)
+
+        for cola in suscriptores:
+            while True:
+                try:
+                    cola.put_nowait(evento)
+                    break
+                except queue.Full:
+                    try:
+                        cola.get_nowait()
+                        with self._lock:
+                            self._stats['descartados'] += 1
+                    except queue.Empty:
+                        pass
+        return evento[0]
+
+    def suscribir(self, ultimo_id=None):
+        """Devuelve una cola nueva, precargada con los eventos posteriores a `ultimo_id`"""
+        cola = queue.Queue(maxsize=self.max_cola)
+        with self._lock:
+            if ultimo_id is not None:
+                for evento in self._historial:
+                    if evento[0] > ultimo_id:
+                        cola.put_nowait(evento)
+            self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._suscriptores.discard(cola)
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, suscriptores=len(self._suscriptores), ultimo_id=self._ultimo_id)
+
+
+def formatear_sse(evento):
+    """(id, tipo, datos) -> bloque de texto del protocolo text/event-stream"""
+    evento_id, tipo, datos = evento
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(datos, default=str)}\n\n"
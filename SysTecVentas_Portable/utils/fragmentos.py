@@ -0,0 +1,75 @@
+# fragmentos.py - Caché de fragmentos de plantillas según la versión de los datos que muestran
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionesDatos:
+    """Un contador por tabla que las rutas de escritura incrementan.
+
+    Un fragmento se guarda junto con las versiones de las tablas que leyó:
+    cuando alguna cambia, la clave deja de coincidir y el fragmento viejo
+    simplemente no se vuelve a usar (el LRU lo descarta).
+    """
+
+    def __init__(self):
+        self._versiones = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *tablas):
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def version(self, *tablas):
+        return tuple(self._versiones.get(tabla, 0) for tabla in tablas)
+
+    def todas(self):
+        return dict(self._versiones)
+
+
+class CacheFragmentos:
+    """HTML ya renderizado por clave, con LRU de `max_entradas` y vencimiento a los `ttl_s` segundos.
+
+    El vencimiento cubre las escrituras que no pasan por las rutas (por ejemplo
+    `flask importar-productos` desde otro proceso): en el peor caso un
+    fragmento queda desactualizado `ttl_s` segundos.
+    """
+
+    def __init__(self, max_entradas=128, ttl_s=300):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'aciertos': 0, 'fallos': 0, 'descartados': 0}
+
+    def obtener(self, clave, generar):
+        """Fragmento cacheado de `clave`, o el resultado de `generar()` que queda guardado"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and ahora - entrada[1] < self.ttl_s:
+                self._entradas.move_to_end(clave)
+                self._stats['aciertos'] += 1
+                return entrada[0]
+            self._stats['fallos'] += 1
+
+        # Fuera del lock: dos requests simultáneos pueden generar el mismo fragmento, no es grave
+        html = str(generar())
+        with self._lock:
+            self._entradas[clave] = (html, ahora)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._stats['descartados'] += 1
+        return html
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats,
+                        entradas=len(self._entradas),
+                        bytes=sum(len(html) for html, _ in self._entradas.values()))
@@ -0,0 +1,185 @@
+# importacion_productos.py - Importación masiva de productos desde CSV
+import csv
+import math
+import time
+import unicodedata
+
+# Columnas reconocidas (mismas que genera /productos/exportar)
+COLUMNAS = ('nombre', 'precio', 'precio_costo', 'stock', 'categoria', 'codigo_barras', 'estado', 'activo', 'descripcion')
+
+# Orden usado cuando el archivo no trae encabezados
+COLUMNAS_SIN_ENCABEZADO = ('nombre', 'precio', 'precio_costo', 'stock', 'activo')
+
+MAX_ERRORES_DETALLE = 50
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+def _normalizar_encabezado(texto):
+    """'Código Barras' -> 'codigo_barras'"""
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return texto.replace(' ', '_')
+
+
+def _numero(valor, campo, tipo=float):
+    valor = (valor or '').strip()
+    if not valor:
+        return tipo(0)
+    # Acepta coma decimal ("1234,50")
+    if ',' in valor and '.' not in valor:
+        valor = valor.replace(',', '.')
+    try:
+        numero = float(valor)
+        # 'nan', 'inf' y '1e999' son float válidos pero no un precio ni un stock
+        if not math.isfinite(numero):
+            raise ValueError(valor)
+        numero = tipo(numero)
+    except (ValueError, OverflowError):
+        raise ErrorFila(f"{campo} inválido: '{valor}'")
+    if numero < 0:
+        raise ErrorFila(f"{campo} no puede ser negativo")
+    return numero
+
+
+def _activo(fila):
+    if fila.get('estado'):
+        return 0 if fila['estado'].strip().lower() == 'inactivo' else 1
+    if fila.get('activo'):
+        return 0 if fila['activo'].strip().lower() in ('0', 'no', 'false', 'inactivo') else 1
+    return 1
+
+
+def validar_fila(fila):
+    """Convierte una fila del CSV en la tupla a guardar o lanza ErrorFila"""
+    nombre = (fila.get('nombre') or '').strip()
+    if not nombre:
+        raise ErrorFila("el nombre es obligatorio")
+
+    return {
+        'nombre': nombre,
+        'precio': _numero(fila.get('precio'), 'precio'),
+        'precio_costo': _numero(fila.get('precio_costo'), 'precio_costo'),
+        'stock': _numero(fila.get('stock'), 'stock', int),
+        'categoria': (fila.get('categoria') or '').strip() or 'General',
+        'codigo_barras': (fila.get('codigo_barras') or '').strip(),
+        'descripcion': (fila.get('descripcion') or '').strip(),
+        'activo': _activo(fila)
+    }
+
+
+def leer_filas(archivo_texto):
+    """Genera (numero_linea, dict) leyendo el CSV de a una fila"""
+    lector = csv.reader(archivo_texto)
+    primera = next(lector, None)
+    if primera is None:
+        return
+
+    encabezados = [_normalizar_encabezado(c) for c in primera]
+    if 'nombre' in encabezados:
+        columnas = encabezados
+    else:
+        columnas = COLUMNAS_SIN_ENCABEZADO
+        yield 1, dict(zip(columnas, primera))
+
+    for numero, valores in enumerate(lector, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, dict(zip(columnas, valores))
+
+
+def _guardar_lote(conn, lote, resumen):
+    # Un mismo código repetido en el lote: gana la última fila
+    con_codigo = {}
+    sin_codigo = []
+    for producto in lote:
+        if producto['codigo_barras']:
+            con_codigo[producto['codigo_barras']] = producto
+        else:
+            sin_codigo.append(producto)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        categorias = {p['categoria'] for p in lote}
+        antes = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO categorias (nombre, descripcion) VALUES (?, ?)",
+                         [(c, f'Categoría: {c}') for c in categorias])
+        resumen['categorias_creadas'] += conn.total_changes - antes
+
+        existentes = {}
+        codigos = list(con_codigo)
+        for i in range(0, len(codigos), 500):
+            bloque = codigos[i:i + 500]
+            marcadores = ','.join('?' * len(bloque))
+            for producto_id, codigo in conn.execute(
+                # "!= ''" permite usar el índice único parcial de codigo_barras
+                f"SELECT id, codigo_barras FROM productos WHERE codigo_barras IN ({marcadores}) AND codigo_barras != ''",
+                bloque
+            ).fetchall():
+                existentes[codigo] = producto_id
+
+        actualizar = [p for c, p in con_codigo.items() if c in existentes]
+        insertar = [p for c, p in con_codigo.items() if c not in existentes] + sin_codigo
+
+        conn.executemany("""
+            UPDATE productos
+            SET nombre = ?, precio = ?, precio_costo = ?, stock = ?, categoria = ?, descripcion = ?, activo = ?
+            WHERE id = ?
+        """, [(p['nombre'], p['precio'], p['precio_costo'], p['stock'], p['categoria'],
+               p['descripcion'], p['activo'], existentes[p['codigo_barras']]) for p in actualizar])
+
+        conn.executemany("""
+            INSERT INTO productos (nombre, precio, precio_costo, stock, categoria, codigo_barras, descripcion, activo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(p['nombre'], p['precio'], p['precio_costo'], p['stock'], p['categoria'],
+               p['codigo_barras'], p['descripcion'], p['activo']) for p in insertar])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    resumen['actualizados'] += len(actualizar)
+    resumen['insertados'] += len(insertar)
+    resumen['lotes'] += 1
+
+
+def importar_productos_csv(conn, archivo_texto, tamano_lote=5000):
+    """Importa productos desde un archivo de texto CSV, insertando o actualizando
+    por codigo_barras en transacciones de `tamano_lote` filas.
+
+    Devuelve un resumen con totales y los primeros errores de validación.
+    """
+    inicio = time.perf_counter()
+    resumen = {
+        'filas_leidas': 0,
+        'insertados': 0,
+        'actualizados': 0,
+        'categorias_creadas': 0,
+        'lotes': 0,
+        'errores': 0,
+        'detalle_errores': []
+    }
+
+    lote = []
+    for numero, fila in leer_filas(archivo_texto):
+        resumen['filas_leidas'] += 1
+        try:
+            lote.append(validar_fila(fila))
+        except ErrorFila as e:
+            resumen['errores'] += 1
+            if len(resumen['detalle_errores']) < MAX_ERRORES_DETALLE:
+                resumen['detalle_errores'].append({'linea': numero, 'error': str(e)})
+            continue
+
+        if len(lote) >= tamano_lote:
+            _guardar_lote(conn, lote, resumen)
+            lote = []
+
+    if lote:
+        _guardar_lote(conn, lote, resumen)
+
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
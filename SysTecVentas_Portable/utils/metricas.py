@@ -0,0 +1,193 @@
+# metricas.py - Contadores e histogramas en memoria con exportación en formato Prometheus
+import bisect
+import threading
+import time
+from collections import deque
+
+# Límites superiores (segundos) de los buckets. Los de Prometheus empiezan en 5 ms,
+# pero con SQLite local la mayoría de los requests tarda menos de eso
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Espera del bloqueo de escritura: sin contención son microsegundos
+BUCKETS_ESPERA = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histograma:
+    """Histograma de buckets fijos: observar es O(log n) y no guarda muestras"""
+
+    __slots__ = ('limites', 'conteos', 'cantidad', 'suma')
+
+    def __init__(self, limites=BUCKETS_LATENCIA):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.limites, valor)] += 1
+        self.cantidad += 1
+        self.suma += valor
+
+    def acumulados(self):
+        """[(limite, cantidad <= limite)] terminando en ('+Inf', total)"""
+        total = 0
+        resultado = []
+        for limite, conteo in zip(self.limites + ('+Inf',), self.conteos):
+            total += conteo
+            resultado.append((limite, total))
+        return resultado
+
+    def percentil(self, p):
+        """Estimación por interpolación lineal dentro del bucket (como histogram_quantile)"""
+        if not self.cantidad:
+            return 0.0
+        objetivo = p / 100 * self.cantidad
+        anterior_limite, anterior_total = 0.0, 0
+        for limite, total in self.acumulados():
+            if total >= objetivo:
+                if limite == '+Inf':
+                    return self.limites[-1]
+                dentro = total - anterior_total
+                fraccion = (objetivo - anterior_total) / dentro if dentro else 1
+                return anterior_limite + (limite - anterior_limite) * fraccion
+            anterior_limite, anterior_total = limite, total
+        return self.limites[-1]
+
+
+class TasaPorMinuto:
+    """Eventos por minuto de los últimos `minutos` minutos (un contador por minuto)"""
+
+    def __init__(self, minutos=60):
+        self._minutos = deque(maxlen=minutos)
+
+    def registrar(self, cantidad=1, ahora=None):
+        minuto = int((ahora or time.time()) // 60)
+        if self._minutos and self._minutos[-1][0] == minuto:
+            self._minutos[-1][1] += cantidad
+        else:
+            self._minutos.append([minuto, cantidad])
+
+    def promedio(self, minutos, ahora=None):
+        """Promedio por minuto de los últimos `minutos` minutos completos más el actual"""
+        actual = int((ahora or time.time()) // 60)
+        total = sum(cantidad for minuto, cantidad in self._minutos if actual - minuto < minutos)
+        return total / minutos
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(round(valor, 6))
+    return str(valor)
+
+
+class RegistroMetricas:
+    """Métricas del proceso: contadores e histogramas con etiquetas.
+
+    Las series se identifican por (nombre, etiquetas) con las etiquetas como
+    tupla de pares ordenada. Todo queda en memoria: se pierde al reiniciar,
+    igual que en cualquier exportador de Prometheus.
+    """
+
+    def __init__(self):
+        self._contadores = {}
+        self._histogramas = {}
+        self._ayuda = {}
+        self._tasas = {}
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+
+    def describir(self, nombre, ayuda):
+        self._ayuda[nombre] = ayuda
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, limites=BUCKETS_LATENCIA, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def registrar_tasa(self, nombre, cantidad=1):
+        with self._lock:
+            tasa = self._tasas.get(nombre)
+            if tasa is None:
+                tasa = self._tasas[nombre] = TasaPorMinuto()
+            tasa.registrar(cantidad)
+
+    def tasa(self, nombre, minutos):
+        with self._lock:
+            tasa = self._tasas.get(nombre)
+            return round(tasa.promedio(minutos), 3) if tasa else 0.0
+
+    def contador(self, nombre, **etiquetas):
+        with self._lock:
+            return self._contadores.get((nombre, tuple(sorted(etiquetas.items()))), 0)
+
+    def series(self, nombre):
+        """{etiquetas: valor o Histograma} de una métrica (copia, segura fuera del lock)"""
+        with self._lock:
+            resultado = {etiquetas: valor for (n, etiquetas), valor in self._contadores.items() if n == nombre}
+            for (n, etiquetas), histograma in self._histogramas.items():
+                if n == nombre:
+                    copia = Histograma(histograma.limites)
+                    copia.conteos = list(histograma.conteos)
+                    copia.cantidad = histograma.cantidad
+                    copia.suma = histograma.suma
+                    resultado[etiquetas] = copia
+        return resultado
+
+    def prometheus(self, medidores=()):
+        """Texto en formato de exposición de Prometheus 0.0.4.
+
+        `medidores` son valores instantáneos calculados al momento del scrape:
+        [(nombre, tipo, ayuda, [(etiquetas_dict, valor)])].
+        """
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((clave, (list(h.acumulados()), h.suma, h.cantidad))
+                                 for clave, h in self._histogramas.items())
+
+        lineas = []
+        declaradas = set()
+
+        def cabecera(nombre, tipo, ayuda=None):
+            if nombre in declaradas:
+                return
+            declaradas.add(nombre)
+            ayuda = ayuda or self._ayuda.get(nombre)
+            if ayuda:
+                lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+
+        for (nombre, etiquetas), valor in contadores:
+            cabecera(nombre, 'counter')
+            lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+
+        for (nombre, etiquetas), (acumulados, suma, cantidad) in histogramas:
+            cabecera(nombre, 'histogram')
+            for limite, total in acumulados:
+                le = limite if limite == '+Inf' else _numero(float(limite))
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", le),))} {total}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(float(suma))}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {cantidad}')
+
+        for nombre, tipo, ayuda, valores in medidores:
+            cabecera(nombre, tipo, ayuda)
+            for etiquetas, valor in valores:
+                lineas.append(f'{nombre}{_etiquetas(sorted(etiquetas.items()))} {_numero(valor)}')
+
+        return '\n'.join(lineas) + '\n'
@@ -0,0 +1,123 @@
+# migraciones.py - Migraciones de esquema numeradas, registradas en la tabla schema_version
+import inspect
+import sqlite3
+import time
+from datetime import datetime
+
+TABLA_VERSIONES = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        descripcion TEXT NOT NULL,
+        aplicada TEXT NOT NULL,
+        duracion_ms REAL
+    )
+"""
+
+
+class Migracion:
+    __slots__ = ('version', 'descripcion', 'funcion')
+
+    def __init__(self, version, descripcion, funcion):
+        self.version = version
+        self.descripcion = descripcion
+        self.funcion = funcion
+
+
+class Migraciones:
+    """Registro ordenado de migraciones.
+
+    Cada migración es una función que recibe la conexión y corre dentro de
+    una transacción BEGIN IMMEDIATE junto con su fila en schema_version: o se
+    aplica completa o no se aplica. Las que rellenan datos en tablas grandes
+    pueden ser generadores: en cada `yield` se confirma el lote y se abre una
+    transacción nueva, así que deben poder repetirse desde cero si el proceso
+    se corta a mitad de camino (la versión se registra recién con el último lote).
+    """
+
+    def __init__(self):
+        self._migraciones = {}
+
+    def registrar(self, version, descripcion):
+        def decorador(funcion):
+            if version in self._migraciones:
+                raise ValueError(f"Migración {version} duplicada")
+            self._migraciones[version] = Migracion(version, descripcion, funcion)
+            return funcion
+        return decorador
+
+    def todas(self):
+        return [self._migraciones[v] for v in sorted(self._migraciones)]
+
+    @property
+    def ultima_version(self):
+        return max(self._migraciones, default=0)
+
+    def version_actual(self, conn):
+        """Versión aplicada (0 en bases creadas antes del sistema de migraciones)"""
+        try:
+            return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+        except sqlite3.OperationalError as e:
+            if 'no such table' not in str(e):
+                raise
+            return 0
+
+    def historial(self, conn):
+        try:
+            return [dict(zip(('version', 'descripcion', 'aplicada', 'duracion_ms'), fila)) for fila in conn.execute(
+                "SELECT version, descripcion, aplicada, duracion_ms FROM schema_version ORDER BY version"
+            ).fetchall()]
+        except sqlite3.OperationalError:
+            return []
+
+    def pendientes(self, conn):
+        actual = self.version_actual(conn)
+        return [m for m in self.todas() if m.version > actual]
+
+    def aplicar(self, conn, progreso=print):
+        """Aplica en orden las migraciones pendientes y devuelve las aplicadas.
+
+        Si la base ya está al día cuesta una sola consulta.
+        """
+        actual = self.version_actual(conn)
+        if actual >= self.ultima_version:
+            if actual > self.ultima_version:
+                progreso(f"⚠️  La base está en la versión {actual}, más nueva que esta aplicación "
+                         f"({self.ultima_version})")
+            return []
+
+        conn.execute(TABLA_VERSIONES)
+        conn.commit()
+
+        aplicadas = []
+        for migracion in self.todas():
+            if migracion.version <= actual:
+                continue
+
+            inicio = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo haberla aplicado mientras esperábamos el bloqueo
+                if conn.execute("SELECT 1 FROM schema_version WHERE version = ?",
+                                (migracion.version,)).fetchone():
+                    conn.rollback()
+                    continue
+
+                progreso(f"🔧 Migración {migracion.version}: {migracion.descripcion}")
+                resultado = migracion.funcion(conn)
+                if inspect.isgenerator(resultado):
+                    for _ in resultado:
+                        conn.commit()
+                        conn.execute("BEGIN IMMEDIATE")
+
+                duracion_ms = round((time.perf_counter() - inicio) * 1000, 3)
+                conn.execute("""
+                    INSERT INTO schema_version (version, descripcion, aplicada, duracion_ms)
+                    VALUES (?, ?, ?, ?)
+                """, (migracion.version, migracion.descripcion,
+                      datetime.now().isoformat(sep=' ', timespec='seconds'), duracion_ms))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            aplicadas.append(migracion)
+        return aplicadas
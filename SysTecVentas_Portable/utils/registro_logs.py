@@ -0,0 +1,124 @@
+# registro_logs.py - Escritura asíncrona y por lotes de la tabla logs
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class EscritorLogs:
+    """Cola en memoria de registros de auditoría drenada por un hilo de fondo.
+
+    Los registros se insertan en una sola transacción cada `intervalo_ms`
+    milisegundos o cada `max_lote` filas (lo que ocurra primero), en lugar de
+    un commit por línea dentro del request.
+    """
+
+    def __init__(self, conectar, intervalo_ms=250, max_lote=200, max_cola=10000):
+        self.conectar = conectar
+        self.intervalo = intervalo_ms / 1000
+        self.max_lote = max_lote
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._stats = {
+            'encolados': 0,
+            'escritos': 0,
+            'lotes': 0,
+            'sincronos': 0,
+            'errores': 0,
+            'profundidad_maxima': 0
+        }
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ejecutar, name='escritor-logs', daemon=True)
+            self._hilo.start()
+        return self
+
+    def registrar(self, usuario_id, accion, tabla_afectada=None, registro_id=None, detalles=None):
+        # Misma fecha que daría CURRENT_TIMESTAMP al momento del evento (UTC)
+        fecha = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        fila = (usuario_id, accion, tabla_afectada, registro_id, detalles, fecha)
+
+        try:
+            self._cola.put_nowait(fila)
+        except queue.Full:
+            # Cola saturada: escribir en el momento antes que perder el registro
+            self._escribir([fila])
+            with self._lock:
+                self._stats['sincronos'] += 1
+            return
+
+        with self._lock:
+            self._stats['encolados'] += 1
+            self._stats['profundidad_maxima'] = max(self._stats['profundidad_maxima'], self._cola.qsize())
+
+    def _ejecutar(self):
+        conn = self.conectar()
+        try:
+            while not (self._detener.is_set() and self._cola.empty()):
+                lote = self._tomar_lote()
+                if lote:
+                    self._escribir(lote, conn)
+                    for _ in lote:
+                        self._cola.task_done()
+        finally:
+            conn.close()
+
+    def _tomar_lote(self):
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _escribir(self, lote, conn=None):
+        propia = conn is None
+        if propia:
+            conn = self.conectar()
+        try:
+            conn.executemany("""
+                INSERT INTO logs (usuario_id, accion, tabla_afectada, registro_id, detalles, fecha)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, lote)
+            conn.commit()
+            with self._lock:
+                self._stats['escritos'] += len(lote)
+                self._stats['lotes'] += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            with self._lock:
+                self._stats['errores'] += 1
+            print(f"Error escribiendo logs ({len(lote)} registros): {e}")
+        finally:
+            if propia:
+                conn.close()
+
+    def vaciar(self, timeout=5):
+        """Esperar a que se escriban todos los registros encolados"""
+        limite = time.monotonic() + timeout
+        while self._cola.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.01)
+        return self._cola.unfinished_tasks == 0
+
+    def detener(self, timeout=5):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['profundidad'] = self._cola.qsize()
+        stats['activo'] = self._hilo is not None and self._hilo.is_alive()
+        return stats
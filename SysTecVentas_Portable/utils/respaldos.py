@@ -0,0 +1,204 @@
+# respaldos.py - Backups en caliente con la API de backup de SQLite, comprimidos y rotados
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+PATRON_ARCHIVO = re.compile(r'^systec_ventas_\d{8}_\d{6}\.db\.gz$')
+
+MAX_TRABAJOS = 20
+
+
+class Respaldos:
+    """Copia la base en pasos de `paginas_por_paso` páginas desde un hilo de fondo.
+
+    La conexión de origen abre una transacción de lectura antes de copiar:
+    en WAL eso fija una instantánea, así que los checkouts siguen escribiendo
+    sin bloquearse y el backup no se reinicia cada vez que cambia una página
+    (sin la transacción, sqlite3_backup_step vuelve a empezar ante cualquier
+    escritura de otra conexión y con ventas continuas podría no terminar).
+
+    Cada copia se verifica con PRAGMA integrity_check, se comprime a
+    systec_ventas_AAAAMMDD_HHMMSS.db.gz y se conservan las `conservar` más
+    nuevas. Solo corre un backup a la vez.
+    """
+
+    def __init__(self, conectar, directorio='backups', paginas_por_paso=256, pausa_ms=5, conservar=10):
+        self.conectar = conectar
+        self.directorio = directorio
+        self.paginas_por_paso = paginas_por_paso
+        self.pausa = pausa_ms / 1000
+        self.conservar = conservar
+        self._trabajos = OrderedDict()
+        self._actual = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, usuario=None):
+        """(trabajo, nuevo): si ya hay un backup en curso se devuelve ese"""
+        with self._lock:
+            if self._actual is not None:
+                return dict(self._trabajos[self._actual]), False
+
+            trabajo = {
+                'id': uuid.uuid4().hex[:12],
+                'estado': 'en_cola',
+                'progreso': 0.0,
+                'paginas_total': None,
+                'paginas_copiadas': 0,
+                'usuario': usuario,
+                'inicio': datetime.now().isoformat(timespec='seconds'),
+                'fin': None,
+                'duracion_s': None,
+                'archivo': None,
+                'tamano_bytes': None,
+                'tamano_comprimido': None,
+                'sha256': None,
+                'integridad': None,
+                'rotados': [],
+                'error': None
+            }
+            self._trabajos[trabajo['id']] = trabajo
+            while len(self._trabajos) > MAX_TRABAJOS:
+                self._trabajos.popitem(last=False)
+            self._actual = trabajo['id']
+
+        threading.Thread(target=self._ejecutar, args=(trabajo,), name='backup', daemon=True).start()
+        return dict(trabajo), True
+
+    def trabajo(self, trabajo_id):
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo else None
+
+    def trabajos(self):
+        with self._lock:
+            return [dict(t) for t in reversed(self._trabajos.values())]
+
+    def en_curso(self):
+        with self._lock:
+            return dict(self._trabajos[self._actual]) if self._actual else None
+
+    def _actualizar(self, trabajo, **cambios):
+        with self._lock:
+            trabajo.update(cambios)
+
+    def _ejecutar(self, trabajo):
+        inicio = time.perf_counter()
+        nombre = f"systec_ventas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        copia = os.path.join(self.directorio, nombre + '.tmp')
+        comprimido = os.path.join(self.directorio, nombre + '.gz')
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._limpiar_temporales()
+
+            self._copiar(trabajo, copia)
+
+            self._actualizar(trabajo, estado='verificando')
+            destino = sqlite3.connect(copia)
+            try:
+                resultado = [fila[0] for fila in destino.execute("PRAGMA integrity_check").fetchall()]
+            finally:
+                destino.close()
+            if resultado != ['ok']:
+                raise sqlite3.DatabaseError(f"integrity_check falló: {'; '.join(resultado[:5])}")
+            self._actualizar(trabajo, integridad='ok')
+
+            self._actualizar(trabajo, estado='comprimiendo')
+            sha256 = self._comprimir(copia, comprimido)
+
+            final = {'estado': 'completado', 'progreso': 100.0, 'archivo': os.path.basename(comprimido),
+                     'tamano_bytes': os.path.getsize(copia), 'tamano_comprimido': os.path.getsize(comprimido),
+                     'sha256': sha256, 'rotados': self._rotar()}
+        except Exception as e:
+            final = {'estado': 'error', 'error': str(e)}
+            print(f"❌ Error creando backup: {e}")
+            if os.path.exists(comprimido + '.tmp'):
+                os.remove(comprimido + '.tmp')
+        finally:
+            if os.path.exists(copia):
+                os.remove(copia)
+
+        # Estado final, fin y duración juntos: quien consulta nunca ve 'completado' a medias
+        with self._lock:
+            trabajo.update(final, fin=datetime.now().isoformat(timespec='seconds'),
+                           duracion_s=round(time.perf_counter() - inicio, 3))
+            self._actual = None
+
+    def _copiar(self, trabajo, ruta):
+        origen = self.conectar()
+        destino = sqlite3.connect(ruta)
+        try:
+            # Instantánea de lectura: ver docstring de la clase
+            origen.execute("BEGIN")
+            origen.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            self._actualizar(trabajo, estado='copiando')
+
+            def progreso(estado, restantes, total):
+                self._actualizar(trabajo, paginas_total=total, paginas_copiadas=total - restantes,
+                                 progreso=round((total - restantes) / total * 90, 1) if total else 0.0)
+                # sqlite3 solo duerme entre pasos si la base está ocupada; acá se cede siempre
+                if self.pausa:
+                    time.sleep(self.pausa)
+
+            origen.backup(destino, pages=self.paginas_por_paso, progress=progreso)
+            # La copia hereda WAL del encabezado; en modo DELETE el .db restaurado es un único archivo
+            destino.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            destino.close()
+            origen.rollback()
+            origen.close()
+
+    def _comprimir(self, origen, destino):
+        sha256 = hashlib.sha256()
+        temporal = destino + '.tmp'
+        with open(origen, 'rb') as entrada, open(temporal, 'wb') as crudo:
+            with gzip.GzipFile(filename=os.path.basename(origen)[:-len('.tmp')], fileobj=crudo,
+                               mode='wb', compresslevel=6) as salida:
+                for bloque in iter(lambda: entrada.read(1024 * 1024), b''):
+                    sha256.update(bloque)
+                    salida.write(bloque)
+            crudo.flush()
+            os.fsync(crudo.fileno())
+        os.replace(temporal, destino)
+        return sha256.hexdigest()
+
+    def _limpiar_temporales(self):
+        """Restos de un backup interrumpido (el proceso se cerró a mitad de copia)"""
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith('systec_ventas_') and nombre.endswith('.tmp'):
+                os.remove(os.path.join(self.directorio, nombre))
+
+    def archivos(self):
+        """Backups disponibles, del más nuevo al más viejo"""
+        if not os.path.isdir(self.directorio):
+            return []
+        archivos = []
+        for nombre in sorted(os.listdir(self.directorio), reverse=True):
+            if PATRON_ARCHIVO.match(nombre):
+                ruta = os.path.join(self.directorio, nombre)
+                archivos.append({
+                    'archivo': nombre,
+                    'tamano_comprimido': os.path.getsize(ruta),
+                    'fecha': datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat(timespec='seconds')
+                })
+        return archivos
+
+    def ruta(self, nombre):
+        """Ruta de un backup por nombre, o None si el nombre no es uno de los nuestros"""
+        if not PATRON_ARCHIVO.match(nombre or ''):
+            return None
+        ruta = os.path.join(self.directorio, nombre)
+        return ruta if os.path.exists(ruta) else None
+
+    def _rotar(self):
+        rotados = []
+        for archivo in self.archivos()[self.conservar:]:
+            os.remove(os.path.join(self.directorio, archivo['archivo']))
+            rotados.append(archivo['archivo'])
+        return rotados
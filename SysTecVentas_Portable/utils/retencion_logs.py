@@ -0,0 +1,210 @@
+# retencion_logs.py - Retención de la tabla logs: archivo mensual comprimido y borrado por lotes
+import csv
+import gzip
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+COLUMNAS = ('id', 'usuario_id', 'accion', 'tabla_afectada', 'registro_id', 'detalles', 'fecha')
+
+INDICE_FECHA = "CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs(fecha)"
+
+
+class RetencionLogs:
+    """Borra los logs más viejos que `dias` en lotes chicos recorriendo el índice por fecha.
+
+    Cada lote se lee fuera de toda transacción (en WAL no bloquea a nadie), se
+    agrega a archivo_logs/logs_AAAA-MM.csv.gz si hay `directorio_archivo` y
+    recién entonces se borra en una transacción corta. Entre lotes se duerme
+    `pausa_ms` para que los checkouts tomen el bloqueo de escritura. Si el
+    proceso se corta entre archivar y borrar, el lote se vuelve a archivar en
+    la pasada siguiente: el archivo puede repetir filas pero nunca perderlas.
+    """
+
+    def __init__(self, conectar, dias=90, tamano_lote=2000, pausa_ms=50, directorio_archivo=None,
+                 al_terminar=None):
+        self.conectar = conectar
+        self.dias = dias
+        self.tamano_lote = tamano_lote
+        self.pausa = pausa_ms / 1000
+        self.directorio_archivo = directorio_archivo
+        self.al_terminar = al_terminar
+        self._en_curso = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._proxima = None
+        self._progreso = {'estado': 'inactivo'}
+
+    # ---------- Pasada de limpieza ----------
+    def ejecutar(self, dias=None, archivar=True, al_avanzar=None):
+        """Una pasada completa; devuelve el progreso final o None si ya hay otra en curso"""
+        if not self._en_curso.acquire(blocking=False):
+            return None
+        try:
+            return self._ejecutar(self.dias if dias is None else dias, archivar, al_avanzar)
+        finally:
+            self._en_curso.release()
+
+    def _ejecutar(self, dias, archivar, al_avanzar):
+        # logs.fecha es CURRENT_TIMESTAMP (UTC), igual que date('now', '-N days')
+        limite = (datetime.now(timezone.utc) - timedelta(days=dias)).strftime('%Y-%m-%d')
+        directorio = self.directorio_archivo if archivar else None
+        progreso = {
+            'estado': 'ejecutando',
+            'inicio': datetime.now().isoformat(timespec='seconds'),
+            'fin': None,
+            'dias': dias,
+            'limite_fecha': limite,
+            'pendientes': 0,
+            'eliminados': 0,
+            'archivados': 0,
+            'lotes': 0,
+            'archivos': [],
+            'bytes_liberados': 0,
+            'error': None
+        }
+        self._progreso = progreso
+
+        conn = self.conectar()
+        try:
+            # Sin índice cada lote sería un recorrido completo de la tabla
+            conn.execute(INDICE_FECHA)
+            conn.commit()
+
+            progreso['pendientes'] = conn.execute(
+                "SELECT COUNT(*) FROM logs WHERE fecha < ?", (limite,)
+            ).fetchone()[0]
+            paginas_libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            archivos = set()
+
+            while not self._detener.is_set():
+                filas = conn.execute(f"""
+                    SELECT {', '.join(COLUMNAS)} FROM logs
+                    WHERE fecha < ? ORDER BY fecha LIMIT ?
+                """, (limite, self.tamano_lote)).fetchall()
+                if not filas:
+                    break
+
+                if directorio:
+                    archivos.update(self._archivar(filas, directorio))
+                    progreso['archivados'] += len(filas)
+                    progreso['archivos'] = sorted(archivos)
+
+                ids = [fila[0] for fila in filas]
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(f"DELETE FROM logs WHERE id IN ({','.join('?' * len(ids))})", ids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                progreso['eliminados'] += len(ids)
+                progreso['lotes'] += 1
+                if al_avanzar:
+                    al_avanzar(dict(progreso))
+                time.sleep(self.pausa)
+
+            progreso['bytes_liberados'] = self._espacio_liberado(conn, paginas_libres)
+            progreso['estado'] = 'detenido' if self._detener.is_set() else 'completado'
+        except Exception as e:
+            progreso['estado'] = 'error'
+            progreso['error'] = str(e)
+            print(f"❌ Error en la retención de logs: {e}")
+        finally:
+            conn.close()
+            progreso['fin'] = datetime.now().isoformat(timespec='seconds')
+
+        if self.al_terminar and progreso['estado'] != 'error':
+            try:
+                self.al_terminar(dict(progreso))
+            except Exception as e:
+                print(f"Error notificando la retención de logs: {e}")
+        return dict(progreso)
+
+    def _archivar(self, filas, directorio):
+        """Agrega las filas a un .csv.gz por mes (cada pasada suma un miembro gzip)"""
+        os.makedirs(directorio, exist_ok=True)
+        por_mes = {}
+        for fila in filas:
+            por_mes.setdefault(str(fila[6])[:7], []).append(fila)
+
+        rutas = []
+        for mes, filas_mes in por_mes.items():
+            ruta = os.path.join(directorio, f'logs_{mes}.csv.gz')
+            nuevo = not os.path.exists(ruta)
+            with open(ruta, 'ab') as crudo:
+                with gzip.GzipFile(fileobj=crudo, mode='wb') as comprimido, \
+                        io.TextIOWrapper(comprimido, encoding='utf-8', newline='') as texto:
+                    escritor = csv.writer(texto)
+                    if nuevo:
+                        escritor.writerow(COLUMNAS)
+                    escritor.writerows(tuple(fila) for fila in filas_mes)
+                # Las filas se borran de la base a continuación: el archivo tiene que estar en disco
+                crudo.flush()
+                os.fsync(crudo.fileno())
+            rutas.append(ruta)
+        return rutas
+
+    def _espacio_liberado(self, conn, paginas_libres_antes):
+        """Bytes que quedaron libres para reutilizar (o devueltos al disco con auto_vacuum incremental)"""
+        tamano_pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+        paginas_libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        liberadas = max(paginas_libres - paginas_libres_antes, 0)
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            conn.execute(f"PRAGMA incremental_vacuum({liberadas})").fetchall()
+            conn.commit()
+        return liberadas * tamano_pagina
+
+    # ---------- Ejecución en segundo plano ----------
+    def programar(self, intervalo_s, demora_s=60):
+        """Hilo que ejecuta una pasada a los `demora_s` segundos y luego cada `intervalo_s`"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, args=(intervalo_s, demora_s),
+                                          name='retencion-logs', daemon=True)
+            self._hilo.start()
+        return self
+
+    def _ciclo(self, intervalo_s, demora_s):
+        espera = demora_s
+        while True:
+            self._proxima = time.time() + espera
+            self._despertar.wait(espera)
+            self._despertar.clear()
+            if self._detener.is_set():
+                break
+            self.ejecutar()
+            espera = intervalo_s
+        self._proxima = None
+
+    def ejecutar_en_segundo_plano(self, dias=None, archivar=True):
+        """Lanza una pasada sin esperar a que termine; False si ya hay una en curso"""
+        if self._en_curso.locked():
+            return False
+        if dias is None and archivar and self._hilo is not None and self._hilo.is_alive():
+            self._despertar.set()
+        else:
+            threading.Thread(target=self.ejecutar, args=(dias, archivar),
+                             name='retencion-logs-manual', daemon=True).start()
+        return True
+
+    def detener(self, timeout=5):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    def estado(self):
+        estado = dict(self._progreso)
+        estado['en_curso'] = self._en_curso.locked()
+        estado['programada'] = self._hilo is not None and self._hilo.is_alive()
+        estado['proxima'] = (datetime.fromtimestamp(self._proxima).isoformat(timespec='seconds')
+                             if self._proxima and estado['programada'] else None)
+        estado['directorio_archivo'] = self.directorio_archivo
+        return estado
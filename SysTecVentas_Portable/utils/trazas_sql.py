@@ -0,0 +1,247 @@
+# trazas_sql.py - Traza de sentencias SQL por request y registro de consultas lentas
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTA_MARCADORES = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+# Normalizar es caro comparado con ejecutar; las sentencias del código son casi siempre las mismas
+_normalizadas = {}
+_MAX_NORMALIZADAS = 2000
+
+
+def normalizar_sql(sql):
+    """'SELECT * FROM p WHERE id IN (?, ?, ?) AND x = 5' -> 'SELECT * FROM p WHERE id IN (...) AND x = ?'"""
+    normalizada = _normalizadas.get(sql)
+    if normalizada is None:
+        normalizada = _LITERAL_TEXTO.sub('?', sql)
+        normalizada = _LITERAL_NUMERO.sub('?', normalizada)
+        normalizada = _LISTA_MARCADORES.sub('(...)', normalizada)
+        normalizada = _ESPACIOS.sub(' ', normalizada).strip()
+        if len(_normalizadas) < _MAX_NORMALIZADAS:
+            _normalizadas[sql] = normalizada
+    return normalizada
+
+
+class RegistroSentencia:
+    """Una ejecución: SQL, parámetros, duración (ejecución + lectura de filas) y filas"""
+
+    __slots__ = ('sql', 'parametros', 'duracion_ms', 'filas')
+
+    def __init__(self, sql, parametros):
+        self.sql = sql
+        self.parametros = parametros
+        self.duracion_ms = 0.0
+        self.filas = 0
+
+
+class CursorTrazado:
+    """Cursor que mide execute/executemany y las lecturas posteriores (fetch*, iteración)"""
+
+    def __init__(self, cursor, registros):
+        self._cursor = cursor
+        self._registros = registros
+        self._actual = None
+
+    def _ejecutar(self, metodo, sql, parametros, muchos=False):
+        registro = RegistroSentencia(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            metodo(sql, parametros)
+        finally:
+            registro.duracion_ms = (time.perf_counter() - inicio) * 1000
+            if muchos or self._cursor.description is None:
+                registro.filas = max(self._cursor.rowcount, 0)
+            self._registros.append(registro)
+            self._actual = registro
+        return self
+
+    def execute(self, sql, parametros=()):
+        return self._ejecutar(self._cursor.execute, sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        secuencia = list(secuencia)
+        # Para EXPLAIN alcanza con la primera fila de parámetros
+        self._ejecutar(lambda s, _: self._cursor.executemany(s, secuencia), sql,
+                       secuencia[0] if secuencia else (), muchos=True)
+        return self
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        if self._actual is not None:
+            self._actual.duracion_ms += (time.perf_counter() - inicio) * 1000
+            if isinstance(resultado, list):
+                self._actual.filas += len(resultado)
+            elif resultado is not None:
+                self._actual.filas += 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._leer(self._cursor.fetchmany, *args)
+
+    def __iter__(self):
+        while True:
+            fila = self.fetchone()
+            if fila is None:
+                return
+            yield fila
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionTrazada:
+    """Envuelve una conexión sqlite3 registrando cada sentencia en `registros`"""
+
+    def __init__(self, conn, registros):
+        self.conexion = conn
+        self.registros = registros
+
+    def cursor(self):
+        return CursorTrazado(self.conexion.cursor(), self.registros)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def executescript(self, script):
+        registro = RegistroSentencia(script, ())
+        inicio = time.perf_counter()
+        try:
+            return self.conexion.executescript(script)
+        finally:
+            registro.duracion_ms = (time.perf_counter() - inicio) * 1000
+            self.registros.append(registro)
+
+    def __enter__(self):
+        self.conexion.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        return self.conexion.__exit__(*args)
+
+    def __getattr__(self, nombre):
+        return getattr(self.conexion, nombre)
+
+
+class TrazadorSQL:
+    """Acumula estadísticas por sentencia normalizada y guarda las consultas lentas.
+
+    Los registros de cada request se suman de una vez al terminar el request
+    (una sola toma del lock). Las sentencias que superan `umbral_lento_ms` se
+    escriben en `archivo_lentas` junto con su EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, umbral_lento_ms=100, archivo_lentas=None, max_sentencias=500, max_lentas=100):
+        self.umbral_lento_ms = umbral_lento_ms
+        self.archivo_lentas = archivo_lentas
+        self.max_sentencias = max_sentencias
+        self._sentencias = {}
+        self._lentas = deque(maxlen=max_lentas)
+        self._lock = threading.Lock()
+        self._archivo_lock = threading.Lock()
+        self._stats = {'requests': 0, 'sentencias': 0, 'lentas': 0, 'descartadas': 0}
+
+    def acumular(self, registros, conn=None, endpoint=None):
+        """Suma los registros de un request; `conn` se usa para el EXPLAIN de las lentas"""
+        lentas = [r for r in registros if r.duracion_ms >= self.umbral_lento_ms]
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['sentencias'] += len(registros)
+            self._stats['lentas'] += len(lentas)
+            for registro in registros:
+                clave = normalizar_sql(registro.sql)
+                stats = self._sentencias.get(clave)
+                if stats is None:
+                    if len(self._sentencias) >= self.max_sentencias:
+                        self._stats['descartadas'] += 1
+                        continue
+                    stats = self._sentencias[clave] = {
+                        'sql': clave, 'cantidad': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'filas': 0
+                    }
+                stats['cantidad'] += 1
+                stats['total_ms'] += registro.duracion_ms
+                stats['max_ms'] = max(stats['max_ms'], registro.duracion_ms)
+                stats['filas'] += registro.filas
+
+        for registro in lentas:
+            self._registrar_lenta(registro, conn, endpoint)
+
+    def _registrar_lenta(self, registro, conn, endpoint):
+        plan = explicar(conn, registro.sql, registro.parametros) if conn is not None else []
+        entrada = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'endpoint': endpoint,
+            'duracion_ms': round(registro.duracion_ms, 3),
+            'filas': registro.filas,
+            'sql': normalizar_sql(registro.sql),
+            'plan': plan
+        }
+        self._lentas.append(entrada)
+
+        if self.archivo_lentas:
+            lineas = [f"[{entrada['fecha']}] {entrada['duracion_ms']} ms, {entrada['filas']} filas, {endpoint}",
+                      f"  {entrada['sql']}"]
+            lineas += [f"    {paso}" for paso in plan]
+            try:
+                with self._archivo_lock, open(self.archivo_lentas, 'a', encoding='utf-8') as archivo:
+                    archivo.write('\n'.join(lineas) + '\n')
+            except OSError as e:
+                print(f"Error escribiendo consultas lentas: {e}")
+
+    def top(self, orden='total_ms', limite=20):
+        with self._lock:
+            sentencias = [dict(s) for s in self._sentencias.values()]
+        for s in sentencias:
+            s['promedio_ms'] = round(s['total_ms'] / s['cantidad'], 3)
+            s['total_ms'] = round(s['total_ms'], 3)
+            s['max_ms'] = round(s['max_ms'], 3)
+        sentencias.sort(key=lambda s: s.get(orden, 0), reverse=True)
+        return sentencias[:limite]
+
+    def lentas(self):
+        return list(self._lentas)
+
+    def reiniciar(self):
+        with self._lock:
+            self._sentencias.clear()
+            self._lentas.clear()
+            for clave in self._stats:
+                self._stats[clave] = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, distintas=len(self._sentencias), umbral_lento_ms=self.umbral_lento_ms)
+
+
+def explicar(conn, sql, parametros):
+    """Pasos de EXPLAIN QUERY PLAN como texto indentado ([] si la sentencia no se puede explicar)"""
+    if sql.lstrip().upper().startswith(('BEGIN', 'COMMIT', 'ROLLBACK', 'PRAGMA', 'EXPLAIN', 'SAVEPOINT', 'RELEASE')):
+        return []
+    try:
+        filas = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    except Exception as e:
+        return [f"(sin plan: {e})"]
+
+    profundidad = {0: -1}
+    pasos = []
+    for fila in filas:
+        nodo, padre, detalle = fila[0], fila[1], fila[3]
+        profundidad[nodo] = profundidad.get(padre, -1) + 1
+        pasos.append('  ' * profundidad[nodo] + detalle)
+    return pasos